@@ -1,10 +1,32 @@
 from django.contrib import admin
 
-from .models import GoogleAuthToken, JobEmail, Label, User
+from .models import (
+    Company,
+    EmailSearchDocument,
+    EmailStat,
+    GmailSyncState,
+    GoogleAuthToken,
+    JobEmail,
+    Label,
+    Sender,
+    SyncJob,
+    User,
+)
 
 # Register your models here.
 
 admin.site.register(User)
-admin.site.register(JobEmail)
 admin.site.register(Label)
 admin.site.register(GoogleAuthToken)
+admin.site.register(GmailSyncState)
+admin.site.register(SyncJob)
+admin.site.register(Company)
+admin.site.register(Sender)
+admin.site.register(EmailStat)
+admin.site.register(EmailSearchDocument)
+
+
+@admin.register(JobEmail)
+class JobEmailAdmin(admin.ModelAdmin):
+    # __str__ shows the sender address, join it in instead of a query per row
+    list_select_related = ("sender",)
@@ -1,6 +1,7 @@
 from django.core.management.base import BaseCommand
 
-from api.models import User
+from api.models import JobEmail, User
+from api.services.email_purge import PURGE_BATCH_SIZE
 from api.services.gmail_sync import wipe_emails_for_user
 
 
@@ -9,6 +10,8 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument("--email", type=str, help="Email of the user whose job emails should be cleared")
+        parser.add_argument("--batch-size", type=int, default=PURGE_BATCH_SIZE, help="Emails deleted per transaction")
+        parser.add_argument("--dry-run", action="store_true", help="Only report how many emails would be deleted")
 
     def handle(self, *args, **options):
         email = options.get("email")
@@ -16,10 +19,25 @@ class Command(BaseCommand):
             self.stdout.write(self.style.ERROR("Email argument is required."))
             return
 
+        if options["batch_size"] < 1:
+            self.stdout.write(self.style.ERROR("--batch-size must be at least 1."))
+            return
+
         user = User.objects.filter(email=email).first()
         if not user:
             self.stdout.write(self.style.ERROR(f"No user found with email: {email}"))
             return
 
-        count = wipe_emails_for_user(user)
+        if options["dry_run"]:
+            emails = JobEmail.objects.filter(user=user)
+            links = JobEmail.labels.through.objects.filter(jobemail__user=user)
+            self.stdout.write(
+                f"Would delete {emails.count()} job emails and {links.count()} label links for user {email}"
+            )
+            return
+
+        def report_progress(deleted, total):
+            self.stdout.write(f"Deleted {deleted}/{total} job emails")
+
+        count = wipe_emails_for_user(user, batch_size=options["batch_size"], progress_callback=report_progress)
         self.stdout.write(self.style.SUCCESS(f"Deleted {count} job emails for user {email}"))
@@ -1,19 +1,14 @@
-import json
+from functools import partial
 
 from django.core.management.base import BaseCommand, CommandError
 
 from api.models import User
-from api.services.gmail_service import fetch_emails_from_gmail, fetch_total_emails
-from api.services.gmail_sync import populate_email_database
+from api.services.gmail_service import save_fetch_tuning
+from api.services.gmail_sync import gmail_client, ingest_email_batches, sync_user_emails
+from api.utils.email_files import load_emails_from_file
 from api.utils.parsers import parse_emails
 
 
-def load_emails_from_file(file_path):
-    with open(file_path) as f:
-        emails = json.load(f)
-    return emails
-
-
 class Command(BaseCommand):
     help = "Populate database with gmail data"
 
@@ -26,10 +21,34 @@ class Command(BaseCommand):
             help="Maximum number of emails to fetch (supports pagination for large counts)",
         )
         parser.add_argument("--file", type=str, nargs="?", help="Path to JSON file with email data")
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="Emails read, parsed and stored at a time from --file (JSON array or JSONL, optionally gzipped)",
+        )
+        parser.add_argument(
+            "--parse-workers",
+            type=int,
+            help="Processes parsing ahead while a batch is stored, default EMAIL_PARSE_WORKERS, 1 parses in-process",
+        )
         parser.add_argument(
             "--inbox-only", action="store_true", help="Fetch only from INBOX, excluding promotions, social, etc."
         )
         parser.add_argument("--query", type=str, help="Custom Gmail search query")
+        parser.add_argument(
+            "--refresh", action="store_true", help="Re-fetch and overwrite emails that are already stored"
+        )
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="Only apply changes since the last sync (Gmail history API), full sync if there is no checkpoint",
+        )
+        parser.add_argument(
+            "--backend",
+            choices=["sync", "async"],
+            help="Gmail client, googleapiclient batches (sync) or asyncio (async), defaults to GMAIL_CLIENT_BACKEND",
+        )
 
     def handle(self, *args, **options):
         if options["email"] is not None:
@@ -41,16 +60,51 @@ class Command(BaseCommand):
         else:
             raise CommandError("Please provide an email address using --email")
 
+        parse_workers = options["parse_workers"]
+
+        if options["incremental"]:
+            # an incremental sync follows the whole mailbox's history, it can't be narrowed or read from a file
+            conflicting = [flag for flag in ("file", "query", "inbox_only") if options[flag]]
+            if conflicting:
+                flags = ", ".join(f"--{flag.replace('_', '-')}" for flag in conflicting)
+                raise CommandError(f"--incremental can't be combined with {flags}.")
+
+            stats = sync_user_emails(
+                user,
+                options["maxResults"],
+                parser_func=partial(parse_emails, workers=parse_workers),
+                incremental=True,
+                refresh=options["refresh"],
+                backend=options["backend"],
+            )
+            if stats["errors"]:
+                raise CommandError(f"Incremental sync failed for {user.email}, see logs for details.")
+
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Database synced: {stats['created']} created, {stats['updated']} updated, "
+                    f"{stats['deleted']} deleted."
+                )
+            )
+            return
+
         if options["file"]:
             file_path = options["file"]
+            if options["chunk_size"] < 1:
+                raise CommandError("--chunk-size must be at least 1.")
+
+            # read, parse and store chunk by chunk so memory stays flat however big the export is
+            self.stdout.write(f"Loading emails from file: {file_path}")
             try:
-                self.stdout.write(f"Loading emails from file: {file_path}")
-                emails = load_emails_from_file(file_path)
-                self.stdout.write(self.style.SUCCESS(f"Loaded {len(emails)} emails from file"))
-            except Exception as e:
+                stats = ingest_email_batches(
+                    user, load_emails_from_file(file_path, options["chunk_size"]), parse_workers=parse_workers
+                )
+            except (OSError, ValueError) as e:
                 raise CommandError(f"Failed to load emails from file {file_path}: {e}") from e
+            self.stdout.write(self.style.SUCCESS(f"Loaded {stats['fetched']} emails from file"))
         else:
             max_results = options["maxResults"]
+            gmail = gmail_client(options["backend"])
 
             label_ids = None
             query = None
@@ -62,15 +116,50 @@ class Command(BaseCommand):
             if options["query"]:
                 query = options["query"]
 
+            unfetched = []
+            cursor = {}
             if max_results <= 500:
-                emails = fetch_emails_from_gmail(user, max_results=max_results, label_ids=label_ids, query=query)
+                emails = gmail.fetch_emails_from_gmail(
+                    user,
+                    max_results=max_results,
+                    label_ids=label_ids,
+                    query=query,
+                    refresh=options["refresh"],
+                    unfetched=unfetched,
+                    cursor=cursor,
+                )
+                raw_batches = [emails]
             else:
-                emails = fetch_total_emails(user, max_results, label_ids=label_ids, query=query)
-
-        parsed_emails = parse_emails(emails)
-
-        stats = populate_email_database(user, parsed_emails)
+                # stream page by page so big imports start writing right away in constant memory
+                raw_batches = gmail.stream_emails(
+                    user,
+                    max_results,
+                    progress_callback=self._log_progress,
+                    label_ids=label_ids,
+                    query=query,
+                    refresh=options["refresh"],
+                    unfetched=unfetched,
+                    cursor=cursor,
+                )
+
+            stats = ingest_email_batches(user, raw_batches, parse_workers=parse_workers)
+            save_fetch_tuning(user)
+
+            if "error" in cursor or unfetched:
+                self.stdout.write(
+                    f"Database partially populated: {stats['created']} created, {stats['updated']} updated, "
+                    f"{len(unfetched)} could not be fetched."
+                )
+                if "error" in cursor:
+                    raise CommandError(f"Listing emails for {user.email} stopped early: {cursor['error']}")
+                # stored emails are skipped on the next run, so running it again only fetches the missing ones
+                raise CommandError(
+                    f"{len(unfetched)} emails could not be fetched for {user.email}, run again to retry them."
+                )
 
         self.stdout.write(
             self.style.SUCCESS(f"Database populated: {stats['created']} created, {stats['updated']} updated.")
         )
+
+    def _log_progress(self, current, total):
+        self.stdout.write(f"Listed {current}/{total} message IDs")
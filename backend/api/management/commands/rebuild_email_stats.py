@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.models import User
+from api.services.email_stats import rebuild_email_stats
+
+
+class Command(BaseCommand):
+    help = "Recount the per-user email rollups (labels, companies, weeks) from the stored emails"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--email", type=str, action="append", help="Only rebuild this user, can be repeated")
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by("id")
+        if options["email"]:
+            users = users.filter(email__in=options["email"])
+            missing = set(options["email"]) - set(users.values_list("email", flat=True))
+            if missing:
+                raise CommandError(f"No user with email {', '.join(sorted(missing))}.")
+
+        for user in users:
+            rows = rebuild_email_stats(user)
+            self.stdout.write(self.style.SUCCESS(f"{user.email}: rebuilt {rows} email stats"))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.models import User
+from api.services.email_search import REINDEX_BATCH_SIZE, reindex_user_emails
+
+
+class Command(BaseCommand):
+    help = "Backfill the full-text search index from the stored emails"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--email", type=str, action="append", help="Only reindex this user, can be repeated")
+        parser.add_argument(
+            "--batch-size", type=int, default=REINDEX_BATCH_SIZE, help="Emails read and indexed per query"
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+
+        users = User.objects.order_by("id")
+        if options["email"]:
+            users = users.filter(email__in=options["email"])
+            missing = set(options["email"]) - set(users.values_list("email", flat=True))
+            if missing:
+                raise CommandError(f"No user with email {', '.join(sorted(missing))}.")
+
+        for user in users:
+            indexed = reindex_user_emails(user, batch_size=options["batch_size"])
+            self.stdout.write(self.style.SUCCESS(f"{user.email}: indexed {indexed} emails"))
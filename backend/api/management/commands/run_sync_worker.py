@@ -0,0 +1,45 @@
+import os
+import socket
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.services.job_queue import LEASE_SECONDS, claim_job, requeue_expired_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = "Process queued email sync jobs, run as many workers as you like on any machine"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--worker-id", type=str, help="Name recorded on claimed jobs, defaults to host:pid")
+        parser.add_argument("--poll-interval", type=float, default=5.0, help="Seconds to wait when the queue is empty")
+        parser.add_argument(
+            "--lease-seconds", type=int, default=LEASE_SECONDS, help="Lease length, renewed by heartbeats"
+        )
+        parser.add_argument("--max-jobs", type=int, help="Exit after this many jobs")
+        parser.add_argument("--once", action="store_true", help="Exit as soon as the queue is empty")
+
+    def handle(self, *args, **options):
+        worker_id = options["worker_id"] or f"{socket.gethostname()}:{os.getpid()}"
+        processed = 0
+
+        self.stdout.write(f"Sync worker {worker_id} started")
+
+        while options["max_jobs"] is None or processed < options["max_jobs"]:
+            requeue_expired_jobs()
+
+            job = claim_job(worker_id, options["lease_seconds"])
+            if job is None:
+                if options["once"]:
+                    break
+                time.sleep(options["poll_interval"])
+                continue
+
+            self.stdout.write(f"Running sync job {job.id} for {job.user.email} (attempt {job.attempts})")
+            job = run_job(job, options["lease_seconds"])
+            processed += 1
+
+            style = self.style.SUCCESS if job.status == job.Status.DONE else self.style.WARNING
+            self.stdout.write(style(f"Sync job {job.id} is {job.status}"))
+
+        self.stdout.write(self.style.SUCCESS(f"Sync worker {worker_id} processed {processed} jobs"))
@@ -0,0 +1,71 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.services.job_queue import enqueue_sync
+from api.services.sync_scheduler import SLICE_SIZE, sync_all_users, syncable_users
+
+
+class Command(BaseCommand):
+    help = "Sync Gmail for every user with a stored Google token, several users in parallel"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--email", type=str, action="append", help="Only sync this user, can be repeated")
+        parser.add_argument("--workers", type=int, default=4, help="Users synced at once, 1 runs in this process")
+        parser.add_argument("--maxResults", type=int, default=500, help="Newest emails to sync per user on a full sync")
+        parser.add_argument(
+            "--slice", type=int, default=SLICE_SIZE, help="Emails per turn before a user goes back in the queue"
+        )
+        parser.add_argument(
+            "--incremental", action="store_true", help="Only apply changes since each user's last sync when possible"
+        )
+        parser.add_argument("--summary", type=str, help="Write the per-user stats to this JSON file")
+        parser.add_argument(
+            "--enqueue", action="store_true", help="Queue one sync job per user for run_sync_worker instead"
+        )
+
+    def handle(self, *args, **options):
+        if options["workers"] < 1 or options["slice"] < 1:
+            raise CommandError("--workers and --slice must be at least 1.")
+
+        users = list(syncable_users(options["email"]))
+        if not users:
+            raise CommandError("No users with a stored Google token to sync.")
+
+        if options["enqueue"]:
+            created = 0
+            for user in users:
+                _, job_created = enqueue_sync(
+                    user, total_count=options["maxResults"], incremental=options["incremental"]
+                )
+                created += job_created
+            self.stdout.write(self.style.SUCCESS(f"Queued {created} sync jobs, {len(users) - created} already queued"))
+            return
+
+        self.stdout.write(f"Syncing {len(users)} users with {options['workers']} workers")
+
+        summaries = sync_all_users(
+            users,
+            workers=options["workers"],
+            max_results=options["maxResults"],
+            slice_size=options["slice"],
+            incremental=options["incremental"],
+        )
+
+        for summary in summaries:
+            style = self.style.ERROR if summary["errors"] else self.style.SUCCESS
+            self.stdout.write(
+                style(
+                    f"{summary['email']}: {summary['created']} created, {summary['updated']} updated, "
+                    f"{summary['deleted']} deleted in {summary['turns']} turns ({summary['seconds']:.1f}s)"
+                )
+            )
+
+        if options["summary"]:
+            with open(options["summary"], "w") as f:
+                json.dump(summaries, f, indent=4)
+            self.stdout.write(f"Wrote summary to {options['summary']}")
+
+        failed = sum(1 for summary in summaries if summary["errors"])
+        if failed:
+            raise CommandError(f"{failed} of {len(summaries)} user syncs had errors.")
@@ -0,0 +1,28 @@
+# Generated by Django 6.0.4 on 2026-10-17 04:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_gmailsyncstate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gmailsyncstate',
+            name='fetch_batch_size',
+            field=models.PositiveSmallIntegerField(default=50),
+        ),
+        migrations.AddField(
+            model_name='gmailsyncstate',
+            name='fetch_workers',
+            field=models.PositiveSmallIntegerField(default=4),
+        ),
+        migrations.AlterField(
+            model_name='gmailsyncstate',
+            name='history_id',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
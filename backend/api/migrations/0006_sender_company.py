@@ -0,0 +1,105 @@
+# Generated by Django 6.0.4 on 2026-10-17 04:29
+
+from itertools import batched
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+BATCH_SIZE = 1000
+
+
+def _domain(email):
+    _, at, domain = email.rpartition("@")
+    return domain.lower() if at and domain else ""
+
+
+def backfill_senders(apps, schema_editor):
+    JobEmail = apps.get_model("api", "JobEmail")
+    Sender = apps.get_model("api", "Sender")
+    Company = apps.get_model("api", "Company")
+
+    # the display name stays on each email, a sender is only the address and its company
+    senders = JobEmail.objects.exclude(sender_email="").values_list("sender_email", flat=True).distinct().order_by()
+
+    for batch in batched(senders.iterator(chunk_size=BATCH_SIZE), BATCH_SIZE, strict=False):
+        domains = {_domain(email) for email in batch} - {""}
+        Company.objects.bulk_create([Company(domain=domain) for domain in domains], ignore_conflicts=True)
+        company_ids = dict(Company.objects.filter(domain__in=domains).values_list("domain", "id"))
+
+        Sender.objects.bulk_create(
+            [Sender(email=email, company_id=company_ids.get(_domain(email))) for email in batch],
+            ignore_conflicts=True,
+        )
+
+    # one set-based UPDATE instead of a save() per email
+    matching_sender = Sender.objects.filter(email=OuterRef("sender_email"))
+    JobEmail.objects.exclude(sender_email="").update(
+        sender_id=Subquery(matching_sender.values("id")[:1]),
+        company_id=Subquery(matching_sender.values("company_id")[:1]),
+    )
+
+
+def restore_sender_email(apps, schema_editor):
+    JobEmail = apps.get_model("api", "JobEmail")
+    Sender = apps.get_model("api", "Sender")
+
+    sender = Sender.objects.filter(id=OuterRef("sender_id"))
+    JobEmail.objects.filter(sender__isnull=False).update(
+        sender_email=Subquery(sender.values("email")[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_syncjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Company',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('domain', models.CharField(max_length=255, unique=True)),
+                ('name', models.CharField(blank=True, default='', max_length=255)),
+            ],
+            options={
+                'verbose_name_plural': 'companies',
+            },
+        ),
+        migrations.CreateModel(
+            name='Sender',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email', models.EmailField(max_length=254, unique=True)),
+                ('company', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='senders', to='api.company')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='jobemail',
+            name='company',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='emails', to='api.company'),
+        ),
+        migrations.AddField(
+            model_name='jobemail',
+            name='sender',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='emails', to='api.sender'),
+        ),
+        # blank so that unapplying the removal below can re-add the column with an empty default
+        migrations.AlterField(
+            model_name='jobemail',
+            name='sender_email',
+            field=models.EmailField(blank=True, max_length=254),
+        ),
+        migrations.AlterField(
+            model_name='jobemail',
+            name='sender_name',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.RunPython(backfill_senders, restore_sender_email),
+        migrations.RemoveField(
+            model_name='jobemail',
+            name='sender_email',
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 6.0.4 on 2026-10-17 04:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_sender_company'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='jobemail',
+            index=models.Index(fields=['user', '-received_at'], name='jobemail_user_received_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='jobemail',
+            index=models.Index(fields=['user', 'sender', '-received_at'], name='jobemail_user_sender_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='jobemail',
+            index=models.Index(fields=['user', 'company', '-received_at'], name='jobemail_user_company_idx'),
+        ),
+        # the auto-created labels through table can't declare Meta.indexes. Django only indexes
+        # label_id on it, this one also covers jobemail_id so "emails with label X" never touches the table
+        migrations.RunSQL(
+            'CREATE INDEX "jobemail_labels_label_idx" ON "api_jobemail_labels" ("label_id", "jobemail_id")',
+            'DROP INDEX "jobemail_labels_label_idx"',
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 6.0.4 on 2026-10-17 04:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_jobemail_query_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='jobemail',
+            name='jobemail_user_received_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='jobemail',
+            name='jobemail_user_sender_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='jobemail',
+            name='jobemail_user_company_idx',
+        ),
+        migrations.AddIndex(
+            model_name='jobemail',
+            index=models.Index(fields=['user', '-received_at', '-id'], name='jobemail_user_received_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='jobemail',
+            index=models.Index(fields=['user', 'sender', '-received_at', '-id'], name='jobemail_user_sender_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='jobemail',
+            index=models.Index(fields=['user', 'company', '-received_at', '-id'], name='jobemail_user_company_idx'),
+        ),
+    ]
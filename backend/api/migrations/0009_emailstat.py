@@ -0,0 +1,28 @@
+# Generated by Django 6.0.4 on 2026-10-17 04:34
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_jobemail_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(choices=[('total', 'Total'), ('label', 'Label'), ('company', 'Company'), ('week', 'Week')], max_length=16)),
+                ('key', models.CharField(blank=True, default='', max_length=255)),
+                ('count', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='email_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'dimension', 'key'), name='emailstat_unique_key')],
+            },
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 6.0.4 on 2026-10-17 04:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# SQLite: an external-content FTS5 table over api_emailsearchdocument.text, kept in sync by triggers.
+# A later migration that makes Django rebuild api_emailsearchdocument drops these triggers with it.
+SQLITE_CREATE = [
+    """
+    CREATE VIRTUAL TABLE "api_emailsearchdocument_fts" USING fts5(
+        "text", content='api_emailsearchdocument', content_rowid='id', tokenize='porter unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER "api_emailsearchdocument_fts_insert" AFTER INSERT ON "api_emailsearchdocument" BEGIN
+        INSERT INTO "api_emailsearchdocument_fts" (rowid, "text") VALUES (new."id", new."text");
+    END
+    """,
+    """
+    CREATE TRIGGER "api_emailsearchdocument_fts_delete" AFTER DELETE ON "api_emailsearchdocument" BEGIN
+        INSERT INTO "api_emailsearchdocument_fts" ("api_emailsearchdocument_fts", rowid, "text")
+        VALUES ('delete', old."id", old."text");
+    END
+    """,
+    """
+    CREATE TRIGGER "api_emailsearchdocument_fts_update" AFTER UPDATE ON "api_emailsearchdocument" BEGIN
+        INSERT INTO "api_emailsearchdocument_fts" ("api_emailsearchdocument_fts", rowid, "text")
+        VALUES ('delete', old."id", old."text");
+        INSERT INTO "api_emailsearchdocument_fts" (rowid, "text") VALUES (new."id", new."text");
+    END
+    """,
+]
+SQLITE_DROP = [
+    'DROP TRIGGER IF EXISTS "api_emailsearchdocument_fts_update"',
+    'DROP TRIGGER IF EXISTS "api_emailsearchdocument_fts_delete"',
+    'DROP TRIGGER IF EXISTS "api_emailsearchdocument_fts_insert"',
+    'DROP TABLE IF EXISTS "api_emailsearchdocument_fts"',
+]
+
+# Postgres: an expression index, the search query has to use the same to_tsvector('english', text)
+POSTGRES_CREATE = [
+    """CREATE INDEX "emailsearch_text_gin_idx" ON "api_emailsearchdocument" USING gin (to_tsvector('english', "text"))""",
+]
+POSTGRES_DROP = ['DROP INDEX IF EXISTS "emailsearch_text_gin_idx"']
+
+
+def create_search_index(apps, schema_editor):
+    # other databases get no index, search falls back to LIKE there
+    statements = {"sqlite": SQLITE_CREATE, "postgresql": POSTGRES_CREATE}.get(schema_editor.connection.vendor, [])
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    statements = {"sqlite": SQLITE_DROP, "postgresql": POSTGRES_DROP}.get(schema_editor.connection.vendor, [])
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_emailstat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailSearchDocument',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('text', models.TextField()),
+                ('email', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='search_document', to='api.jobemail')),
+            ],
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
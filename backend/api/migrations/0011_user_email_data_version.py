@@ -0,0 +1,18 @@
+# Generated by Django 6.0.4 on 2026-10-17 04:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_emailsearchdocument'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='email_data_version',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+    ]
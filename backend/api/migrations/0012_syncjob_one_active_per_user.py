@@ -0,0 +1,37 @@
+# Generated by Django 6.0.4 on 2026-10-17 05:48
+
+from django.db import migrations, models
+
+ACTIVE = ["queued", "running"]
+
+
+def fail_duplicate_active_jobs(apps, schema_editor):
+    # enqueue_sync could race before the constraint existed, keep the oldest active job per user
+    SyncJob = apps.get_model("api", "SyncJob")
+
+    seen = set()
+    duplicates = []
+    active = SyncJob.objects.filter(status__in=ACTIVE).order_by("created_at", "id")
+    for job_id, user_id in active.values_list("id", "user_id"):
+        if user_id in seen:
+            duplicates.append(job_id)
+        seen.add(user_id)
+
+    SyncJob.objects.filter(id__in=duplicates).update(
+        status="failed", lease_expires_at=None, last_error="Duplicate of an older active job for the same user"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_user_email_data_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(fail_duplicate_active_jobs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='syncjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['queued', 'running'])), fields=('user',), name='syncjob_one_active_per_user'),
+        ),
+    ]
@@ -3,6 +3,7 @@ import uuid
 from django.conf import settings
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.db import models
+from django.utils import timezone
 from fernet_fields import EncryptedTextField
 
 # Create your models here.
@@ -27,6 +28,8 @@ class UserManager(BaseUserManager):
 class User(AbstractUser):
     email = models.EmailField(unique=True)
     username = None
+    # bumped whenever the user's emails change, so cached reads of them can be keyed on it
+    email_data_version = models.PositiveBigIntegerField(default=0, editable=False)
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = []
@@ -48,14 +51,38 @@ class Label(models.Model):
         return self.name
 
 
+class Company(models.Model):
+    # lower-cased sender domain, e.g. "acme.com"
+    domain = models.CharField(max_length=255, unique=True)
+    name = models.CharField(max_length=255, blank=True, default="")
+
+    class Meta:
+        verbose_name_plural = "companies"
+
+    def __str__(self):
+        return self.name or self.domain
+
+
+class Sender(models.Model):
+    # shared by every user who got mail from the address, display names stay on each email
+    email = models.EmailField(unique=True)
+    company = models.ForeignKey(Company, null=True, blank=True, on_delete=models.SET_NULL, related_name="senders")
+
+    def __str__(self):
+        return self.email
+
+
 class JobEmail(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="emails")
 
     gmail_id = models.CharField(max_length=255, unique=True)
     subject = models.CharField(max_length=500)
-    sender_email = models.EmailField()
-    sender_name = models.CharField(max_length=255)
+    sender = models.ForeignKey(Sender, null=True, blank=True, on_delete=models.SET_NULL, related_name="emails")
+    # the From display name this email carried
+    sender_name = models.CharField(max_length=255, blank=True)
+    # copy of sender.company so per-company queries don't need the sender join
+    company = models.ForeignKey(Company, null=True, blank=True, on_delete=models.SET_NULL, related_name="emails")
     received_at = models.DateTimeField()
     content_type = models.CharField(max_length=100)
     size_estimate = models.IntegerField()
@@ -63,9 +90,22 @@ class JobEmail(models.Model):
 
     labels = models.ManyToManyField(Label, related_name="emails")
 
+    class Meta:
+        # one per list view: a user's newest emails, overall, from one sender and from one company.
+        # id breaks ties in received_at, so keyset pages are read straight off the index without a sort
+        indexes = [
+            models.Index(fields=["user", "-received_at", "-id"], name="jobemail_user_received_idx"),
+            models.Index(fields=["user", "sender", "-received_at", "-id"], name="jobemail_user_sender_idx"),
+            models.Index(fields=["user", "company", "-received_at", "-id"], name="jobemail_user_company_idx"),
+        ]
+
     def __str__(self):
         return f"{self.subject} from {self.sender_email}"
 
+    @property
+    def sender_email(self):
+        return self.sender.email if self.sender_id else ""
+
 
 class GoogleAuthToken(models.Model):
     user = models.OneToOneField("api.User", on_delete=models.CASCADE)
@@ -74,3 +114,101 @@ class GoogleAuthToken(models.Model):
 
     def __str__(self):
         return f"GoogleAuthToken for {self.user.email}"
+
+
+class GmailSyncState(models.Model):
+    user = models.OneToOneField("api.User", on_delete=models.CASCADE)
+    history_id = models.CharField(max_length=64, blank=True, default="")
+    last_full_sync_at = models.DateTimeField(null=True, blank=True)
+    # learned by the AIMD controller in gmail_service, carried over to the next run
+    fetch_batch_size = models.PositiveSmallIntegerField(default=50)
+    fetch_workers = models.PositiveSmallIntegerField(default=4)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"GmailSyncState for {self.user.email} at history {self.history_id}"
+
+
+class SyncJob(models.Model):
+    class Status(models.TextChoices):
+        QUEUED = "queued"
+        RUNNING = "running"
+        DONE = "done"
+        FAILED = "failed"
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="sync_jobs")
+    status = models.CharField(max_length=16, choices=Status.choices, default=Status.QUEUED)
+    # keyword arguments for sync_user_emails: total_count, incremental, refresh
+    options = models.JSONField(default=dict, blank=True)
+
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+
+    worker_id = models.CharField(max_length=255, blank=True, default="")
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+
+    result = models.JSONField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "run_after"], name="syncjob_claim_idx"),
+            models.Index(fields=["status", "lease_expires_at"], name="syncjob_lease_idx"),
+        ]
+        constraints = [
+            # at most one queued or running job per user, enqueue_sync relies on it under concurrency
+            models.UniqueConstraint(
+                fields=["user"],
+                condition=models.Q(status__in=["queued", "running"]),
+                name="syncjob_one_active_per_user",
+            ),
+        ]
+
+    def __str__(self):
+        return f"SyncJob {self.pk} for {self.user.email} ({self.status})"
+
+
+class EmailStat(models.Model):
+    """One running count of a user's emails, e.g. how many carry a label. Kept up to date by deltas on ingest."""
+
+    class Dimension(models.TextChoices):
+        TOTAL = "total"
+        LABEL = "label"
+        COMPANY = "company"
+        WEEK = "week"
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="email_stats")
+    dimension = models.CharField(max_length=16, choices=Dimension.choices)
+    # label name, company domain, ISO date of the week's Monday (UTC), or "" for the total
+    key = models.CharField(max_length=255, blank=True, default="")
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "dimension", "key"], name="emailstat_unique_key"),
+        ]
+
+    def __str__(self):
+        return f"{self.user.email} {self.dimension} {self.key}: {self.count}"
+
+
+class EmailSearchDocument(models.Model):
+    """
+    The searchable text of one email: subject, sender name and sender address words.
+
+    The full-text index over it is not declared here but created by migration per database:
+    an FTS5 table kept in sync by triggers on SQLite, a GIN index on to_tsvector on Postgres.
+    See api.services.email_search.
+    """
+
+    # the FTS5 table points at rows by this integer key, so it must stay an explicit auto field
+    id = models.BigAutoField(primary_key=True)
+    email = models.OneToOneField(JobEmail, on_delete=models.CASCADE, related_name="search_document")
+    text = models.TextField()
+
+    def __str__(self):
+        return f"Search text of {self.email_id}"
@@ -0,0 +1,33 @@
+from rest_framework import serializers
+
+from .models import JobEmail
+
+
+class JobEmailSerializer(serializers.ModelSerializer):
+    """
+    Read-only list representation of an email.
+
+    Sender and company are flattened to strings and labels to their names, so a page is
+    served from one query with sender/company joined in and one prefetch for the labels.
+    """
+
+    sender_email = serializers.CharField(source="sender.email", default="", read_only=True)
+    company = serializers.CharField(source="company.domain", default=None, read_only=True)
+    labels = serializers.SlugRelatedField(slug_field="name", many=True, read_only=True)
+
+    class Meta:
+        model = JobEmail
+        fields = [
+            "id",
+            "gmail_id",
+            "subject",
+            "sender_email",
+            "sender_name",
+            "company",
+            "received_at",
+            "content_type",
+            "size_estimate",
+            "importance",
+            "labels",
+        ]
+        read_only_fields = fields
@@ -0,0 +1,95 @@
+import logging
+from collections.abc import Callable
+
+from django.db import connection, models, transaction
+
+from api.models import JobEmail, User
+
+from .email_stats import apply_stat_deltas, removal_deltas
+from .read_cache import bump_data_version
+
+logger = logging.getLogger(__name__)
+
+PURGE_BATCH_SIZE = 1000
+# bound parameters left free in a chunk's queries besides the ids, e.g. the user and the stats' time zone
+QUERY_PARAM_HEADROOM = 50
+
+
+def purge_user_emails(user: User, batch_size: int = PURGE_BATCH_SIZE, progress_callback: Callable | None = None) -> int:
+    """
+    Delete all of a user's emails with direct SQL, one bounded chunk per transaction.
+
+    QuerySet.delete() loads every email and label link into Python to cascade by hand, and holds
+    its locks until the last one is gone. Here each chunk is one SELECT of ids off the user's
+    index and one DELETE each on the label links, the search text and the emails, so memory
+    and lock time stay flat however big the mailbox is. Each chunk also comes off the stats
+    rollups and bumps the data version in its own transaction, so the rollups and cached
+    reads match the emails left after every commit.
+
+    Args:
+        user: User whose emails are deleted
+        batch_size: Emails deleted per transaction, lowered to fit the database's bound
+                    parameter limit (SQLite's) since every chunk passes its ids as parameters
+        progress_callback: Optional callback called with (deleted, total) after every chunk
+
+    Returns:
+        Number of emails deleted
+    """
+    max_params = connection.features.max_query_params
+    if max_params:
+        batch_size = min(batch_size, max_params - QUERY_PARAM_HEADROOM)
+
+    total = JobEmail.objects.filter(user=user).count()
+    deleted = 0
+
+    while True:
+        with transaction.atomic():
+            chunk_deleted = _purge_chunk(user, batch_size)
+        if not chunk_deleted:
+            break
+
+        deleted += chunk_deleted
+        if progress_callback:
+            # a sync adding emails meanwhile can push deleted past the starting count
+            progress_callback(deleted, max(total, deleted))
+
+    logger.info(f"Purged {deleted} emails for user {user.id}")
+    return deleted
+
+
+def _purge_chunk(user: User, batch_size: int) -> int:
+    quote = connection.ops.quote_name
+    emails = quote(JobEmail._meta.db_table)
+
+    with connection.cursor() as cursor:
+        # newest first is the order of the (user, received_at, id) index, so no sort
+        cursor.execute(
+            f"SELECT id FROM {emails} WHERE user_id = %s ORDER BY received_at DESC, id DESC LIMIT %s",
+            [user.pk, batch_size],
+        )
+        # the ids go straight back as parameters in whatever form the database returned them
+        ids = [email_id for (email_id,) in cursor.fetchall()]
+        if not ids:
+            return 0
+
+        deltas = removal_deltas(JobEmail.objects.filter(id__in=ids))
+
+        placeholders = ", ".join(["%s"] * len(ids))
+        for table, column in _cascaded_tables():
+            cursor.execute(f"DELETE FROM {quote(table)} WHERE {quote(column)} IN ({placeholders})", ids)
+
+        cursor.execute(f"DELETE FROM {emails} WHERE id IN ({placeholders})", ids)
+        deleted = cursor.rowcount
+
+    apply_stat_deltas(user, deltas)
+    bump_data_version(user)
+    return deleted
+
+
+def _cascaded_tables() -> list[tuple[str, str]]:
+    # every table whose rows die with their email: the label links and the search text today
+    tables = []
+    for relation in JobEmail._meta.get_fields(include_hidden=True):
+        if relation.auto_created and not relation.concrete and relation.on_delete is models.CASCADE:
+            tables.append((relation.related_model._meta.db_table, relation.field.column))
+    return tables
@@ -0,0 +1,141 @@
+import logging
+import re
+from itertools import batched
+
+from django.db import connection
+from django.db.models import Prefetch
+
+from api.models import EmailSearchDocument, JobEmail, Label, User
+
+from .read_cache import bump_data_version
+
+logger = logging.getLogger(__name__)
+
+SEARCH_FTS_TABLE = "api_emailsearchdocument_fts"
+# more words than this in one query are dropped, each one is another index lookup
+MAX_SEARCH_TERMS = 16
+REINDEX_BATCH_SIZE = 1000
+
+_TERM_RE = re.compile(r"\w+")
+
+# every word of the query, as a prefix, ranked by bm25 (lower is better). Newest first on ties
+_SQLITE_SEARCH = f"""
+    SELECT d.email_id
+    FROM {SEARCH_FTS_TABLE}
+    JOIN api_emailsearchdocument d ON d.id = {SEARCH_FTS_TABLE}.rowid
+    JOIN api_jobemail e ON e.id = d.email_id
+    WHERE {SEARCH_FTS_TABLE} MATCH %s AND e.user_id = %s
+    ORDER BY {SEARCH_FTS_TABLE}.rank, e.received_at DESC
+    LIMIT %s
+"""
+
+# to_tsvector('english', text) has to match the GIN index expression of migration 0010 exactly
+_POSTGRES_SEARCH = """
+    SELECT d.email_id
+    FROM api_emailsearchdocument d
+    JOIN api_jobemail e ON e.id = d.email_id
+    CROSS JOIN to_tsquery('english', %s) q
+    WHERE to_tsvector('english', d.text) @@ q AND e.user_id = %s
+    ORDER BY ts_rank(to_tsvector('english', d.text), q) DESC, e.received_at DESC
+    LIMIT %s
+"""
+
+
+def search_terms(query: str) -> list[str]:
+    """Lower-cased words of a search query, without duplicates or any query syntax."""
+    return list(dict.fromkeys(term.lower() for term in _TERM_RE.findall(query)))[:MAX_SEARCH_TERMS]
+
+
+def search_text(subject: str, sender_name: str, sender_email: str) -> str:
+    """
+    Searchable text of an email.
+
+    The sender address is split into words so "acme" finds jobs@acme.com on every database,
+    Postgres would otherwise keep the whole address as one token.
+    """
+    return " ".join(filter(None, (subject, sender_name, " ".join(_TERM_RE.findall(sender_email)))))
+
+
+def index_emails(texts: dict) -> None:
+    """Write the search text of emails (email id -> text), replacing what they had, in one upsert."""
+    if not texts:
+        return
+
+    EmailSearchDocument.objects.bulk_create(
+        [EmailSearchDocument(email_id=email_id, text=text) for email_id, text in texts.items()],
+        update_conflicts=True,
+        unique_fields=["email"],
+        update_fields=["text"],
+    )
+
+
+def reindex_user_emails(user: User, batch_size: int = REINDEX_BATCH_SIZE) -> int:
+    """
+    Rebuild the search text of all of a user's emails, e.g. for emails stored before search existed.
+
+    Returns:
+        Number of emails indexed
+    """
+    emails = (
+        JobEmail.objects.filter(user=user)
+        .select_related("sender")
+        .only("id", "subject", "sender_name", "sender__email")
+        .order_by()
+    )
+
+    indexed = 0
+    for batch in batched(emails.iterator(chunk_size=batch_size), batch_size, strict=False):
+        index_emails({email.id: search_text(email.subject, email.sender_name, email.sender_email) for email in batch})
+        indexed += len(batch)
+
+    # cached searches may have missed what was just indexed
+    bump_data_version(user)
+
+    logger.info(f"Indexed {indexed} emails for search for user {user.id}")
+    return indexed
+
+
+def search_emails(user: User, query: str, limit: int = 50) -> list[JobEmail]:
+    """
+    A user's emails matching every word of `query`, best match first.
+
+    Words match as prefixes and, on SQLite and Postgres, by stem ("interviews" finds
+    "interview"). Other databases get an unranked, newest first LIKE scan.
+
+    Args:
+        user: User whose emails are searched
+        query: Free text, any punctuation is ignored
+        limit: Most emails returned
+
+    Returns:
+        JobEmails with sender, company and labels loaded, in rank order
+    """
+    terms = search_terms(query)
+    if not terms:
+        return []
+
+    emails = (
+        JobEmail.objects.select_related("sender", "company")
+        .prefetch_related(Prefetch("labels", queryset=Label.objects.only("id", "name")))
+        .filter(user=user)
+    )
+
+    if connection.vendor == "sqlite":
+        ids = _ranked_ids(_SQLITE_SEARCH, " ".join(f'"{term}"*' for term in terms), user, limit)
+    elif connection.vendor == "postgresql":
+        ids = _ranked_ids(_POSTGRES_SEARCH, " & ".join(f"{term}:*" for term in terms), user, limit)
+    else:
+        for term in terms:
+            emails = emails.filter(search_document__text__icontains=term)
+        return list(emails.order_by("-received_at", "-id")[:limit])
+
+    by_id = {email.id: email for email in emails.filter(id__in=ids)}
+    return [by_id[email_id] for email_id in ids if email_id in by_id]
+
+
+def _ranked_ids(sql: str, match: str, user: User, limit: int) -> list:
+    id_field = JobEmail._meta.pk
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [match, user.id, limit])
+        # SQLite hands back the uuid as stored hex, turn it into the UUID the ORM uses
+        return [id_field.to_python(email_id) for (email_id,) in cursor.fetchall()]
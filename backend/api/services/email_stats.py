@@ -0,0 +1,169 @@
+import logging
+from collections import Counter
+from collections.abc import Iterable
+from datetime import UTC, date, datetime, timedelta
+
+from django.db import transaction
+from django.db.models import Count, QuerySet
+from django.db.models.functions import TruncWeek
+
+from api.models import EmailStat, JobEmail, Label, User
+
+from .read_cache import bump_data_version
+
+logger = logging.getLogger(__name__)
+
+Dimension = EmailStat.Dimension
+
+# (dimension, key) -> change in count
+StatDeltas = Counter[tuple[str, str]]
+
+
+def week_key(received_at: datetime | date) -> str:
+    """ISO date of the Monday (UTC) starting the week an email arrived in."""
+    day = received_at.astimezone(UTC).date() if isinstance(received_at, datetime) else received_at
+    return (day - timedelta(days=day.weekday())).isoformat()
+
+
+def email_stat_keys(company_domain: str | None, received_at: datetime) -> list[tuple[str, str]]:
+    """Non-label rollup rows one email counts towards."""
+    keys = [(Dimension.TOTAL, ""), (Dimension.WEEK, week_key(received_at))]
+    if company_domain:
+        keys.append((Dimension.COMPANY, company_domain))
+    return keys
+
+
+def label_deltas(label_changes: Counter[int], names: dict[int, str] | None = None) -> StatDeltas:
+    """Turn per-label-id changes into label stat deltas, looking up the names not in `names`."""
+    label_changes = {label_id: n for label_id, n in label_changes.items() if n}
+    names = dict(names or {})
+
+    unknown = label_changes.keys() - names.keys()
+    if unknown:
+        names.update(Label.objects.filter(id__in=unknown).values_list("id", "name"))
+
+    return Counter(
+        {(Dimension.LABEL, names[label_id]): n for label_id, n in label_changes.items() if label_id in names}
+    )
+
+
+def apply_stat_deltas(user: User, deltas: StatDeltas):
+    """
+    Add `deltas` to the user's rollup rows, in the caller's transaction.
+
+    Costs one INSERT for rows that don't exist yet, one locking SELECT and one bulk UPDATE,
+    plus a DELETE if a count dropped to zero, however many emails the deltas came from.
+    """
+    deltas = {key: n for key, n in deltas.items() if n}
+    if not deltas:
+        return
+
+    # savepoint=False: callers already run inside the chunk's transaction
+    with transaction.atomic(savepoint=False):
+        EmailStat.objects.bulk_create(
+            [EmailStat(user=user, dimension=dimension, key=key) for dimension, key in deltas],
+            ignore_conflicts=True,
+        )
+        rows = list(
+            EmailStat.objects.select_for_update()
+            .filter(user=user, dimension__in={dimension for dimension, _ in deltas})
+            .filter(key__in={key for _, key in deltas})
+        )
+
+        changed, emptied = [], []
+        for row in rows:
+            n = deltas.get((row.dimension, row.key))
+            if n:
+                row.count += n
+                (changed if row.count > 0 else emptied).append(row)
+
+        if changed:
+            EmailStat.objects.bulk_update(changed, ["count"])
+        if emptied:
+            EmailStat.objects.filter(pk__in=[row.pk for row in emptied]).delete()
+
+
+def remove_emails(user: User, emails: QuerySet) -> int:
+    """
+    Delete some of a user's emails and subtract them from the rollups in the same transaction.
+
+    Also invalidates the user's cached reads.
+
+    Returns:
+        Number of emails deleted
+    """
+    with transaction.atomic():
+        deltas = removal_deltas(emails)
+        _, deleted = emails.delete()
+        apply_stat_deltas(user, deltas)
+        bump_data_version(user)
+
+    return deleted.get(JobEmail._meta.label, 0)
+
+
+def removal_deltas(emails: QuerySet) -> StatDeltas:
+    """Deltas taking `emails` out of the rollups, counted before they are deleted."""
+    return Counter({key: -n for key, n in _count_stats(emails).items()})
+
+
+def rebuild_email_stats(user: User) -> int:
+    """
+    Recount every rollup row of a user from their emails, e.g. after a bulk import that bypassed ingest.
+
+    Returns:
+        Number of rollup rows written
+    """
+    with transaction.atomic():
+        counts = _count_stats(JobEmail.objects.filter(user=user))
+        EmailStat.objects.filter(user=user).delete()
+        EmailStat.objects.bulk_create(
+            [EmailStat(user=user, dimension=dimension, key=key, count=n) for (dimension, key), n in counts.items() if n]
+        )
+        bump_data_version(user)
+
+    logger.info(f"Rebuilt {len(counts)} email stats for user {user.id}")
+    return len(counts)
+
+
+def get_email_stats(user: User, dimensions: Iterable[str] | None = None) -> dict:
+    """
+    A user's rollups as {"total": n, "label": {name: n}, "company": {domain: n}, "week": {monday: n}}.
+
+    Reads only the rollup rows, so it costs the same for ten emails as for a million.
+    """
+    dimensions = list(dimensions or Dimension.values)
+    stats = {dimension: {} for dimension in dimensions if dimension != Dimension.TOTAL}
+    if Dimension.TOTAL in dimensions:
+        stats[Dimension.TOTAL] = 0
+
+    rows = EmailStat.objects.filter(user=user, dimension__in=dimensions).order_by("dimension", "key")
+    for dimension, key, count in rows.values_list("dimension", "key", "count"):
+        if dimension == Dimension.TOTAL:
+            stats[dimension] = count
+        else:
+            stats[dimension][key] = count
+
+    return stats
+
+
+def _count_stats(emails: QuerySet) -> StatDeltas:
+    # GROUP BY over just these emails, so it's as cheap as the subset is small
+    counts = Counter()
+    emails = emails.order_by()
+
+    counts[Dimension.TOTAL, ""] = emails.count()
+    if not counts[Dimension.TOTAL, ""]:
+        return counts
+
+    for domain, n in emails.filter(company__isnull=False).values_list("company__domain").annotate(n=Count("id")):
+        counts[Dimension.COMPANY, domain] = n
+
+    weeks = emails.annotate(week=TruncWeek("received_at", tzinfo=UTC)).values_list("week").annotate(n=Count("id"))
+    for week, n in weeks:
+        counts[Dimension.WEEK, week_key(week)] += n
+
+    through = JobEmail.labels.through.objects.filter(jobemail__in=emails.values("id"))
+    for name, n in through.values_list("label__name").annotate(n=Count("id")).order_by():
+        counts[Dimension.LABEL, name] = n
+
+    return counts
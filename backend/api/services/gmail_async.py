@@ -0,0 +1,457 @@
+import asyncio
+import logging
+import threading
+from collections.abc import Callable, Coroutine, Iterator, Mapping
+from concurrent.futures import Future
+from functools import partial
+
+import aiohttp
+from django.conf import settings
+from django.db import connections
+from google.auth.transport.requests import Request
+
+from api.models import User
+from api.utils.gmail_message import GmailMessage
+
+from .gmail_service import (
+    HISTORY_TYPES,
+    MESSAGES_GET_UNITS,
+    HistoryExpiredError,
+    apply_history_records,
+    drop_known_message_ids,
+    get_creds,
+    get_rate_limiter,
+    iter_message_id_pages,
+)
+from .rate_limit import TokenBucket, backoff_delay
+
+logger = logging.getLogger(__name__)
+
+# seconds to connect, and to wait for each read of a response
+REQUEST_TIMEOUT = 60
+MAX_RETRIES = 3
+
+_METADATA_HEADERS = ["Subject", "From", "Date"]
+
+_loop: asyncio.AbstractEventLoop | None = None
+_loop_lock = threading.Lock()
+
+# (base url, size) -> HTTP session, only ever touched from the loop thread
+_sessions: dict[tuple[str, int], aiohttp.ClientSession] = {}
+
+
+class GmailApiError(Exception):
+    """Gmail answered with an error status (429 only once the retries ran out)."""
+
+    def __init__(self, status: int, body: bytes = b""):
+        super().__init__(f"Gmail API returned {status}: {body[:200].decode('utf-8', 'replace')}")
+        self.status = status
+
+
+class AsyncGmailClient:
+    """
+    One user's Gmail REST calls, the GMAIL_CLIENT_BACKEND = "async" alternative to gmail_service.
+
+    gmail_service multiplexes messages.get through googleapiclient batch requests, one blocking
+    thread per batch in flight. Here every call is a plain request on the shared event loop, up
+    to GMAIL_ASYNC_CONCURRENCY of them at once on pooled keep-alive connections, paced by the
+    user's token bucket and retried on 429 the same way.
+
+    The module's public functions are synchronous and mirror gmail_service. They read credentials
+    and query the DB in the caller's thread and only hand the HTTP work to the loop. A token that
+    expires mid-fetch is refreshed through refresh_token, in a worker thread.
+    """
+
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        token: str,
+        limiter: TokenBucket,
+        max_retries: int = MAX_RETRIES,
+        refresh_token: Callable[[str], str] | None = None,
+    ):
+        self.session = session
+        self.base_url = f"{settings.GMAIL_API_URL.rstrip('/')}/gmail/v1/users/me"
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self._token = token
+        self._refresh_token = refresh_token
+        self._refresh_lock = asyncio.Lock()
+
+    async def get_json(self, path: str, params: dict | None = None, units: float = 0) -> dict:
+        """
+        GET a Gmail API path, retrying 429s with Retry-After or jittered backoff and
+        a 401 once with a refreshed token.
+
+        Raises:
+            GmailApiError: Any other error status, or 429 on the last attempt
+        """
+        attempt = 0
+        refreshed = False
+        while True:
+            await self._acquire(units)
+            token = self._token
+            headers = {"Authorization": f"Bearer {token}"}
+            async with self.session.get(f"{self.base_url}{path}", params=params, headers=headers) as response:
+                if response.status < 400:
+                    return await response.json()
+                status, body, retry_after = response.status, await response.read(), _retry_after(response.headers)
+
+            if status == 401 and self._refresh_token and not refreshed:
+                # a long fetch outlives its token, AuthorizedHttp does the same for gmail_service
+                await self._refresh(token)
+                refreshed = True
+                continue
+            if status != 429 or attempt == self.max_retries - 1:
+                raise GmailApiError(status, body)
+
+            wait_time = backoff_delay(attempt, retry_after)
+            logger.warning(f"Rate limited on {path}, waiting {wait_time:.1f}s before retry {attempt + 2}")
+            # every request of this user backs off, not just the one that got the 429
+            self.limiter.pause(wait_time)
+            attempt += 1
+
+    async def get_message(self, msg_id: str) -> GmailMessage:
+        """messages.get in metadata format, cut down to a GmailMessage record."""
+        response = await self.get_json(
+            f"/messages/{msg_id}",
+            {"format": "metadata", "metadataHeaders": _METADATA_HEADERS},
+            units=MESSAGES_GET_UNITS,
+        )
+        return GmailMessage.from_response(response)
+
+    async def get_messages(self, message_ids: list[str], concurrency: int) -> tuple[list[GmailMessage], list[str]]:
+        """
+        Fetch messages with `concurrency` requests in flight.
+
+        Returns:
+            Tuple of (records in the given order, ids that failed after their retries)
+        """
+        results: list[GmailMessage | None] = [None] * len(message_ids)
+        failed_ids = []
+        pending = iter(enumerate(message_ids))
+
+        # a fixed set of workers pulling ids, instead of one task per id, keeps memory flat for huge lists
+        async def worker():
+            for index, msg_id in pending:
+                try:
+                    results[index] = await self.get_message(msg_id)
+                except GmailApiError as e:
+                    if e.status == 404:
+                        logger.info(f"Message {msg_id} was deleted before it could be fetched")
+                        continue
+                    if e.status != 429:
+                        logger.warning(f"Request error for message {msg_id}: {e}")
+                    failed_ids.append(msg_id)
+                except (aiohttp.ClientError, TimeoutError) as e:
+                    logger.warning(f"Request error for message {msg_id}: {e}")
+                    failed_ids.append(msg_id)
+
+        async with asyncio.TaskGroup() as tasks:
+            for _ in range(min(concurrency, len(message_ids))):
+                tasks.create_task(worker())
+
+        return [msg for msg in results if msg is not None], failed_ids
+
+    async def _refresh(self, rejected: str):
+        async with self._refresh_lock:
+            # every request the old token failed lands here, only the first one refreshes
+            if self._token == rejected:
+                self._token = await asyncio.to_thread(self._refresh_token, rejected)
+
+    async def _acquire(self, units: float):
+        while (wait := self.limiter.reserve(units)) > 0:
+            await asyncio.sleep(wait)
+
+
+def _retry_after(headers: Mapping[str, str]) -> float | None:
+    """Seconds from a Retry-After header, None when it is missing or an HTTP date."""
+    try:
+        return float(headers["retry-after"])
+    except (KeyError, ValueError):
+        return None
+
+
+def run(coro: Coroutine):
+    """Run a coroutine on the shared loop and wait for its result in the calling thread."""
+    return submit(coro).result()
+
+
+def submit(coro: Coroutine) -> Future:
+    """Start a coroutine on the shared loop without waiting, returns a concurrent.futures.Future."""
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop())
+
+
+def close_connections():
+    """Close the pooled connections, e.g. after tests pointed GMAIL_API_URL somewhere else."""
+    if _loop is not None:
+        run(_close_sessions())
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    # one loop for the life of the process, so pooled connections outlive a single call
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="gmail-async", daemon=True).start()
+        return _loop
+
+
+async def _close_sessions():
+    sessions = list(_sessions.values())
+    _sessions.clear()
+    for session in sessions:
+        await session.close()
+
+
+def _get_session() -> aiohttp.ClientSession:
+    # called on the loop, so the session and its connections belong to it
+    size = settings.GMAIL_ASYNC_CONCURRENCY
+    key = (settings.GMAIL_API_URL, size)
+    if key not in _sessions:
+        _sessions[key] = aiohttp.ClientSession(
+            headers={"Accept": "application/json"},
+            # a request holds its connection for the whole round trip, which is the concurrency limit
+            connector=aiohttp.TCPConnector(limit=size),
+            # waiting for a free connection is queueing like waiting for quota, it has no deadline
+            timeout=aiohttp.ClientTimeout(sock_connect=REQUEST_TIMEOUT, sock_read=REQUEST_TIMEOUT),
+        )
+    return _sessions[key]
+
+
+def _client(user: User) -> Callable[[], AsyncGmailClient]:
+    # credentials may hit the DB or refresh, so they are read here in the caller's thread
+    token = get_creds(user).token
+    limiter = get_rate_limiter(user)
+    return lambda: AsyncGmailClient(_get_session(), token, limiter, refresh_token=partial(_refreshed_token, user))
+
+
+def _refreshed_token(user: User, rejected: str) -> str:
+    """A token to replace one Gmail answered 401 to, runs in a worker thread."""
+    try:
+        creds = get_creds(user)
+        if creds.token == rejected:
+            # still the cached token, e.g. revoked before its expiry
+            creds.refresh(Request())
+        return creds.token
+    finally:
+        connections.close_all()
+
+
+def list_message_ids(
+    user: User,
+    max_results: int = 100,
+    page_token: str | None = None,
+    label_ids: list[str] | None = None,
+    query: str | None = None,
+) -> dict:
+    """
+    List message IDs from Gmail, see gmail_service.list_message_ids.
+
+    Raises:
+        GmailApiError: Gmail answered with an error status
+    """
+    params = {"maxResults": min(max_results, 500)}
+    if page_token:
+        params["pageToken"] = page_token
+    if label_ids:
+        params["labelIds"] = label_ids
+    if query:
+        params["q"] = query
+
+    client = _client(user)
+
+    async def list_page():
+        return await client().get_json("/messages", params)
+
+    return run(list_page())
+
+
+def get_current_history_id(user: User) -> str:
+    """Get the mailbox's current historyId from the user's Gmail profile."""
+    client = _client(user)
+
+    async def get_profile():
+        return await client().get_json("/profile")
+
+    return run(get_profile())["historyId"]
+
+
+def fetch_history_changes(user: User, start_history_id: str) -> dict:
+    """
+    Collect message changes since a historyId, see gmail_service.fetch_history_changes.
+
+    Raises:
+        HistoryExpiredError: Gmail no longer has history that far back
+    """
+    client = _client(user)
+
+    async def fetch():
+        gmail = client()
+        changed = {}  # dict as an ordered set
+        deleted = set()
+        history_id = start_history_id
+        params = {"startHistoryId": start_history_id, "historyTypes": HISTORY_TYPES}
+
+        while True:
+            try:
+                results = await gmail.get_json("/history", params)
+            except GmailApiError as e:
+                if e.status == 404:
+                    raise HistoryExpiredError(f"History {start_history_id} expired for user {user.id}") from e
+                raise
+
+            apply_history_records(results.get("history", []), changed, deleted)
+
+            history_id = results.get("historyId", history_id)
+            if not results.get("nextPageToken"):
+                return {"changed": list(changed), "deleted": list(deleted), "history_id": history_id}
+            params["pageToken"] = results["nextPageToken"]
+
+    changes = run(fetch())
+    logger.info(
+        f"History since {start_history_id}: {len(changes['changed'])} changed, {len(changes['deleted'])} deleted"
+    )
+    return changes
+
+
+def fetch_message_details(
+    user: User, message_ids: list[str], concurrency: int | None = None
+) -> tuple[list[GmailMessage], list[str]]:
+    """
+    Fetch message details, reporting the IDs that could not be fetched instead of dropping them.
+
+    IDs still failing after their retries get one more pass at the end, at a quarter of
+    the concurrency.
+
+    Args:
+        user: User to fetch messages for
+        message_ids: List of Gmail message IDs
+        concurrency: Requests in flight at once, defaults to GMAIL_ASYNC_CONCURRENCY
+
+    Returns:
+        Tuple of (GmailMessage records in listing order, unfetched message IDs)
+    """
+    messages, failed_ids = submit_message_details(user, message_ids, concurrency).result()
+
+    logger.info(f"Successfully fetched {len(messages)} out of {len(message_ids)} emails")
+    if failed_ids:
+        logger.error(f"Gave up on {len(failed_ids)} messages: {failed_ids}")
+    return messages, failed_ids
+
+
+def submit_message_details(user: User, message_ids: list[str], concurrency: int | None = None) -> Future:
+    """Start fetch_message_details on the loop and return its future, so the caller can do something else."""
+    client = _client(user)
+    concurrency = concurrency or settings.GMAIL_ASYNC_CONCURRENCY
+
+    async def fetch():
+        gmail = client()
+        messages, failed_ids = await gmail.get_messages(message_ids, concurrency)
+        if failed_ids:
+            logger.warning(f"Retrying {len(failed_ids)} failed messages")
+            retried, failed_ids = await gmail.get_messages(failed_ids, max(1, concurrency // 4))
+            # the retried ones were listed in between, put everything back in listing order
+            order = {msg_id: index for index, msg_id in enumerate(message_ids)}
+            messages = sorted(messages + retried, key=lambda msg: order[msg.id])
+        return messages, failed_ids
+
+    return submit(fetch())
+
+
+def fetch_message_details_batch(
+    user: User, message_ids: list[str], unfetched: list[str] | None = None
+) -> list[GmailMessage]:
+    """Fetch message details, extending unfetched with the IDs that could not be fetched."""
+    messages, failed_ids = fetch_message_details(user, message_ids)
+    if unfetched is not None:
+        unfetched.extend(failed_ids)
+    return messages
+
+
+def fetch_emails_from_gmail(
+    user: User,
+    max_results: int = 100,
+    label_ids: list[str] | None = None,
+    query: str | None = None,
+    refresh: bool = False,
+    unfetched: list[str] | None = None,
+    cursor: dict | None = None,
+) -> list[GmailMessage]:
+    """
+    Fetch one page of emails from Gmail, see gmail_service.fetch_emails_from_gmail.
+
+    Returns:
+        List of GmailMessage records, empty on an API error
+    """
+    try:
+        results = list_message_ids(
+            user,
+            max_results=min(max_results, 500),
+            page_token=cursor.get("page_token") if cursor else None,
+            label_ids=label_ids,
+            query=query,
+        )
+        message_ids = [msg["id"] for msg in results.get("messages", [])]
+        if cursor is not None:
+            cursor.update(page_token=results.get("nextPageToken"), listed=len(message_ids))
+        if message_ids and not refresh:
+            message_ids = drop_known_message_ids(user, message_ids)
+
+        if not message_ids:
+            return []
+
+        return fetch_message_details_batch(user, message_ids, unfetched)
+
+    except (GmailApiError, aiohttp.ClientError, TimeoutError) as error:
+        logger.error(f"Gmail API error: {error}")
+        if cursor is not None:
+            cursor["error"] = str(error)
+        return []
+
+
+def stream_emails(
+    user: User,
+    total_count: int,
+    progress_callback: Callable | None = None,
+    label_ids: list[str] | None = None,
+    query: str | None = None,
+    refresh: bool = False,
+    unfetched: list[str] | None = None,
+    cursor: dict | None = None,
+) -> Iterator[list[GmailMessage]]:
+    """
+    Stream emails page by page, see gmail_service.stream_emails.
+
+    A page's details are fetched on the loop while the next page is listed and while the
+    caller stores the page before it, so at most two pages of records are held at once.
+
+    Yields:
+        Lists of GmailMessage records, one per listed page
+    """
+    pages = iter_message_id_pages(
+        user, total_count, progress_callback, label_ids, query, refresh, list_func=list_message_ids, cursor=cursor
+    )
+
+    def result(fetched: Future) -> list[GmailMessage]:
+        messages, failed_ids = fetched.result()
+        if unfetched is not None:
+            unfetched.extend(failed_ids)
+        return messages
+
+    in_flight = None
+    try:
+        for message_ids in pages:
+            fetching = submit_message_details(user, message_ids)
+            if in_flight:
+                yield result(in_flight)
+            in_flight = fetching
+
+        if in_flight:
+            yield result(in_flight)
+            in_flight = None
+    finally:
+        # the consumer went away, don't leave a page downloading for no one
+        if in_flight:
+            in_flight.cancel()
@@ -1,10 +1,15 @@
 import json
 import logging
 import os.path
-import time
-from collections.abc import Callable
+import queue
+import threading
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import UTC, datetime, timedelta
+from functools import cache
 
 from django.conf import settings
+from django.db import connections
 from google.auth.exceptions import RefreshError
 from google.auth.transport.requests import Request
 from google.cloud import secretmanager
@@ -13,20 +18,103 @@ from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
-from api.models import GoogleAuthToken, User
+from api.models import GmailSyncState, GoogleAuthToken, JobEmail, User
+from api.utils.gmail_message import GmailMessage
+
+from .gmail_transport import close_thread_http, get_authorized_http
+from .rate_limit import AIMDController, TokenBucket, backoff_delay
 
 SCOPES = ["https://www.googleapis.com/auth/gmail.metadata"]
+HISTORY_TYPES = ["messageAdded", "messageDeleted", "labelAdded", "labelRemoved"]
+STREAM_PREFETCH = 2
+CREDENTIALS_EXPIRY_MARGIN = timedelta(minutes=5)
+
+# https://developers.google.com/workspace/gmail/api/reference/quota
+MESSAGES_GET_UNITS = 5
+USER_QUOTA_UNITS_PER_SECOND = 250
+
+# starting point for users without learned fetch settings, and the most workers the controller may use
+FETCH_BATCH_SIZE = 50
+FETCH_WORKER_LIMIT = 8
+
 logger = logging.getLogger(__name__)
 
+_credentials_cache: dict[int, Credentials] = {}
+_credentials_locks: dict[int, threading.Lock] = {}
+_credentials_locks_lock = threading.Lock()
+
+_services = threading.local()
+
+_fetch_pool: ThreadPoolExecutor | None = None
+_fetch_pool_lock = threading.Lock()
+
+_rate_limiters: dict[int, TokenBucket] = {}
+_rate_limiters_lock = threading.Lock()
+
+# user id -> (batch size, workers) learned by fetches and not written to GmailSyncState yet
+_fetch_tuning: dict[int, tuple[int, int]] = {}
+_fetch_tuning_lock = threading.Lock()
+
+
+class HistoryExpiredError(Exception):
+    """The stored historyId is too old for users.history.list, a full sync is needed."""
+
 
 def get_creds(user: User) -> Credentials:
+    """
+    Get valid Gmail credentials for a user, cached per process.
+
+    Cached credentials are reused until CREDENTIALS_EXPIRY_MARGIN before they expire, so a long
+    sync doesn't hit the DB and decrypt the token for every page and batch. Loading and refreshing
+    is single-flight per user: concurrent workers wait for one refresh instead of all calling the
+    token endpoint.
+    """
+    creds = _credentials_cache.get(user.pk)
+    if creds and _is_fresh(creds):
+        return creds
+
+    with _credentials_lock(user.pk):
+        # another worker may have refreshed while we waited for the lock
+        creds = _credentials_cache.get(user.pk)
+        if creds and _is_fresh(creds):
+            return creds
+
+        creds = _load_creds(user)
+        _credentials_cache[user.pk] = creds
+        return creds
+
+
+def clear_credentials_cache(user: User | None = None):
+    """Drop cached credentials for one user, or for everyone."""
+    if user is None:
+        _credentials_cache.clear()
+    else:
+        _credentials_cache.pop(user.pk, None)
+
+
+def _credentials_lock(user_id: int) -> threading.Lock:
+    with _credentials_locks_lock:
+        return _credentials_locks.setdefault(user_id, threading.Lock())
+
+
+def _is_fresh(creds: Credentials) -> bool:
+    if not creds.valid:
+        return False
+    if creds.expiry is None:
+        return True
+    # google-auth keeps expiry as naive UTC
+    return creds.expiry - datetime.now(UTC).replace(tzinfo=None) > CREDENTIALS_EXPIRY_MARGIN
+
+
+def _load_creds(user: User) -> Credentials:
     auth_record = GoogleAuthToken.objects.filter(user=user).first()
     creds = None
 
     if auth_record:
         creds = Credentials.from_authorized_user_info(json.loads(auth_record.token_json), SCOPES)
 
-    if creds and not creds.valid and creds.expired and creds.refresh_token:
+    # refresh a bit early too, so cached credentials don't expire in the middle of a sync
+    if creds and not _is_fresh(creds) and creds.refresh_token:
         try:
             creds.refresh(Request())
             auth_record.token_json = creds.to_json()
@@ -44,6 +132,7 @@ def get_creds(user: User) -> Credentials:
     return creds
 
 
+@cache
 def get_client_config():
     path = getattr(settings, "GMAIL_CREDENTIALS_PATH", "credentials.json")
     if os.path.exists(path):
@@ -61,6 +150,33 @@ def get_client_config():
     raise FileNotFoundError("No client credentials found in JSON or GSM.")
 
 
+def get_gmail_service(user: User, creds: Credentials | None = None):
+    """
+    Get a Gmail API service for the user, built once and reused for the rest of the sync.
+
+    build() re-reads and re-parses the discovery document every call, which used to happen for
+    every listed page and every batch. Services are cached per thread, googleapiclient services
+    are not thread-safe, and rebuilt when the user's credentials object changes (e.g. after a
+    refresh replaced it). Requests go over the thread's pooled keep-alive transport.
+    """
+    creds = creds or get_creds(user)
+    services = _services.__dict__.setdefault("by_user", {})
+
+    cached = services.get(user.pk)
+    if cached and cached[0] is creds:
+        return cached[1]
+
+    # the bundled discovery doc, no network fetch and no file cache warnings
+    service = build("gmail", "v1", http=get_authorized_http(creds), static_discovery=True, cache_discovery=False)
+    services[user.pk] = (creds, service)
+    return service
+
+
+def clear_service_cache():
+    """Forget the Gmail services cached for the current thread."""
+    _services.__dict__.pop("by_user", None)
+
+
 def list_message_ids(
     user: User,
     max_results: int = 100,
@@ -81,8 +197,7 @@ def list_message_ids(
     Returns:
         Dict with 'messages' list and optional 'nextPageToken'
     """
-    creds = get_creds(user)
-    service = build("gmail", "v1", credentials=creds)
+    service = get_gmail_service(user)
 
     max_results = min(max_results, 500)
 
@@ -101,30 +216,151 @@ def list_message_ids(
     return results
 
 
-def _execute_batch_with_retry(service, message_ids: list[str]) -> tuple[list[dict], list[str]]:
+def get_current_history_id(user: User) -> str:
+    """
+    Get the mailbox's current historyId from the user's Gmail profile.
+
+    Read it before a full sync starts so changes made during the sync are replayed
+    by the next incremental run instead of being missed.
+    """
+    service = get_gmail_service(user)
+
+    profile = service.users().getProfile(userId="me").execute()
+    return profile["historyId"]
+
+
+def fetch_history_changes(user: User, start_history_id: str) -> dict:
+    """
+    Collect message changes since a historyId using users.history.list.
+
+    Args:
+        user: User to fetch changes for
+        start_history_id: historyId stored by the previous sync
+
+    Returns:
+        Dict with 'changed' message IDs (added or relabeled, need a fresh fetch),
+        'deleted' message IDs and the latest 'history_id' to checkpoint
+
+    Raises:
+        HistoryExpiredError: Gmail no longer has history that far back
+    """
+    service = get_gmail_service(user)
+
+    changed = {}  # dict as an ordered set
+    deleted = set()
+    history_id = start_history_id
+    page_token = None
+
+    while True:
+        params = {"userId": "me", "startHistoryId": start_history_id, "historyTypes": HISTORY_TYPES}
+        if page_token:
+            params["pageToken"] = page_token
+
+        try:
+            results = service.users().history().list(**params).execute()
+        except HttpError as e:
+            if e.resp.status == 404:
+                raise HistoryExpiredError(f"History {start_history_id} expired for user {user.id}") from e
+            raise
+
+        apply_history_records(results.get("history", []), changed, deleted)
+
+        history_id = results.get("historyId", history_id)
+        page_token = results.get("nextPageToken")
+        if not page_token:
+            break
+
+    logger.info(f"History since {start_history_id}: {len(changed)} changed, {len(deleted)} deleted")
+    return {"changed": list(changed), "deleted": list(deleted), "history_id": history_id}
+
+
+def apply_history_records(records: list[dict], changed: dict, deleted: set):
+    """
+    Fold one page of users.history.list records into the changed and deleted message IDs.
+
+    Args:
+        records: The page's "history" list
+        changed: Message IDs to fetch again, a dict used as an ordered set, updated in place
+        deleted: Message IDs to delete, updated in place
+    """
+    # records come oldest first, so a later delete wins over an earlier add and vice versa
+    for record in records:
+        for entry in record.get("messagesAdded", []):
+            msg_id = entry["message"]["id"]
+            deleted.discard(msg_id)
+            changed[msg_id] = None
+
+        for key in ("labelsAdded", "labelsRemoved"):
+            for entry in record.get(key, []):
+                msg_id = entry["message"]["id"]
+                if msg_id not in deleted:
+                    changed[msg_id] = None
+
+        for entry in record.get("messagesDeleted", []):
+            msg_id = entry["message"]["id"]
+            changed.pop(msg_id, None)
+            deleted.add(msg_id)
+
+
+def drop_known_message_ids(user: User, message_ids: list[str]) -> list[str]:
+    """
+    Remove IDs that are already stored for the user, keeping the listing order.
+
+    One indexed gmail_id IN (...) query per call, callers pass one listed page at a time.
+    """
+    if not message_ids:
+        return message_ids
+
+    known = set(JobEmail.objects.filter(user=user, gmail_id__in=message_ids).values_list("gmail_id", flat=True))
+    if known:
+        logger.info(f"Skipping {len(known)} already stored messages")
+    return [msg_id for msg_id in message_ids if msg_id not in known]
+
+
+def _retry_after(exception: HttpError) -> float | None:
+    """Seconds from a Retry-After header, None when it is missing or an HTTP date."""
+    value = exception.resp.get("retry-after") if hasattr(exception.resp, "get") else None
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _execute_batch_with_retry(service, message_ids: list[str]) -> tuple[list[GmailMessage], list[str], float | None]:
     """
     Execute a batch request with error handling.
 
+    Responses are cut down to GmailMessage records as they arrive, so the full response
+    dicts never pile up while the rest of the batch is read. Every message that errored is
+    reported as failed, except 404s: those were deleted after they were listed.
+
     Args:
         service: Gmail API service
         message_ids: List of message IDs to fetch
 
     Returns:
-        Tuple of (successful_responses, failed_message_ids)
+        Tuple of (messages, failed_message_ids, retry_after), retry_after being
+        the longest Retry-After Gmail sent with the errors, if any
     """
     batch = service.new_batch_http_request()
     batch_responses = []
     failed_message_ids = []
+    retry_afters = []
 
     def create_callback(msg_id):
         def callback(request_id, response, exception):
             if exception is not None:
-                if isinstance(exception, HttpError) and exception.resp.status == 429:
-                    failed_message_ids.append(msg_id)
-                else:
-                    logger.error(f"Batch request error for message {msg_id}: {exception}")
+                is_http_error = isinstance(exception, HttpError)
+                status = exception.resp.status if is_http_error else None
+                if status == 404:
+                    logger.info(f"Message {msg_id} was deleted before it could be fetched")
+                    return
+                if status != 429:
+                    logger.warning(f"Batch request error for message {msg_id}: {exception}")
+                failed_message_ids.append(msg_id)
+                retry_afters.append(_retry_after(exception) if is_http_error else None)
             else:
-                batch_responses.append(response)
+                batch_responses.append(GmailMessage.from_response(response))
 
         return callback
 
@@ -138,69 +374,235 @@ def _execute_batch_with_retry(service, message_ids: list[str]) -> tuple[list[dic
 
     batch.execute()
 
-    return batch_responses, failed_message_ids
+    retry_after = max((seconds for seconds in retry_afters if seconds is not None), default=None)
+    return batch_responses, failed_message_ids, retry_after
+
+
+def get_rate_limiter(user: User) -> TokenBucket:
+    """Per-user token bucket shared by every fetch in this process, Gmail's quota is per user."""
+    with _rate_limiters_lock:
+        if user.pk not in _rate_limiters:
+            _rate_limiters[user.pk] = TokenBucket(USER_QUOTA_UNITS_PER_SECOND)
+        return _rate_limiters[user.pk]
+
 
+def get_fetch_controller(user: User, max_workers: int | None = None) -> AIMDController:
+    """Start from the batch size and concurrency this user's account settled at last time."""
+    worker_limit = max_workers or FETCH_WORKER_LIMIT
 
-def fetch_message_details_batch(user: User, message_ids: list[str]) -> list[dict]:
+    with _fetch_tuning_lock:
+        learned = _fetch_tuning.get(user.pk)
+    if learned:
+        return AIMDController(*learned, max_workers=worker_limit)
+
+    sync_state = GmailSyncState.objects.filter(user=user).first()
+    if sync_state:
+        return AIMDController(sync_state.fetch_batch_size, sync_state.fetch_workers, max_workers=worker_limit)
+
+    default_workers = getattr(settings, "GMAIL_FETCH_WORKERS", 1)
+    return AIMDController(FETCH_BATCH_SIZE, default_workers, max_workers=worker_limit)
+
+
+def save_fetch_tuning(user: User) -> bool:
     """
-    Fetch full message details for a list of message IDs using batch requests.
+    Store the batch size and concurrency the user's fetches settled at, if they changed.
+
+    Fetches only remember them in memory: under stream_emails they run in the fetch stage's
+    thread while the caller holds the ingest write transaction, and a second writer there
+    fails on SQLite ("database is locked"). Call this from the ingesting thread once the
+    fetches are done.
+
+    Returns:
+        Whether anything was written
+    """
+    with _fetch_tuning_lock:
+        learned = _fetch_tuning.pop(user.pk, None)
+    if not learned:
+        return False
+
+    batch_size, workers = learned
+    GmailSyncState.objects.update_or_create(
+        user=user, defaults={"fetch_batch_size": batch_size, "fetch_workers": workers}
+    )
+    return True
+
+
+def clear_fetch_tuning():
+    """Forget fetch settings learned but not saved yet, for every user."""
+    with _fetch_tuning_lock:
+        _fetch_tuning.clear()
+
+
+def _fetch_batch(
+    service, batch_ids: list[str], limiter: TokenBucket, controller: AIMDController, max_retries: int = 3
+) -> tuple[list[GmailMessage], list[str]]:
+    """
+    Fetch one batch of messages, retrying failed ones with Retry-After or jittered backoff.
+
+    Returns:
+        Tuple of (messages, ids_still_failing_after_all_retries)
+    """
+    messages = []
+    remaining_ids = batch_ids
+
+    for attempt in range(max_retries):
+        limiter.acquire(len(remaining_ids) * MESSAGES_GET_UNITS)
+        try:
+            batch_results, failed_ids, retry_after = _execute_batch_with_retry(service, remaining_ids)
+            messages.extend(batch_results)
+            controller.record(rate_limited=bool(failed_ids))
+
+            if not failed_ids:
+                return messages, []
+
+            remaining_ids = failed_ids
+            if attempt < max_retries - 1:
+                wait_time = backoff_delay(attempt, retry_after)
+                logger.warning(
+                    f"{len(failed_ids)} requests failed, "
+                    f"waiting {wait_time:.1f}s before retry {attempt + 2}/{max_retries}"
+                )
+                # every worker of this user backs off, not just the one that got the 429
+                limiter.pause(wait_time)
+
+        except HttpError as e:
+            # the whole batch failed, 429 or a transient 5xx alike: back off and send it again
+            controller.record(rate_limited=True)
+            if attempt < max_retries - 1:
+                wait_time = backoff_delay(attempt, _retry_after(e))
+                logger.warning(f"Batch-level error {e.resp.status}, waiting {wait_time:.1f}s...")
+                limiter.pause(wait_time)
+            else:
+                logger.error(f"Batch-level error: {e}")
+
+    return messages, remaining_ids
+
+
+def fetch_message_details(
+    user: User, message_ids: list[str], max_workers: int | None = None
+) -> tuple[list[GmailMessage], list[str]]:
+    """
+    Fetch message details, reporting the IDs that could not be fetched instead of dropping them.
+
+    Batch size and the number of batches in flight are driven by an AIMD controller: they grow
+    while Gmail answers cleanly and halve on 429s and other errors. The learned values are kept
+    per user for the next call, the caller stores them with save_fetch_tuning. Requests are
+    paced by the user's token bucket, and IDs still failing after their retries get one more
+    pass at the end, once the controller has backed off.
 
     Args:
         user: User to fetch messages for
         message_ids: List of Gmail message IDs
+        max_workers: Upper bound for batches in flight at once, defaults to FETCH_WORKER_LIMIT
 
     Returns:
-        List of message detail dictionaries
+        Tuple of (GmailMessage records in listing order, unfetched message IDs)
     """
     creds = get_creds(user)
-    service = build("gmail", "v1", credentials=creds)
+    limiter = get_rate_limiter(user)
+    controller = get_fetch_controller(user, max_workers)
+    start_batch_size, start_workers = controller.batch_size, controller.workers
+
+    def fetch(batch_ids):
+        return _fetch_batch(get_gmail_service(user, creds), batch_ids, limiter, controller)
+
+    all_messages, failed_ids = _run_adaptive_batches(message_ids, fetch, controller)
+    if failed_ids:
+        logger.warning(f"Retrying {len(failed_ids)} failed messages at batch size {controller.batch_size}")
+        retried_messages, failed_ids = _run_adaptive_batches(failed_ids, fetch, controller)
+        all_messages.extend(retried_messages)
+
+    if (controller.batch_size, controller.workers) != (start_batch_size, start_workers):
+        logger.info(
+            f"Fetch tuning for user {user.id}: batch size {controller.batch_size}, {controller.workers} workers"
+        )
+        # saved by the caller through save_fetch_tuning, this may be a fetch thread next to a write transaction
+        with _fetch_tuning_lock:
+            _fetch_tuning[user.pk] = (controller.batch_size, controller.workers)
 
-    all_messages = []
-    batch_size = 50
-    max_retries = 3
+    logger.info(f"Successfully fetched {len(all_messages)} out of {len(message_ids)} emails")
+    if failed_ids:
+        logger.error(f"Gave up on {len(failed_ids)} messages: {failed_ids}")
 
-    for i in range(0, len(message_ids), batch_size):
-        batch_ids = message_ids[i : i + batch_size]
-        remaining_ids = batch_ids
+    return all_messages, failed_ids
 
-        for attempt in range(max_retries):
-            try:
-                batch_results, failed_ids = _execute_batch_with_retry(service, remaining_ids)
-                all_messages.extend(batch_results)
-
-                if not failed_ids:
-                    break
-
-                if attempt < max_retries - 1:
-                    wait_time = 2**attempt
-                    logger.warning(
-                        f"{len(failed_ids)} requests hit rate limit, "
-                        f"waiting {wait_time}s before retry {attempt + 2}/{max_retries}"
-                    )
-                    time.sleep(wait_time)
-                    remaining_ids = failed_ids
-                else:
-                    logger.error(f"Failed to fetch {len(failed_ids)} messages after {max_retries} attempts")
-
-            except HttpError as e:
-                if e.resp.status != 429:
-                    logger.error(f"Non-rate-limit error: {e}")
-                    break
-                if attempt < max_retries - 1:
-                    wait_time = 2**attempt
-                    logger.warning(f"Batch-level rate limit, waiting {wait_time}s...")
-                    time.sleep(wait_time)
-
-        if i + batch_size < len(message_ids):
-            time.sleep(1)
 
-    logger.info(f"Successfully fetched {len(all_messages)} out of {len(message_ids)} emails")
-    return all_messages
+def fetch_message_details_batch(
+    user: User, message_ids: list[str], max_workers: int | None = None, unfetched: list[str] | None = None
+) -> list[GmailMessage]:
+    """
+    Fetch full message details for a list of message IDs using batch requests.
+    See fetch_message_details for how batches are sized and paced.
+
+    Args:
+        user: User to fetch messages for
+        message_ids: List of Gmail message IDs
+        max_workers: Upper bound for batches in flight at once
+        unfetched: Extended with the IDs that could not be fetched
+
+    Returns:
+        List of GmailMessage records
+    """
+    messages, failed_ids = fetch_message_details(user, message_ids, max_workers)
+    if unfetched is not None:
+        unfetched.extend(failed_ids)
+    return messages
+
+
+def _run_adaptive_batches(
+    message_ids: list[str], fetch: Callable, controller: AIMDController
+) -> tuple[list[GmailMessage], list[str]]:
+    """
+    Carve message_ids into batches of the controller's current size, keeping up to
+    controller.workers of them in flight. Results come back in listing order.
+    """
+    # a single batch runs right here and reuses the service the listing call already built
+    if len(message_ids) <= controller.batch_size:
+        return fetch(message_ids)
+
+    pool = _get_fetch_pool()
+    results = {}
+    failed_ids = []
+    offset = 0
+    in_flight = {}
+
+    while offset < len(message_ids) or in_flight:
+        while offset < len(message_ids) and len(in_flight) < controller.workers:
+            batch_ids = message_ids[offset : offset + controller.batch_size]
+            in_flight[pool.submit(fetch, batch_ids)] = offset
+            offset += len(batch_ids)
+
+        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+        for future in done:
+            messages, batch_failed_ids = future.result()
+            results[in_flight.pop(future)] = messages
+            failed_ids.extend(batch_failed_ids)
+
+    all_messages = [msg for start in sorted(results) for msg in results[start]]
+    return all_messages, failed_ids
+
+
+def _get_fetch_pool() -> ThreadPoolExecutor:
+    """
+    Process-wide fetch threads. They outlive a single call so each keeps its cached Gmail
+    service from one page to the next instead of building a new one per call.
+    """
+    global _fetch_pool
+    with _fetch_pool_lock:
+        if _fetch_pool is None:
+            _fetch_pool = ThreadPoolExecutor(max_workers=FETCH_WORKER_LIMIT, thread_name_prefix="gmail-fetch")
+        return _fetch_pool
 
 
 def fetch_emails_from_gmail(
-    user: User, max_results: int = 100, label_ids: list[str] | None = None, query: str | None = None
-) -> list[dict]:
+    user: User,
+    max_results: int = 100,
+    label_ids: list[str] | None = None,
+    query: str | None = None,
+    refresh: bool = False,
+    unfetched: list[str] | None = None,
+    cursor: dict | None = None,
+) -> list[GmailMessage]:
     """
     Fetch emails from Gmail with rate limiting and retry logic.
     Does NOT handle pagination, use fetch_total_emails for large counts.
@@ -210,47 +612,74 @@ def fetch_emails_from_gmail(
         max_results: Maximum number of emails to fetch (up to 500)
         label_ids: List of label IDs to filter by
         query: Gmail search query string
+        refresh: Fetch details for already stored messages too instead of skipping them
+        unfetched: Extended with the listed IDs whose details could not be fetched
+        cursor: Listing position, see iter_message_id_pages
 
     Returns:
-        List of email message dictionaries
+        List of GmailMessage records
     """
     try:
-        results = list_message_ids(user, max_results=min(max_results, 500), label_ids=label_ids, query=query)
+        results = list_message_ids(
+            user,
+            max_results=min(max_results, 500),
+            page_token=cursor.get("page_token") if cursor else None,
+            label_ids=label_ids,
+            query=query,
+        )
         messages = results.get("messages", [])
+        if cursor is not None:
+            cursor.update(page_token=results.get("nextPageToken"), listed=len(messages))
 
         if not messages:
             return []
 
         message_ids = [msg["id"] for msg in messages]
-        return fetch_message_details_batch(user, message_ids)
+        if not refresh:
+            message_ids = drop_known_message_ids(user, message_ids)
+
+        if not message_ids:
+            return []
+
+        return fetch_message_details_batch(user, message_ids, unfetched=unfetched)
 
     except HttpError as error:
         logger.error(f"Gmail API error: {error}")
+        if cursor is not None:
+            cursor["error"] = str(error)
         return []
 
 
-def fetch_total_emails(
+def iter_message_id_pages(
     user: User,
     total_count: int,
     progress_callback: Callable | None = None,
     label_ids: list[str] | None = None,
     query: str | None = None,
-) -> list[dict]:
+    refresh: bool = False,
+    list_func: Callable | None = None,
+    cursor: dict | None = None,
+) -> Iterator[list[str]]:
     """
-    Fetch a specific total number of emails using pagination.
+    Page through messages.list, yielding each page of message IDs as soon as it is listed.
 
     Args:
         user: User to fetch emails for
-        total_count: Total number of emails to fetch
+        total_count: Total number of message IDs to list
         progress_callback: Optional callback function called with (current, total)
         label_ids: List of label IDs to filter by
         query: Gmail search query string
-
-    Returns:
-        List of all fetched email dictionaries
+        refresh: Keep already stored messages instead of skipping them
+        list_func: Lists one page, same signature as list_message_ids (the default)
+        cursor: Listing position. Listing starts at cursor["page_token"] when set, and the
+                cursor is kept at the next page's token (None at the end of the mailbox),
+                with cursor["listed"] counting the IDs listed so far. A listing error stops the
+                pages early and is kept in cursor["error"], the token stays at the failed page
+
+    Yields:
+        Lists of message IDs, one per listed page, already stored ones removed unless refresh
     """
-    all_message_ids = []
-    page_token = None
+    page_token = cursor.get("page_token") if cursor else None
     fetched_count = 0
 
     logger.info(f"Collecting message IDs for {total_count} emails...")
@@ -260,33 +689,169 @@ def fetch_total_emails(
         batch_size = min(remaining, 500)
 
         try:
-            results = list_message_ids(
+            results = (list_func or list_message_ids)(
                 user, max_results=batch_size, page_token=page_token, label_ids=label_ids, query=query
             )
             messages = results.get("messages", [])
 
             if not messages:
                 logger.info(f"No more messages available. Got {fetched_count} total.")
+                if cursor is not None:
+                    cursor.update(page_token=None, listed=fetched_count)
                 break
 
             message_ids = [msg["id"] for msg in messages]
-            all_message_ids.extend(message_ids)
             fetched_count += len(message_ids)
 
+            # known IDs still count towards total_count, it is the window we list that matters
+            if not refresh:
+                message_ids = drop_known_message_ids(user, message_ids)
+
             if progress_callback:
                 progress_callback(fetched_count, total_count)
 
             page_token = results.get("nextPageToken")
-            if not page_token:
-                logger.info(f"Reached end of mailbox. Got {fetched_count} total emails.")
-                break
+            if cursor is not None:
+                cursor.update(page_token=page_token, listed=fetched_count)
 
         except Exception as e:
             logger.error(f"Error fetching message IDs: {e}")
+            # the listing stopped short, this is not the end of the mailbox
+            if cursor is not None:
+                cursor["error"] = str(e)
+            break
+
+        if message_ids:
+            yield message_ids
+
+        if not page_token:
+            logger.info(f"Reached end of mailbox. Got {fetched_count} total emails.")
             break
 
+
+def fetch_total_emails(
+    user: User,
+    total_count: int,
+    progress_callback: Callable | None = None,
+    label_ids: list[str] | None = None,
+    query: str | None = None,
+    refresh: bool = False,
+    unfetched: list[str] | None = None,
+) -> list[GmailMessage]:
+    """
+    Fetch a specific total number of emails using pagination.
+    Holds every message in memory, use stream_emails for large counts.
+
+    Args:
+        user: User to fetch emails for
+        total_count: Total number of emails to fetch
+        progress_callback: Optional callback function called with (current, total)
+        label_ids: List of label IDs to filter by
+        query: Gmail search query string
+        refresh: Fetch details for already stored messages too instead of skipping them
+        unfetched: Extended with the listed IDs whose details could not be fetched
+
+    Returns:
+        List of all fetched GmailMessage records
+    """
+    pages = iter_message_id_pages(user, total_count, progress_callback, label_ids, query, refresh)
+    all_message_ids = [msg_id for page in pages for msg_id in page]
+
     logger.info(f"Collected {len(all_message_ids)} message IDs. Now fetching details...")
 
-    all_emails = fetch_message_details_batch(user, all_message_ids)
+    all_emails = fetch_message_details_batch(user, all_message_ids, unfetched=unfetched)
 
     return all_emails
+
+
+def stream_emails(
+    user: User,
+    total_count: int,
+    progress_callback: Callable | None = None,
+    label_ids: list[str] | None = None,
+    query: str | None = None,
+    refresh: bool = False,
+    prefetch: int = STREAM_PREFETCH,
+    unfetched: list[str] | None = None,
+    cursor: dict | None = None,
+) -> Iterator[list[GmailMessage]]:
+    """
+    Stream emails page by page: list -> fetch details -> yield, instead of collecting everything first.
+
+    Listing and detail fetching each run in their own thread, connected by bounded queues,
+    so the caller can parse and persist one page while the next ones are on the wire.
+    Memory stays at roughly prefetch pages per stage no matter how big the mailbox is.
+
+    Args:
+        user: User to fetch emails for
+        total_count: Total number of emails to fetch
+        progress_callback: Optional callback called with (current, total) from the listing thread
+        label_ids: List of label IDs to filter by
+        query: Gmail search query string
+        refresh: Fetch details for already stored messages too instead of skipping them
+        prefetch: Pages buffered between stages, 0 runs every stage inline in the caller's thread
+        unfetched: Extended with the listed IDs whose details could not be fetched, complete
+                   once the stream is exhausted
+        cursor: Listing position, see iter_message_id_pages
+
+    Yields:
+        Lists of GmailMessage records, one per listed page
+    """
+    pages = iter_message_id_pages(user, total_count, progress_callback, label_ids, query, refresh, cursor=cursor)
+    if prefetch:
+        pages = _prefetch(pages, prefetch)
+
+    batches = (fetch_message_details_batch(user, message_ids, unfetched=unfetched) for message_ids in pages)
+    if prefetch:
+        batches = _prefetch(batches, prefetch)
+
+    yield from batches
+
+
+_DONE = object()
+
+
+def _prefetch(iterable: Iterable, maxsize: int) -> Iterator:
+    """
+    Run an iterable in a background thread, handing items over through a bounded queue.
+
+    The producer blocks once maxsize items are waiting, errors are re-raised in the consumer
+    and the producer stops as soon as the consumer goes away.
+    """
+    items = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+            put((_DONE, None))
+        except Exception as e:
+            put((_DONE, e))
+        finally:
+            # the stages query the DB (known IDs, credentials), don't leak this thread's connections
+            connections.close_all()
+            close_thread_http()
+
+    threading.Thread(target=produce, daemon=True).start()
+
+    try:
+        while True:
+            item, error = items.get()
+            if item is _DONE:
+                if error:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
@@ -0,0 +1,56 @@
+import logging
+import threading
+from collections.abc import Callable
+
+import httplib2
+from django.conf import settings
+from django.utils.module_loading import import_string
+from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
+
+HTTP_TIMEOUT = 60
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+def get_authorized_http(creds: Credentials) -> AuthorizedHttp:
+    """
+    Authorized transport for Gmail requests made from the current thread.
+
+    Every user's credentials wrap the same per-thread connection, so list, history and batch
+    requests of a worker all reuse its open keep-alive connection to Google instead of doing a
+    new TCP/TLS handshake per built service. httplib2.Http is not thread-safe, which is why
+    there is one per thread rather than one per process.
+    """
+    return AuthorizedHttp(creds, http=get_thread_http())
+
+
+def get_thread_http() -> httplib2.Http:
+    """The current thread's keep-alive connection pool, created on first use."""
+    http = getattr(_local, "http", None)
+    if http is None:
+        http = _local.http = _http_factory()()
+    return http
+
+
+def close_thread_http():
+    """Close the current thread's connections, e.g. before the thread exits."""
+    http = getattr(_local, "http", None)
+    if http is not None:
+        http.close()
+        del _local.http
+
+
+def default_http() -> httplib2.Http:
+    """httplib2 keeps one open connection per host on an Http instance and reuses it."""
+    return httplib2.Http(timeout=HTTP_TIMEOUT)
+
+
+def _http_factory() -> Callable[[], httplib2.Http]:
+    # settings.GMAIL_HTTP_FACTORY swaps the transport, e.g. for a proxy or a test stub
+    path = getattr(settings, "GMAIL_HTTP_FACTORY", None)
+    if not path:
+        return default_http
+    return import_string(path)
@@ -0,0 +1,186 @@
+import logging
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from django.db import IntegrityError, connection, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from api.models import SyncJob, User
+
+from .gmail_sync import sync_user_emails
+
+logger = logging.getLogger(__name__)
+
+LEASE_SECONDS = 300
+RETRY_BACKOFF_SECONDS = 60
+
+
+def enqueue_sync(user: User, max_attempts: int = 3, **options) -> tuple[SyncJob, bool]:
+    """
+    Queue a sync_user_emails run for a user, unless one is already queued or running.
+
+    Args:
+        user: User to sync
+        max_attempts: Runs before the job is marked failed
+        **options: Keyword arguments for sync_user_emails (total_count, incremental, refresh)
+
+    Returns:
+        Tuple of (job, created)
+    """
+    active = SyncJob.objects.filter(user=user, status__in=[SyncJob.Status.QUEUED, SyncJob.Status.RUNNING])
+    job = active.first()
+    if job:
+        return job, False
+
+    try:
+        with transaction.atomic():
+            return SyncJob.objects.create(user=user, options=options, max_attempts=max_attempts), True
+    except IntegrityError:
+        # another request queued one between the check and the insert, syncjob_one_active_per_user caught it
+        return active.get(), False
+
+
+def claim_job(worker_id: str, lease_seconds: int = LEASE_SECONDS) -> SyncJob | None:
+    """
+    Take the oldest due job and lease it to this worker.
+
+    On databases with SKIP LOCKED (Postgres) workers pick different rows without waiting on
+    each other. Elsewhere (SQLite) the claim is a conditional UPDATE on the status, and a
+    worker that loses the race just tries the next candidate.
+    """
+    now = timezone.now()
+    due = SyncJob.objects.filter(status=SyncJob.Status.QUEUED, run_after__lte=now).order_by("run_after", "id")
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            job = due.select_for_update(skip_locked=True).first()
+            if job is None:
+                return None
+            _lease(job, worker_id, lease_seconds)
+            job.save()
+            return job
+
+    for job_id in due.values_list("id", flat=True)[:10]:
+        claimed = SyncJob.objects.filter(id=job_id, status=SyncJob.Status.QUEUED).update(
+            status=SyncJob.Status.RUNNING,
+            worker_id=worker_id,
+            attempts=F("attempts") + 1,
+            lease_expires_at=now + timedelta(seconds=lease_seconds),
+            heartbeat_at=now,
+            updated_at=now,
+        )
+        if claimed:
+            return SyncJob.objects.get(id=job_id)
+
+    return None
+
+
+def heartbeat(job: SyncJob, lease_seconds: int = LEASE_SECONDS) -> bool:
+    """Extend the lease. False means the lease expired and the job was handed to someone else."""
+    now = timezone.now()
+    return bool(
+        SyncJob.objects.filter(id=job.id, status=SyncJob.Status.RUNNING, worker_id=job.worker_id).update(
+            lease_expires_at=now + timedelta(seconds=lease_seconds), heartbeat_at=now, updated_at=now
+        )
+    )
+
+
+def requeue_expired_jobs() -> int:
+    """Put running jobs whose worker stopped heartbeating back in the queue, or fail them when out of attempts."""
+    now = timezone.now()
+    expired = SyncJob.objects.filter(status=SyncJob.Status.RUNNING, lease_expires_at__lt=now)
+    count = 0
+
+    for job in expired:
+        error = f"Lease held by {job.worker_id} expired at {job.lease_expires_at.isoformat()}"
+        if _finish_attempt(job, error=error, owner=job.worker_id):
+            count += 1
+
+    if count:
+        logger.warning(f"Requeued or failed {count} sync jobs with expired leases")
+    return count
+
+
+def run_job(job: SyncJob, lease_seconds: int = LEASE_SECONDS) -> SyncJob:
+    """
+    Run a claimed job, heartbeating from a background thread while the sync is busy.
+
+    A failed sync is retried later with backoff until max_attempts, then marked failed. If
+    the lease is lost, or cannot be renewed before it runs out, the sync stops before its
+    next batch and the job is left to whoever holds it now.
+    """
+    stop = threading.Event()
+    lease_lost = threading.Event()
+
+    def beat():
+        # the claim just set the lease, every renewal moves this forward
+        lease_deadline = time.monotonic() + lease_seconds
+        try:
+            while not stop.wait(lease_seconds / 3):
+                try:
+                    renewed = heartbeat(job, lease_seconds)
+                except Exception as e:
+                    # e.g. the database is briefly unreachable, try again on the next tick
+                    logger.warning(f"Could not renew the lease on sync job {job.id}: {e}")
+                    if time.monotonic() < lease_deadline:
+                        continue
+                    renewed = False
+
+                if not renewed:
+                    logger.warning(f"Lost the lease on sync job {job.id}, stopping its sync")
+                    lease_lost.set()
+                    return
+                lease_deadline = time.monotonic() + lease_seconds
+        finally:
+            connections.close_all()
+
+    beater = threading.Thread(target=beat, daemon=True)
+    beater.start()
+
+    result, error = None, ""
+    try:
+        options = dict(job.options)
+        result = sync_user_emails(job.user, stop=lease_lost, **options)
+        if result.get("errors"):
+            error = "sync_user_emails reported errors, see worker logs"
+    except Exception:
+        error = traceback.format_exc()
+    finally:
+        stop.set()
+        beater.join()
+
+    if lease_lost.is_set():
+        job.refresh_from_db()
+        return job
+
+    _finish_attempt(job, result=result, error=error, owner=job.worker_id)
+    job.refresh_from_db()
+    return job
+
+
+def _finish_attempt(job: SyncJob, result: dict | None = None, error: str = "", owner: str = "") -> bool:
+    """Record the outcome of a run, only if `owner` still holds the job."""
+    now = timezone.now()
+    fields = {"result": result, "lease_expires_at": None, "updated_at": now}
+
+    if not error:
+        fields["status"] = SyncJob.Status.DONE
+    elif job.attempts >= job.max_attempts:
+        fields.update(status=SyncJob.Status.FAILED, last_error=error)
+    else:
+        delay = RETRY_BACKOFF_SECONDS * 2 ** (job.attempts - 1)
+        fields.update(status=SyncJob.Status.QUEUED, last_error=error, run_after=now + timedelta(seconds=delay))
+
+    return bool(SyncJob.objects.filter(id=job.id, status=SyncJob.Status.RUNNING, worker_id=owner).update(**fields))
+
+
+def _lease(job: SyncJob, worker_id: str, lease_seconds: int):
+    now = timezone.now()
+    job.status = SyncJob.Status.RUNNING
+    job.worker_id = worker_id
+    job.attempts += 1
+    job.lease_expires_at = now + timedelta(seconds=lease_seconds)
+    job.heartbeat_at = now
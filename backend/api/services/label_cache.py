@@ -0,0 +1,70 @@
+import logging
+import threading
+from collections.abc import Iterable
+
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from api.models import Label
+
+logger = logging.getLogger(__name__)
+
+# process-wide name -> id map, the same dozen gmail labels show up on every message
+_label_ids: dict[str, int] = {}
+_lock = threading.Lock()
+
+
+def resolve_label_ids(names: Iterable[str]) -> dict[str, int]:
+    """
+    Resolve label names to Label ids, creating any that don't exist yet.
+
+    Names already in the process cache cost nothing. The rest are resolved with one
+    SELECT, and whatever is still missing is created with one bulk INSERT and read back.
+
+    Args:
+        names: Label names, duplicates are fine
+
+    Returns:
+        Dict mapping every given name to its Label id
+    """
+    wanted = set(names)
+    with _lock:
+        resolved = {name: _label_ids[name] for name in wanted if name in _label_ids}
+
+    missing = wanted - resolved.keys()
+    if not missing:
+        return resolved
+
+    found = dict(Label.objects.filter(name__in=missing).values_list("name", "id"))
+
+    to_create = missing - found.keys()
+    if to_create:
+        # ignore_conflicts so a concurrent sync creating the same label doesn't blow up
+        Label.objects.bulk_create([Label(name=name) for name in to_create], ignore_conflicts=True)
+        found.update(Label.objects.filter(name__in=to_create).values_list("name", "id"))
+        logger.info(f"Created {len(to_create)} new labels")
+
+    resolved.update(found)
+
+    # only cache ids once they are committed, a rolled back chunk must not leave dangling ids behind
+    transaction.on_commit(lambda: _remember(found))
+
+    return resolved
+
+
+def clear_label_cache():
+    """Forget every cached label id, e.g. after labels were deleted."""
+    with _lock:
+        _label_ids.clear()
+
+
+@receiver(post_delete, sender=Label)
+def _forget_deleted_label(sender, instance, **kwargs):
+    with _lock:
+        _label_ids.pop(instance.name, None)
+
+
+def _remember(label_ids: dict[str, int]):
+    with _lock:
+        _label_ids.update(label_ids)
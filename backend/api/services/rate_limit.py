@@ -0,0 +1,121 @@
+import random
+import threading
+import time
+from collections.abc import Callable
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket, tokens are Gmail quota units.
+
+    Refills at `rate` units per second up to `capacity`. A request bigger than the
+    capacity waits for a full bucket and then goes into debt, so it still gets through.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: float | None = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, units: float = 1):
+        """Block until `units` tokens are available, then take them."""
+        while (wait := self.reserve(units)) > 0:
+            self._sleep(wait)
+
+    def reserve(self, units: float = 1) -> float:
+        """
+        Take `units` tokens if they are available right now, without blocking.
+
+        Returns:
+            0 if the tokens were taken, otherwise seconds to wait before trying again.
+            Lets callers that must not block a thread, like an event loop, sleep their own way.
+        """
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+
+            wait = self._paused_until - now
+            if wait > 0:
+                return wait
+
+            needed = min(units, self.capacity)
+            if self._tokens >= needed:
+                self._tokens -= units
+                return 0
+            return (needed - self._tokens) / self.rate
+
+    def pause(self, seconds: float):
+        """Hold back every caller for `seconds`, e.g. when Gmail answered with Retry-After."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, self._clock() + seconds)
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+
+def backoff_delay(attempt: int, retry_after: float | None = None, base: float = 1.0, cap: float = 32.0) -> float:
+    """
+    Seconds to wait before retry number `attempt` (0-based).
+
+    Honors the server's Retry-After when it sent one, otherwise "full jitter"
+    exponential backoff so concurrent workers don't retry in lockstep.
+    """
+    if retry_after is not None:
+        return retry_after
+    return random.uniform(0, min(cap, base * 2**attempt))
+
+
+class AIMDController:
+    """
+    Additive-increase/multiplicative-decrease tuning of batch size and concurrency.
+
+    Every `grow_after` clean batches in a row add `batch_step` to the batch size and one
+    worker. A batch with any 429 halves both. Safe to share between worker threads.
+    """
+
+    def __init__(
+        self,
+        batch_size: int,
+        workers: int,
+        min_batch_size: int = 5,
+        max_batch_size: int = 100,
+        max_workers: int = 8,
+        batch_step: int = 10,
+        grow_after: int = 3,
+    ):
+        self.min_batch_size = min_batch_size
+        self.max_batch_size = max_batch_size
+        self.max_workers = max_workers
+        self.batch_step = batch_step
+        self.grow_after = grow_after
+        self.batch_size = min(max(batch_size, min_batch_size), max_batch_size)
+        self.workers = min(max(workers, 1), max_workers)
+        self._clean_streak = 0
+        self._lock = threading.Lock()
+
+    def record(self, rate_limited: bool):
+        """Feed back the outcome of one batch attempt."""
+        with self._lock:
+            if rate_limited:
+                self._clean_streak = 0
+                self.batch_size = max(self.min_batch_size, self.batch_size // 2)
+                self.workers = max(1, self.workers // 2)
+                return
+
+            self._clean_streak += 1
+            if self._clean_streak >= self.grow_after:
+                self._clean_streak = 0
+                self.batch_size = min(self.max_batch_size, self.batch_size + self.batch_step)
+                self.workers = min(self.max_workers, self.workers + 1)
@@ -0,0 +1,48 @@
+import hashlib
+from collections.abc import Callable
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+
+from api.models import User
+
+# bump when the shape of cached responses changes, so a deploy doesn't serve the old ones
+READ_CACHE_FORMAT = 1
+
+
+def bump_data_version(user: User):
+    """
+    Invalidate every cached read of a user's emails.
+
+    Call it in the transaction that changes them. The version lives on the user row rather
+    than in the cache, so it holds across processes even with a per-process cache backend.
+    """
+    User.objects.filter(pk=user.pk).update(email_data_version=F("email_data_version") + 1)
+
+
+def read_cache_key(user: User, name: str, *parts) -> str:
+    """
+    Cache key of one read of a user's emails, e.g. a list page.
+
+    Args:
+        user: User whose data is read, with a current email_data_version (request.user is)
+        name: What is read, e.g. "emails" or "stats"
+        parts: Whatever else the result depends on, e.g. the request URL
+    """
+    digest = hashlib.blake2b("|".join(map(str, parts)).encode(), digest_size=12).hexdigest()
+    return f"emails:{READ_CACHE_FORMAT}:{user.pk}:{user.email_data_version}:{name}:{digest}"
+
+
+def read_etag(key: str) -> str:
+    """Strong ETag for the response cached under `key`, it changes exactly when the key does."""
+    return f'"{hashlib.blake2b(key.encode(), digest_size=12).hexdigest()}"'
+
+
+def cached_read(key: str, compute: Callable):
+    """The cached result under `key`, computing and storing it on a miss. `compute` must not return None."""
+    data = cache.get(key)
+    if data is None:
+        data = compute()
+        cache.set(key, data, settings.EMAIL_READ_CACHE_TIMEOUT)
+    return data
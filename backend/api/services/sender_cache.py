@@ -0,0 +1,123 @@
+import logging
+import threading
+from collections.abc import Iterable
+
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from api.models import Company, Sender
+
+logger = logging.getLogger(__name__)
+
+# a mailbox has far fewer distinct senders than emails, past this the cache just starts over
+SENDER_CACHE_LIMIT = 50_000
+
+# process-wide email -> (sender id, company id) and domain -> company id maps
+_senders: dict[str, tuple[int, int | None]] = {}
+_company_ids: dict[str, int] = {}
+_lock = threading.Lock()
+
+
+def sender_domain(email: str) -> str:
+    """Lower-cased domain of an address, "" if it has none."""
+    _, at, domain = email.rpartition("@")
+    return domain.lower() if at and domain else ""
+
+
+def resolve_senders(emails: Iterable[str]) -> dict[str, tuple[int, int | None]]:
+    """
+    Resolve sender addresses to Sender and Company ids, creating any that don't exist yet.
+
+    Works like resolve_label_ids: cached senders cost nothing, the rest take one SELECT and
+    at most one bulk INSERT each for companies and senders.
+
+    Args:
+        emails: sender addresses, empty ones are skipped
+
+    Returns:
+        Dict mapping every given email to (sender id, company id or None)
+    """
+    wanted = set(emails) - {""}
+    with _lock:
+        known = {email: _senders[email] for email in wanted if email in _senders}
+
+    missing = wanted - known.keys()
+    if missing:
+        known.update(_select_senders(missing))
+
+        to_create = missing - known.keys()
+        if to_create:
+            company_ids = resolve_company_ids(sender_domain(email) for email in to_create)
+            # ignore_conflicts so a concurrent sync creating the same sender doesn't blow up
+            Sender.objects.bulk_create(
+                [Sender(email=email, company_id=company_ids.get(sender_domain(email))) for email in to_create],
+                ignore_conflicts=True,
+            )
+            known.update(_select_senders(to_create))
+            logger.info(f"Created {len(to_create)} new senders")
+
+    # only cache ids once they are committed, a rolled back chunk must not leave dangling ids behind
+    transaction.on_commit(lambda: _remember(known))
+
+    return known
+
+
+def resolve_company_ids(domains: Iterable[str]) -> dict[str, int]:
+    """Resolve sender domains to Company ids, creating missing ones. Empty domains are skipped."""
+    wanted = set(domains) - {""}
+    with _lock:
+        resolved = {domain: _company_ids[domain] for domain in wanted if domain in _company_ids}
+
+    missing = wanted - resolved.keys()
+    if not missing:
+        return resolved
+
+    found = dict(Company.objects.filter(domain__in=missing).values_list("domain", "id"))
+
+    to_create = missing - found.keys()
+    if to_create:
+        Company.objects.bulk_create([Company(domain=domain) for domain in to_create], ignore_conflicts=True)
+        found.update(Company.objects.filter(domain__in=to_create).values_list("domain", "id"))
+        logger.info(f"Created {len(to_create)} new companies")
+
+    resolved.update(found)
+    transaction.on_commit(lambda: _remember_companies(found))
+
+    return resolved
+
+
+def clear_sender_cache():
+    """Forget every cached sender and company id."""
+    with _lock:
+        _senders.clear()
+        _company_ids.clear()
+
+
+@receiver(post_delete, sender=Sender)
+def _forget_deleted_sender(sender, instance, **kwargs):
+    with _lock:
+        _senders.pop(instance.email, None)
+
+
+@receiver(post_delete, sender=Company)
+def _forget_deleted_company(sender, instance, **kwargs):
+    # its senders were moved to no company, their cached company ids are stale
+    clear_sender_cache()
+
+
+def _select_senders(emails: set[str]) -> dict[str, tuple[int, int | None]]:
+    rows = Sender.objects.filter(email__in=emails).values_list("email", "id", "company_id")
+    return {email: (sender_id, company_id) for email, sender_id, company_id in rows}
+
+
+def _remember(senders: dict[str, tuple[int, int | None]]):
+    with _lock:
+        if len(_senders) + len(senders) > SENDER_CACHE_LIMIT:
+            _senders.clear()
+        _senders.update(senders)
+
+
+def _remember_companies(company_ids: dict[str, int]):
+    with _lock:
+        _company_ids.update(company_ids)
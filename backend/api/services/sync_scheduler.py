@@ -0,0 +1,124 @@
+import logging
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from functools import partial
+
+import django
+from django.db import connections
+from django.db.models import Count
+
+from api.models import User
+from api.utils.parsers import parse_emails
+
+from .gmail_sync import sync_user_emails
+
+logger = logging.getLogger(__name__)
+
+SLICE_SIZE = 5000
+SUMMED_STATS = ("listed", "fetched", "created", "updated", "deleted", "unfetched", "errors", "seconds")
+
+
+def syncable_users(emails: list[str] | None = None):
+    """
+    Users that can be synced unattended, smallest mailboxes first.
+
+    Only users with a stored Google token: without one get_creds would start the
+    interactive OAuth flow.
+    """
+    users = User.objects.filter(is_active=True, googleauthtoken__isnull=False)
+    if emails:
+        users = users.filter(email__in=emails)
+    return users.annotate(stored_emails=Count("emails")).order_by("stored_emails", "id")
+
+
+def sync_all_users(
+    users,
+    workers: int = 4,
+    max_results: int = 500,
+    slice_size: int = SLICE_SIZE,
+    incremental: bool = False,
+) -> list[dict]:
+    """
+    Sync many users in parallel, one process per in-flight user sync.
+
+    Scheduling is round robin over slices so one huge mailbox can't hold the pool: a full sync
+    lists at most slice_size messages per turn, then the user goes to the back of the queue and
+    the next turn carries on from the listing page where this one stopped. A user is done at the
+    end of the mailbox or once max_results messages were listed, whether or not they held new
+    mail: an old mailbox's newest slice may be stored already while older mail is not.
+
+    Args:
+        users: Users to sync, in the order they should start
+        workers: Processes syncing at once, 1 runs everything in this process
+        max_results: Newest messages to sync per user on a full sync
+        slice_size: Messages per turn before the user is requeued
+        incremental: Use the history checkpoint on a user's first turn when there is one
+
+    Returns:
+        One summary dict per user with summed sync_user_emails stats, in the order given
+    """
+    summaries = {}
+    for user in users:
+        summaries[user.pk] = {"user_id": user.pk, "email": user.email, "turns": 0, "incremental": False}
+        summaries[user.pk].update(dict.fromkeys(SUMMED_STATS, 0))
+
+    queue = deque((user_id, min(slice_size, max_results), incremental, None) for user_id in summaries)
+
+    if workers <= 1:
+        while queue:
+            stats = sync_user_slice(*queue.popleft())
+            _record_turn(summaries, queue, stats, max_results, slice_size)
+        return list(summaries.values())
+
+    # forked children would share the parent's DB sockets and the fetch pool's threads
+    connections.close_all()
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=django.setup) as pool:
+        in_flight = {}
+        while queue or in_flight:
+            while queue and len(in_flight) < workers:
+                turn = queue.popleft()
+                in_flight[pool.submit(sync_user_slice, *turn)] = turn
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                user_id, *_ = in_flight.pop(future)
+                try:
+                    stats = future.result()
+                except Exception as e:
+                    logger.error(f"Sync worker failed for user {user_id}: {e}", exc_info=True)
+                    stats = {"user_id": user_id, "errors": 1}
+                _record_turn(summaries, queue, stats, max_results, slice_size)
+
+    return list(summaries.values())
+
+
+def sync_user_slice(user_id: int, count: int, incremental: bool, page_token: str | None = None) -> dict:
+    """One turn for one user. Module level so worker processes can unpickle it."""
+    started = time.monotonic()
+    user = User.objects.get(pk=user_id)
+    # slices already run a process each, parsing in this one keeps the cores from being oversubscribed
+    parser_func = partial(parse_emails, workers=1)
+    stats = sync_user_emails(user, count, parser_func=parser_func, incremental=incremental, page_token=page_token)
+    stats.update({"user_id": user_id, "seconds": time.monotonic() - started})
+    return stats
+
+
+def _record_turn(summaries: dict, queue: deque, stats: dict, max_results: int, slice_size: int):
+    summary = summaries[stats["user_id"]]
+    summary["turns"] += 1
+    summary["incremental"] = summary["incremental"] or stats.get("incremental", False)
+    for key in SUMMED_STATS:
+        summary[key] += stats.get(key, 0)
+
+    # more to do only after a clean full-sync turn that stopped short of the mailbox's end and the cap
+    if stats.get("errors") or stats.get("incremental") or not stats.get("next_page_token"):
+        return
+    if summary["listed"] >= max_results:
+        return
+
+    # the next turn lists on from where this one stopped, older mail than the checkpoint covers
+    count = min(slice_size, max_results - summary["listed"])
+    queue.append((summary["user_id"], count, False, stats["next_page_token"]))
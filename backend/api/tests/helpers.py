@@ -0,0 +1,16 @@
+from datetime import UTC, datetime
+
+
+def parsed_email(gmail_id, subject="Subject", sender=("jobs@acme.com", "Acme"), labels=("INBOX",), day=1, hour=0):
+    """One email as parse_emails returns it, ready for populate_email_database."""
+    return {
+        "gmail_id": gmail_id,
+        "subject": subject,
+        "sender_email": sender[0],
+        "sender_name": sender[1],
+        "received_at": datetime(2026, 2, day, hour, tzinfo=UTC),
+        "content_type": "text/html",
+        "size_estimate": 100,
+        "importance": 1,
+        "labels": list(labels),
+    }
@@ -1,7 +1,9 @@
+from io import StringIO
+
 from django.core.management import call_command
 from django.test import TestCase
 
-from api.models import JobEmail, User
+from api.models import JobEmail, Sender, User
 
 
 class TestClearEmails(TestCase):
@@ -16,8 +18,8 @@ class TestClearEmails(TestCase):
 
             gmail_id = models.CharField(max_length=255, unique=True)
             subject = models.CharField(max_length=500)
-            sender_email = models.EmailField()
-            sender_name = models.CharField(max_length=255)
+            sender = models.ForeignKey(Sender, null=True, on_delete=models.SET_NULL, related_name="emails")
+            company = models.ForeignKey(Company, null=True, on_delete=models.SET_NULL, related_name="emails")
             received_at = models.DateTimeField()
             content_type = models.CharField(max_length=100)
             size_estimate = models.IntegerField()
@@ -30,7 +32,7 @@ class TestClearEmails(TestCase):
             user=self.user,
             gmail_id="1",
             subject="Test Subject",
-            sender_email="sender@example.com",
+            sender=Sender.objects.create(email="sender@example.com"),
             received_at="2026-02-01T03:33:03Z",
             content_type="text/html",
             size_estimate=68023,
@@ -41,7 +43,7 @@ class TestClearEmails(TestCase):
             user=self.user,
             gmail_id="2",
             subject="Another Test Subject",
-            sender_email="another_sender@example.com",
+            sender=Sender.objects.create(email="another_sender@example.com"),
             received_at="2026-02-01T04:33:03Z",
             content_type="text/plain",
             size_estimate=12345,
@@ -53,3 +55,20 @@ class TestClearEmails(TestCase):
 
         self.assertFalse(JobEmail.objects.filter(user=self.user).exists())
         self.assertEqual(JobEmail.objects.count(), 0)
+
+    def test_clear_emails_dry_run_deletes_nothing(self):
+        out = StringIO()
+
+        call_command("clear_emails", email=self.user_email, dry_run=True, stdout=out)
+
+        self.assertEqual(JobEmail.objects.filter(user=self.user).count(), 2)
+        self.assertIn("Would delete 2 job emails", out.getvalue())
+
+    def test_clear_emails_reports_progress_per_batch(self):
+        out = StringIO()
+
+        call_command("clear_emails", email=self.user_email, batch_size=1, stdout=out)
+
+        self.assertEqual(JobEmail.objects.count(), 0)
+        self.assertIn("Deleted 1/2 job emails", out.getvalue())
+        self.assertIn("Deleted 2 job emails for user", out.getvalue())
@@ -1,9 +1,16 @@
+import gzip
+import json
+import os
+import tempfile
+from io import StringIO
 from unittest.mock import patch
 
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.test import TestCase
 
 from api.models import JobEmail, User
+from api.utils.parsers import parse_emails
 
 # Create your tests here.
 
@@ -13,7 +20,7 @@ class TestPopulateData(TestCase):
         self.test_email = "test@example.com"
         User.objects.create_user(email=self.test_email)
 
-    @patch("api.services.gmail_service.fetch_emails_from_gmail")
+    @patch("api.services.gmail_sync.fetch_emails_from_gmail")
     def test_populate_data_command(self, mock_fetch):
         mock_fetch.return_value = [
             {
@@ -41,10 +48,69 @@ class TestPopulateData(TestCase):
 
         test_user = User.objects.get(email=self.test_email)
 
-        mock_fetch.assert_called_once_with(test_user, max_results=500, label_ids=None, query=None)
+        mock_fetch.assert_called_once_with(
+            test_user, max_results=500, label_ids=None, query=None, refresh=False, unfetched=[], cursor={}
+        )
         self.assertTrue(JobEmail.objects.exists())
         self.assertGreater(JobEmail.objects.count(), 0)
 
         job_email = JobEmail.objects.get(gmail_id="1")
         self.assertEqual(job_email.subject, "Your 1 Day Streak is Paused!")
         self.assertEqual(job_email.sender_email, "hello@chess.com")
+
+    def test_populate_data_from_gzipped_jsonl_in_chunks(self):
+        messages = [
+            {
+                "id": str(i),
+                "labelIds": ["INBOX"],
+                "payload": {
+                    "headers": [
+                        {"name": "Date", "value": "Sun, 01 Feb 2026 03:33:03 +0000"},
+                        {"name": "From", "value": f"Sender {i} <sender{i}@example.com>"},
+                        {"name": "Subject", "value": f"Message {i}"},
+                    ]
+                },
+            }
+            for i in range(5)
+        ]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "export.jsonl.gz")
+            with gzip.open(path, "wt", encoding="utf-8") as f:
+                f.writelines(json.dumps(message) + "\n" for message in messages)
+
+            with patch("api.utils.parsers.parse_emails", wraps=parse_emails) as mock_parse:
+                call_command("populate_data", email=self.test_email, file=path, chunk_size=2, parse_workers=1)
+
+        self.assertEqual([len(call.args[0]) for call in mock_parse.call_args_list], [2, 2, 1])
+        self.assertEqual(JobEmail.objects.count(), 5)
+        self.assertEqual(JobEmail.objects.get(gmail_id="3").sender_email, "sender3@example.com")
+
+    def test_populate_data_rejects_malformed_file(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "export.json")
+            with open(path, "w") as f:
+                f.write('[{"id": "1"')
+
+            with self.assertRaisesMessage(CommandError, "Failed to load emails from file"):
+                call_command("populate_data", email=self.test_email, file=path)
+
+    @patch("api.management.commands.populate_data.sync_user_emails")
+    def test_populate_data_rejects_incremental_with_filters(self, mock_sync):
+        with self.assertRaisesMessage(CommandError, "--incremental can't be combined with --query, --inbox-only"):
+            call_command("populate_data", email=self.test_email, incremental=True, query="from:acme", inbox_only=True)
+
+        mock_sync.assert_not_called()
+
+    @patch("api.services.gmail_sync.fetch_emails_from_gmail")
+    def test_populate_data_fails_when_emails_could_not_be_fetched(self, mock_fetch):
+        def fetch(user, unfetched, **kwargs):
+            unfetched.extend(["2", "3"])
+            return []
+
+        mock_fetch.side_effect = fetch
+        out = StringIO()
+
+        with self.assertRaisesMessage(CommandError, "2 emails could not be fetched for test@example.com"):
+            call_command("populate_data", email=self.test_email, stdout=out)
+
+        self.assertIn("0 created, 0 updated, 2 could not be fetched.", out.getvalue())
@@ -0,0 +1,31 @@
+from datetime import UTC, datetime
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from api.models import EmailStat, JobEmail, User
+
+
+class TestRebuildEmailStats(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(email="test@example.com")
+        for i in range(3):
+            JobEmail.objects.create(
+                user=self.user,
+                gmail_id=str(i),
+                subject="Subject",
+                received_at=datetime(2026, 2, 2, tzinfo=UTC),
+                content_type="text/html",
+                size_estimate=1,
+                importance=1,
+            )
+
+    def test_rebuilds_stats_for_emails_written_outside_ingest(self):
+        call_command("rebuild_email_stats", email=["test@example.com"])
+
+        total = EmailStat.objects.get(user=self.user, dimension=EmailStat.Dimension.TOTAL)
+        self.assertEqual(total.count, 3)
+
+    def test_unknown_email_errors(self):
+        with self.assertRaises(CommandError):
+            call_command("rebuild_email_stats", email=["nobody@example.com"])
@@ -0,0 +1,29 @@
+from datetime import UTC, datetime
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from api.models import EmailSearchDocument, JobEmail, User
+
+
+class TestRebuildSearchIndex(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(email="test@example.com")
+        self.email = JobEmail.objects.create(
+            user=self.user,
+            gmail_id="1",
+            subject="Interview invitation",
+            received_at=datetime(2026, 2, 2, tzinfo=UTC),
+            content_type="text/html",
+            size_estimate=1,
+            importance=1,
+        )
+
+    def test_backfills_emails_written_outside_ingest(self):
+        call_command("rebuild_search_index", email=["test@example.com"], batch_size=10)
+
+        self.assertEqual(EmailSearchDocument.objects.get(email=self.email).text, "Interview invitation")
+
+    def test_unknown_email_errors(self):
+        with self.assertRaises(CommandError):
+            call_command("rebuild_search_index", email=["nobody@example.com"])
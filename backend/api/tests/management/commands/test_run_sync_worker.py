@@ -0,0 +1,20 @@
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from api.models import SyncJob, User
+from api.services.job_queue import enqueue_sync
+
+
+class TestRunSyncWorker(TestCase):
+    @patch("api.services.job_queue.sync_user_emails")
+    def test_worker_drains_queue_once(self, mock_sync):
+        mock_sync.return_value = {"errors": 0}
+        for email in ("a@example.com", "b@example.com"):
+            enqueue_sync(User.objects.create(email=email))
+
+        call_command("run_sync_worker", once=True, worker_id="test-worker")
+
+        self.assertEqual(mock_sync.call_count, 2)
+        self.assertEqual(SyncJob.objects.filter(status=SyncJob.Status.DONE, worker_id="test-worker").count(), 2)
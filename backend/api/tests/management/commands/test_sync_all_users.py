@@ -0,0 +1,97 @@
+import json
+import os
+import tempfile
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from api.models import GoogleAuthToken, User
+
+
+def fake_slice(user_id, count, incremental, page_token=None, mailbox=1200, stored=0):
+    """A mailbox of `mailbox` messages whose newest `stored` are already in the DB, listed from page_token on."""
+    start = int(page_token or 0)
+    listed = min(count, mailbox - start)
+    fetched = max(0, start + listed - max(start, stored))
+    return {
+        "user_id": user_id,
+        "listed": listed,
+        "fetched": fetched,
+        "created": fetched,
+        "errors": 0,
+        "next_page_token": str(start + listed) if start + listed < mailbox else None,
+    }
+
+
+class TestSyncAllUsers(TestCase):
+    def setUp(self):
+        self.big = User.objects.create(email="big@example.com")
+        self.small = User.objects.create(email="small@example.com")
+        User.objects.create(email="no-token@example.com")
+        for user in (self.big, self.small):
+            GoogleAuthToken.objects.create(user=user, token_json="{}")
+
+    @patch("api.services.sync_scheduler.sync_user_slice", side_effect=fake_slice)
+    def test_round_robin_slices_and_summary(self, mock_slice):
+        with tempfile.TemporaryDirectory() as tmp:
+            summary_path = os.path.join(tmp, "summary.json")
+
+            call_command("sync_all_users", workers=1, maxResults=1500, slice=500, summary=summary_path)
+
+            with open(summary_path) as f:
+                summaries = {summary["email"]: summary for summary in json.load(f)}
+
+        turns = [call.args for call in mock_slice.call_args_list]
+        # each user's next slice waits behind the other user's current one, and lists on from where it stopped
+        self.assertEqual(
+            turns,
+            [
+                (self.big.pk, 500, False, None),
+                (self.small.pk, 500, False, None),
+                (self.big.pk, 500, False, "500"),
+                (self.small.pk, 500, False, "500"),
+                (self.big.pk, 500, False, "1000"),
+                (self.small.pk, 500, False, "1000"),
+            ],
+        )
+        self.assertEqual(set(summaries), {"big@example.com", "small@example.com"})
+        # the third turn reached the end of the 1200 message mailbox
+        self.assertEqual(summaries["big@example.com"]["created"], 1200)
+        self.assertEqual(summaries["big@example.com"]["listed"], 1200)
+        self.assertEqual(summaries["big@example.com"]["turns"], 3)
+
+    @patch("api.services.sync_scheduler.sync_user_slice")
+    def test_turns_continue_past_slices_with_no_new_mail_until_the_cap(self, mock_slice):
+        # the newest 1000 are stored already, older mail is not
+        mock_slice.side_effect = lambda *args: fake_slice(*args, mailbox=5000, stored=1000)
+
+        call_command("sync_all_users", workers=1, maxResults=2200, slice=500, email=["big@example.com"])
+
+        self.assertEqual(
+            [call.args[1:] for call in mock_slice.call_args_list],
+            [(500, False, None), (500, False, "500"), (500, False, "1000"), (500, False, "1500"), (200, False, "2000")],
+        )
+
+    @patch("api.services.sync_scheduler.sync_user_slice")
+    def test_incremental_turn_is_not_requeued(self, mock_slice):
+        mock_slice.side_effect = lambda user_id, count, incremental, page_token: {
+            "user_id": user_id,
+            "fetched": 3,
+            "incremental": incremental,
+        }
+
+        call_command("sync_all_users", workers=1, incremental=True, email=["small@example.com"])
+
+        mock_slice.assert_called_once_with(self.small.pk, 500, True, None)
+
+    @patch("api.services.sync_scheduler.sync_user_slice")
+    def test_errors_fail_the_command(self, mock_slice):
+        mock_slice.side_effect = lambda user_id, count, incremental, page_token: {
+            "user_id": user_id,
+            "errors": 1,
+        }
+
+        with self.assertRaises(CommandError):
+            call_command("sync_all_users", workers=1)
@@ -0,0 +1,108 @@
+import re
+from datetime import UTC, datetime, timedelta
+
+from django.db import connection
+from django.test import TestCase
+
+from api.models import Company, JobEmail, Label, Sender, User
+from api.pagination import ReceivedAtKeysetPagination
+
+# a plan step that reads a whole table (or a whole index) instead of seeking into an index
+FULL_SCAN = {
+    "sqlite": re.compile(r"\bSCAN (?!CONSTANT ROW)"),
+    "postgresql": re.compile(r"\bSeq Scan\b"),
+}
+SORT = {
+    "sqlite": re.compile(r"USE TEMP B-TREE FOR ORDER BY"),
+    "postgresql": re.compile(r"\bSort\b"),
+}
+
+
+class QueryPlanTest(TestCase):
+    """
+    EXPLAIN the list queries and fail if one of them stops using its index.
+
+    Tables here are tiny, so on Postgres sequential scans and sorts are switched off for the
+    transaction: if one still shows up in the plan, no index can serve the query.
+    """
+
+    # @ HELPERS AND SETUP STUFF
+    def setUp(self):
+        if connection.vendor not in FULL_SCAN:
+            self.skipTest(f"No plan checks for {connection.vendor}")
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+                cursor.execute("SET LOCAL enable_sort = off")
+
+        self.user = User.objects.create(email="test@example.com")
+        self.label = Label.objects.create(name="INBOX")
+        self.company = Company.objects.create(domain="acme.com")
+        self.sender = Sender.objects.create(email="jobs@acme.com", company=self.company)
+        received_at = datetime(2026, 2, 1, tzinfo=UTC)
+        for i in range(20):
+            email = JobEmail.objects.create(
+                user=self.user,
+                gmail_id=str(i),
+                subject=f"Subject {i}",
+                sender=self.sender,
+                company=self.company,
+                received_at=received_at - timedelta(hours=i),
+                content_type="text/html",
+                size_estimate=1,
+                importance=1,
+            )
+            email.labels.add(self.label)
+
+    def assertUsesIndex(self, queryset, index_name=None, sorted_by_index=True):
+        plan = queryset.explain()
+        self.assertIsNone(FULL_SCAN[connection.vendor].search(plan), f"Full scan in plan:\n{plan}")
+        if sorted_by_index:
+            self.assertIsNone(SORT[connection.vendor].search(plan), f"Sort step in plan:\n{plan}")
+        if index_name:
+            self.assertIn(index_name, plan)
+
+    # @ TESTS FOR JOBEMAIL LIST QUERIES
+
+    def test_newest_emails_of_user(self):
+        queryset = JobEmail.objects.filter(user=self.user).order_by("-received_at", "-id")[:50]
+
+        self.assertUsesIndex(queryset, "jobemail_user_received_idx")
+
+    def test_newest_emails_from_sender(self):
+        queryset = JobEmail.objects.filter(user=self.user, sender=self.sender).order_by("-received_at", "-id")[:50]
+
+        self.assertUsesIndex(queryset, "jobemail_user_sender_idx")
+
+    def test_newest_emails_from_company(self):
+        queryset = JobEmail.objects.filter(user=self.user, company=self.company).order_by("-received_at", "-id")[:50]
+
+        self.assertUsesIndex(queryset, "jobemail_user_company_idx")
+
+    def test_deep_keyset_page(self):
+        last = JobEmail.objects.order_by("-received_at", "-id")[10]
+        cursor = ReceivedAtKeysetPagination.encode_cursor(last.received_at, last.id)
+
+        queryset = ReceivedAtKeysetPagination().after_cursor(JobEmail.objects.filter(user=self.user), cursor)
+
+        self.assertUsesIndex(queryset[:51], "jobemail_user_received_idx")
+
+    def test_deep_keyset_page_from_sender(self):
+        last = JobEmail.objects.order_by("-received_at", "-id")[10]
+        cursor = ReceivedAtKeysetPagination.encode_cursor(last.received_at, last.id)
+
+        queryset = ReceivedAtKeysetPagination().after_cursor(
+            JobEmail.objects.filter(user=self.user, sender=self.sender), cursor
+        )
+
+        self.assertUsesIndex(queryset[:51], "jobemail_user_sender_idx")
+
+    def test_emails_with_label(self):
+        queryset = JobEmail.objects.filter(user=self.user, labels=self.label).order_by("-received_at")[:50]
+
+        self.assertUsesIndex(queryset, sorted_by_index=False)
+
+    def test_email_ids_with_label(self):
+        queryset = JobEmail.labels.through.objects.filter(label=self.label).values("jobemail_id")
+
+        self.assertUsesIndex(queryset, sorted_by_index=False)
@@ -0,0 +1,87 @@
+from unittest.mock import PropertyMock, patch
+
+from django.db import connection
+from django.test import TestCase
+
+from api.models import EmailSearchDocument, EmailStat, JobEmail, User
+from api.services.email_purge import QUERY_PARAM_HEADROOM, purge_user_emails
+from api.services.email_search import search_emails
+from api.services.gmail_sync import populate_email_database, wipe_emails_for_user
+from api.services.label_cache import clear_label_cache
+from api.services.sender_cache import clear_sender_cache
+from api.tests.helpers import parsed_email
+
+
+class PurgeUserEmailsTest(TestCase):
+    # @ HELPERS AND SETUP STUFF
+    def setUp(self):
+        clear_label_cache()
+        clear_sender_cache()
+        self.user = User.objects.create(email="test@example.com")
+        self.other = User.objects.create(email="other@example.com")
+
+        populate_email_database(
+            self.user, [parsed_email(f"u{i}", "Interview", labels=["INBOX", "STARRED"], hour=i) for i in range(5)]
+        )
+        populate_email_database(self.other, [parsed_email("o1", "Interview", labels=["INBOX", "STARRED"])])
+
+    # @ TESTS FOR PURGE_USER_EMAILS
+
+    def test_purge_deletes_emails_and_dependents_in_chunks(self):
+        progress = []
+
+        deleted = purge_user_emails(self.user, batch_size=2, progress_callback=lambda *args: progress.append(args))
+
+        self.assertEqual(deleted, 5)
+        self.assertEqual(progress, [(2, 5), (4, 5), (5, 5)])
+        self.assertFalse(JobEmail.objects.filter(user=self.user).exists())
+        self.assertFalse(JobEmail.labels.through.objects.filter(jobemail__user=self.user).exists())
+        self.assertEqual(EmailSearchDocument.objects.count(), 1)
+        # the FTS triggers saw the deletes too
+        self.assertEqual(search_emails(self.user, "interview"), [])
+
+    def test_purge_keeps_chunks_under_the_query_parameter_limit(self):
+        progress = []
+
+        limit = PropertyMock(return_value=QUERY_PARAM_HEADROOM + 2)
+        with patch.object(type(connection.features), "max_query_params", limit):
+            deleted = purge_user_emails(
+                self.user, batch_size=100_000, progress_callback=lambda *args: progress.append(args)
+            )
+
+        self.assertEqual(deleted, 5)
+        self.assertEqual(progress, [(2, 5), (4, 5), (5, 5)])
+
+    def test_purge_leaves_other_users_alone(self):
+        purge_user_emails(self.user, batch_size=2)
+
+        self.assertEqual([email.gmail_id for email in search_emails(self.other, "interview")], ["o1"])
+        self.assertEqual(JobEmail.objects.get(user=self.other).labels.count(), 2)
+
+    def test_purge_keeps_stats_and_version_in_step_with_every_chunk(self):
+        seen = []
+
+        def check(deleted, total):
+            self.user.refresh_from_db()
+            stats = dict(EmailStat.objects.filter(user=self.user).values_list("dimension", "count"))
+            seen.append((stats.get(EmailStat.Dimension.TOTAL), self.user.email_data_version))
+
+        version = User.objects.get(pk=self.user.pk).email_data_version
+        purge_user_emails(self.user, batch_size=2, progress_callback=check)
+
+        self.assertEqual(seen, [(3, version + 1), (1, version + 2), (None, version + 3)])
+        self.assertEqual(EmailStat.objects.get(user=self.other, dimension=EmailStat.Dimension.TOTAL).count, 1)
+
+    def test_purge_of_empty_mailbox(self):
+        progress = []
+        user = User.objects.create(email="new@example.com")
+
+        self.assertEqual(purge_user_emails(user, progress_callback=lambda *args: progress.append(args)), 0)
+        self.assertEqual(progress, [])
+
+    def test_wipe_purges_and_clears_stats(self):
+        count = wipe_emails_for_user(self.user, batch_size=3)
+
+        self.assertEqual(count, 5)
+        self.assertFalse(EmailStat.objects.filter(user=self.user).exists())
+        self.assertTrue(EmailStat.objects.filter(user=self.other).exists())
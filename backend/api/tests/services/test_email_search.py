@@ -0,0 +1,95 @@
+from django.test import TestCase
+
+from api.models import EmailSearchDocument, JobEmail, User
+from api.services.email_search import reindex_user_emails, search_emails, search_terms, search_text
+from api.services.email_stats import remove_emails
+from api.services.gmail_sync import populate_email_database
+from api.services.label_cache import clear_label_cache
+from api.services.sender_cache import clear_sender_cache
+from api.tests.helpers import parsed_email
+
+
+class EmailSearchTest(TestCase):
+    # @ HELPERS AND SETUP STUFF
+    def setUp(self):
+        self.user = User.objects.create(email="test@example.com")
+        clear_label_cache()
+        clear_sender_cache()
+
+    def _search(self, query, user=None):
+        return [email.gmail_id for email in search_emails(user or self.user, query)]
+
+    # @ TESTS FOR SEARCH_EMAILS
+
+    def test_finds_subject_words_by_stem_and_prefix(self):
+        populate_email_database(
+            self.user,
+            [
+                parsed_email("1", "Interview invitation", sender=("hr@globex.com", "")),
+                parsed_email("2", "Your application was received", sender=("hr@globex.com", "")),
+            ],
+        )
+
+        self.assertEqual(self._search("interviews"), ["1"])
+        self.assertEqual(self._search("applic"), ["2"])
+
+    def test_finds_sender_name_and_domain(self):
+        populate_email_database(
+            self.user,
+            [
+                parsed_email("1", "Hello", sender=("jobs@acme.com", "Acme Recruiting")),
+                parsed_email("2", "Hello", sender=("x@globex.com", "Globex")),
+            ],
+        )
+
+        self.assertEqual(self._search("acme"), ["1"])
+        self.assertEqual(self._search("recruiting"), ["1"])
+        self.assertEqual(self._search("x@globex.com"), ["2"])
+
+    def test_every_word_must_match_and_better_matches_rank_first(self):
+        populate_email_database(
+            self.user,
+            [
+                parsed_email("1", "Offer letter", day=3),
+                parsed_email("2", "Interview offer interview", day=1),
+                parsed_email("3", "Interview schedule", day=2),
+            ],
+        )
+
+        self.assertEqual(self._search("interview offer"), ["2"])
+        self.assertEqual(self._search("interview"), ["2", "3"])
+
+    def test_scoped_to_user(self):
+        stranger = User.objects.create(email="stranger@example.com")
+        populate_email_database(stranger, [parsed_email("1", "Interview")])
+
+        self.assertEqual(self._search("interview"), [])
+        self.assertEqual(self._search("interview", user=stranger), ["1"])
+
+    def test_updated_and_deleted_emails_leave_the_index(self):
+        populate_email_database(self.user, [parsed_email("1", "Interview"), parsed_email("2", "Interview")])
+        populate_email_database(self.user, [parsed_email("1", "Rejection")])
+        remove_emails(self.user, JobEmail.objects.filter(gmail_id="2"))
+
+        self.assertEqual(self._search("interview"), [])
+        self.assertEqual(self._search("rejection"), ["1"])
+
+    def test_query_syntax_is_ignored(self):
+        populate_email_database(self.user, [parsed_email("1", "Interview")])
+
+        self.assertEqual(search_terms('Interview" OR (NEAR* -x'), ["interview", "or", "near", "x"])
+        self.assertEqual(self._search('"interview'), ["1"])
+        self.assertEqual(self._search("  ...  "), [])
+
+    def test_reindex_backfills_emails_stored_without_search_text(self):
+        populate_email_database(self.user, [parsed_email(str(i), f"Interview {i}") for i in range(3)])
+        EmailSearchDocument.objects.all().delete()
+        self.assertEqual(self._search("interview"), [])
+
+        indexed = reindex_user_emails(self.user, batch_size=2)
+
+        self.assertEqual(indexed, 3)
+        self.assertEqual(sorted(self._search("interview")), ["0", "1", "2"])
+
+    def test_search_text_splits_sender_address(self):
+        self.assertEqual(search_text("Hi", "", "jobs@acme.com"), "Hi jobs acme com")
@@ -0,0 +1,94 @@
+from datetime import UTC, datetime
+
+from django.test import TestCase
+
+from api.models import EmailStat, JobEmail, User
+from api.services.email_stats import get_email_stats, rebuild_email_stats, remove_emails, week_key
+from api.services.gmail_sync import get_email_count, populate_email_database, wipe_emails_for_user
+from api.services.label_cache import clear_label_cache
+from api.services.sender_cache import clear_sender_cache
+from api.tests.helpers import parsed_email
+
+
+class EmailStatsTest(TestCase):
+    # @ HELPERS AND SETUP STUFF
+    def setUp(self):
+        self.user = User.objects.create(email="test@example.com")
+        clear_label_cache()
+        clear_sender_cache()
+
+    def _stats(self):
+        return get_email_stats(self.user)
+
+    # @ TESTS FOR INCREMENTAL STATS
+
+    def test_populate_counts_new_emails(self):
+        populate_email_database(
+            self.user,
+            [
+                parsed_email("1", labels=["INBOX", "STARRED"], day=2),
+                parsed_email("2", sender=("news@other.org", ""), day=10),
+                parsed_email("3", sender=("no-at-sign", ""), day=2),
+            ],
+        )
+
+        self.assertEqual(
+            self._stats(),
+            {
+                "total": 3,
+                "label": {"INBOX": 3, "STARRED": 1},
+                "company": {"acme.com": 1, "other.org": 1},
+                "week": {"2026-02-02": 2, "2026-02-09": 1},
+            },
+        )
+
+    def test_populate_moves_counts_of_updated_emails(self):
+        populate_email_database(self.user, [parsed_email("1", labels=["INBOX", "STARRED"], day=2)])
+        populate_email_database(self.user, [parsed_email("1", labels=["TRASH"], sender=("x@other.org", ""), day=10)])
+
+        self.assertEqual(
+            self._stats(),
+            {"total": 1, "label": {"TRASH": 1}, "company": {"other.org": 1}, "week": {"2026-02-09": 1}},
+        )
+        # emptied rows are deleted rather than left at zero
+        self.assertFalse(EmailStat.objects.filter(count__lte=0).exists())
+
+    def test_remove_emails_subtracts_them(self):
+        populate_email_database(self.user, [parsed_email(str(i), day=2) for i in range(3)])
+
+        deleted = remove_emails(self.user, JobEmail.objects.filter(user=self.user, gmail_id__in=["0", "1"]))
+
+        self.assertEqual(deleted, 2)
+        self.assertEqual(self._stats()["total"], 1)
+        self.assertEqual(self._stats()["label"], {"INBOX": 1})
+
+    def test_wipe_clears_stats(self):
+        populate_email_database(self.user, [parsed_email("1", day=2)])
+
+        wipe_emails_for_user(self.user)
+
+        self.assertFalse(EmailStat.objects.filter(user=self.user).exists())
+        self.assertEqual(get_email_count(self.user), 0)
+
+    def test_rebuild_matches_incremental(self):
+        populate_email_database(
+            self.user,
+            [parsed_email("1", labels=["INBOX", "STARRED"], day=2), parsed_email("2", day=20)],
+        )
+        populate_email_database(self.user, [parsed_email("2", labels=["SENT"], sender=("x@other.org", ""), day=2)])
+        incremental = self._stats()
+
+        EmailStat.objects.filter(user=self.user).update(count=999)
+        rebuild_email_stats(self.user)
+
+        self.assertEqual(self._stats(), incremental)
+
+    def test_email_count_reads_rollup(self):
+        populate_email_database(self.user, [parsed_email(str(i), day=2) for i in range(4)])
+
+        with self.assertNumQueries(1):
+            self.assertEqual(get_email_count(self.user), 4)
+
+    def test_week_key_is_utc_monday(self):
+        self.assertEqual(week_key(datetime(2026, 2, 8, 23, 30, tzinfo=UTC)), "2026-02-02")
+        self.assertEqual(week_key(datetime(2026, 2, 9, 0, 0, tzinfo=UTC)), "2026-02-09")
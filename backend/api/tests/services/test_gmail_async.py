@@ -0,0 +1,263 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import Mock, patch
+from urllib.parse import parse_qs, urlsplit
+
+from django.test import TestCase, override_settings
+
+from api.models import GmailSyncState, JobEmail, User
+from api.services import gmail_async
+from api.services.gmail_service import HistoryExpiredError
+from api.services.gmail_sync import gmail_client, sync_user_emails
+from api.utils.gmail_message import GmailMessage
+
+
+class StubGmailHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = parse_qs(url.query)
+        path = url.path.removeprefix("/gmail/v1/users/me")
+        self.server.requests.append((path, params, self.headers["Authorization"]))
+        if self.headers["Authorization"] in self.server.rejected_tokens:
+            return self._reply(401, {"error": "unauthorized"})
+
+        if path == "/profile":
+            return self._reply(200, {"historyId": "900"})
+        if path == "/history":
+            return self._history(params)
+        if path == "/messages":
+            return self._list(params)
+        return self._get(path.removeprefix("/messages/"))
+
+    def _get(self, msg_id):
+        server = self.server
+        with server.lock:
+            if msg_id in server.always_limited or server.limited_once.pop(msg_id, False):
+                return self._reply(429, {"error": "rateLimitExceeded"}, {"Retry-After": "0"})
+            if msg_id in server.failing:
+                return self._reply(500, {"error": "backendError"})
+        if msg_id not in server.messages:
+            return self._reply(404, {"error": "notFound"})
+        return self._reply(200, server.messages[msg_id])
+
+    def _list(self, params):
+        ids = list(self.server.messages)
+        start = int(params.get("pageToken", ["0"])[0])
+        end = start + int(params["maxResults"][0])
+        body = {"messages": [{"id": msg_id} for msg_id in ids[start:end]]}
+        if end < len(ids):
+            body["nextPageToken"] = str(end)
+        return self._reply(200, body)
+
+    def _history(self, params):
+        if params["startHistoryId"][0] == "expired":
+            return self._reply(404, {"error": "notFound"})
+        page = int(params.get("pageToken", ["0"])[0])
+        body = dict(self.server.history[page])
+        if page + 1 < len(self.server.history):
+            body["nextPageToken"] = str(page + 1)
+        return self._reply(200, body)
+
+    def _reply(self, status, body, headers=None):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def message_response(msg_id, subject="Subject"):
+    return {
+        "id": msg_id,
+        "labelIds": ["INBOX"],
+        "payload": {
+            "headers": [
+                {"name": "Subject", "value": f"{subject} {msg_id}"},
+                {"name": "From", "value": "Acme <jobs@acme.com>"},
+                {"name": "Date", "value": "Sun, 01 Feb 2026 03:33:03 +0000"},
+            ]
+        },
+        "sizeEstimate": 100,
+        "internalDate": "1769916783000",
+    }
+
+
+class GmailAsyncTest(TestCase):
+    # @ HELPERS AND SETUP STUFF
+    def setUp(self):
+        self.user = User.objects.create(email="test@example.com")
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubGmailHandler)
+        self.server.daemon_threads = True
+        self.server.lock = threading.Lock()
+        self.server.connections = 0
+        self.server.requests = []
+        self.server.messages = {str(i): message_response(str(i)) for i in range(10)}
+        self.server.limited_once = {}
+        self.server.always_limited = set()
+        self.server.failing = set()
+        self.server.rejected_tokens = set()
+        self.server.history = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        settings = override_settings(
+            GMAIL_API_URL=f"http://127.0.0.1:{self.server.server_address[1]}", GMAIL_ASYNC_CONCURRENCY=4
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        creds = patch("api.services.gmail_async.get_creds", return_value=Mock(token="test-token"))
+        creds.start()
+        self.addCleanup(creds.stop)
+
+    def tearDown(self):
+        gmail_async.close_connections()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _message_gets(self):
+        return [path for path, _, _ in self.server.requests if path.startswith("/messages/")]
+
+    # @ TESTS FOR FETCH_MESSAGE_DETAILS
+
+    def test_fetches_records_in_order_over_reused_connections(self):
+        ids = [str(i) for i in range(10)]
+
+        messages, failed_ids = gmail_async.fetch_message_details(self.user, ids)
+
+        self.assertEqual([msg.id for msg in messages], ids)
+        self.assertIsInstance(messages[0], GmailMessage)
+        self.assertEqual(messages[3].subject, "Subject 3")
+        self.assertEqual(failed_ids, [])
+        # never more connections than requests in flight, each one carried several requests
+        self.assertLessEqual(self.server.connections, 4)
+        self.assertTrue(all(auth == "Bearer test-token" for _, _, auth in self.server.requests))
+
+        gmail_async.fetch_message_details(self.user, ids[:2])
+        self.assertLessEqual(self.server.connections, 4)
+
+    def test_retries_429_with_retry_after(self):
+        self.server.limited_once = {"2": True, "7": True}
+
+        messages, failed_ids = gmail_async.fetch_message_details(self.user, ["1", "2", "7"])
+
+        self.assertEqual([msg.id for msg in messages], ["1", "2", "7"])
+        self.assertEqual(failed_ids, [])
+        self.assertEqual(self._message_gets().count("/messages/2"), 2)
+
+    def test_reports_ids_still_rate_limited_after_the_final_pass(self):
+        self.server.always_limited = {"5"}
+
+        messages, failed_ids = gmail_async.fetch_message_details(self.user, ["4", "5", "6"])
+
+        self.assertEqual([msg.id for msg in messages], ["4", "6"])
+        self.assertEqual(failed_ids, ["5"])
+        # three attempts, then three more in the final pass
+        self.assertEqual(self._message_gets().count("/messages/5"), 6)
+
+    def test_deleted_messages_are_dropped_without_reporting_them(self):
+        messages, failed_ids = gmail_async.fetch_message_details(self.user, ["1", "missing"])
+
+        self.assertEqual([msg.id for msg in messages], ["1"])
+        self.assertEqual(failed_ids, [])
+
+    def test_reports_ids_that_keep_failing_with_other_errors(self):
+        self.server.failing = {"3"}
+
+        messages, failed_ids = gmail_async.fetch_message_details(self.user, ["2", "3"])
+
+        self.assertEqual([msg.id for msg in messages], ["2"])
+        self.assertEqual(failed_ids, ["3"])
+        # once in the first pass, once more in the final pass
+        self.assertEqual(self._message_gets().count("/messages/3"), 2)
+
+    def test_refreshes_the_token_once_on_401(self):
+        creds = gmail_async.get_creds.return_value
+        creds.refresh.side_effect = lambda request: setattr(creds, "token", "fresh-token")
+        self.server.rejected_tokens = {"Bearer test-token"}
+
+        messages, failed_ids = gmail_async.fetch_message_details(self.user, [str(i) for i in range(10)])
+
+        self.assertEqual(len(messages), 10)
+        self.assertEqual(failed_ids, [])
+        # every request the stale token failed waited for the same refresh
+        creds.refresh.assert_called_once()
+        self.assertEqual(sum(auth == "Bearer fresh-token" for _, _, auth in self.server.requests), 10)
+
+    # @ TESTS FOR LISTING AND HISTORY
+
+    def test_stream_emails_pages_and_skips_known_messages(self):
+        JobEmail.objects.create(
+            user=self.user,
+            gmail_id="0",
+            subject="Stored",
+            received_at="2026-02-01T03:33:03Z",
+            content_type="text/html",
+            size_estimate=1,
+            importance=1,
+        )
+
+        pages = list(gmail_async.stream_emails(self.user, 10, label_ids=["INBOX"]))
+
+        self.assertEqual(sum(len(page) for page in pages), 9)
+        self.assertEqual(pages[0][0].id, "1")
+        _, params, _ = self.server.requests[0]
+        self.assertEqual(params["labelIds"], ["INBOX"])
+
+    def test_fetch_emails_from_gmail_returns_empty_on_api_error(self):
+        with patch("api.services.gmail_async.list_message_ids", side_effect=gmail_async.GmailApiError(500)):
+            self.assertEqual(gmail_async.fetch_emails_from_gmail(self.user), [])
+
+    def test_fetch_history_changes_folds_every_page(self):
+        self.server.history = [
+            {"history": [{"messagesAdded": [{"message": {"id": "1"}}]}], "historyId": "901"},
+            {
+                "history": [
+                    {"messagesAdded": [{"message": {"id": "2"}}]},
+                    {"messagesDeleted": [{"message": {"id": "1"}}]},
+                ],
+                "historyId": "902",
+            },
+        ]
+
+        changes = gmail_async.fetch_history_changes(self.user, "900")
+
+        self.assertEqual(changes, {"changed": ["2"], "deleted": ["1"], "history_id": "902"})
+        self.assertEqual(gmail_async.get_current_history_id(self.user), "900")
+
+    def test_fetch_history_changes_raises_when_history_expired(self):
+        with self.assertRaises(HistoryExpiredError):
+            gmail_async.fetch_history_changes(self.user, "expired")
+
+    # @ TESTS FOR SYNC_USER_EMAILS
+
+    def test_sync_user_emails_with_async_backend(self):
+        stats = sync_user_emails(self.user, 10, backend="async")
+
+        self.assertEqual(stats["fetched"], 10)
+        self.assertEqual(stats["created"], 10)
+        self.assertEqual(stats["errors"], 0)
+        self.assertEqual(JobEmail.objects.get(gmail_id="3").subject, "Subject 3")
+        self.assertEqual(GmailSyncState.objects.get(user=self.user).history_id, "900")
+
+    @override_settings(GMAIL_CLIENT_BACKEND="async")
+    def test_backend_defaults_to_setting(self):
+        self.assertIs(gmail_client(), gmail_async)
+        self.assertIsNot(gmail_client("sync"), gmail_async)
+
+        with self.assertRaises(ValueError):
+            gmail_client("carrier-pigeon")
@@ -1,11 +1,31 @@
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import UTC, datetime, timedelta
 from unittest.mock import MagicMock, Mock, patch
 
 from django.test import TestCase
 from google.oauth2.credentials import Credentials
-
-from api.models import GoogleAuthToken, User
-from api.services.gmail_service import fetch_emails_from_gmail, fetch_total_emails
+from googleapiclient.errors import HttpError
+
+from api.models import GmailSyncState, GoogleAuthToken, JobEmail, Sender, User
+from api.services.gmail_service import (
+    HistoryExpiredError,
+    clear_credentials_cache,
+    clear_fetch_tuning,
+    clear_service_cache,
+    fetch_emails_from_gmail,
+    fetch_history_changes,
+    fetch_message_details,
+    fetch_message_details_batch,
+    fetch_total_emails,
+    get_creds,
+    get_fetch_controller,
+    get_gmail_service,
+    save_fetch_tuning,
+    stream_emails,
+)
+from api.utils.gmail_message import GmailMessage
 
 
 class GmailServiceTest(TestCase):
@@ -35,6 +55,9 @@ class GmailServiceTest(TestCase):
             "scopes": ["https://www.googleapis.com/auth/gmail.metadata"],
         }
         GoogleAuthToken.objects.create(user=self.user, token_json=json.dumps(self.mock_creds_data))
+        clear_credentials_cache()
+        clear_service_cache()
+        clear_fetch_tuning()
 
     def _create_mock_batch(self, messages_to_return):
         mock_batch = MagicMock()
@@ -53,6 +76,93 @@ class GmailServiceTest(TestCase):
         mock_batch.execute = execute_batch
         return mock_batch
 
+    # @ TESTS FOR GET_CREDS
+
+    def _store_token(self, expiry):
+        token_data = {**self.mock_creds_data, "expiry": expiry.strftime("%Y-%m-%dT%H:%M:%SZ")}
+        GoogleAuthToken.objects.filter(user=self.user).update(token_json=json.dumps(token_data))
+
+    @patch("api.services.gmail_service.Credentials.refresh")
+    def test_get_creds_reuses_cached_credentials(self, mock_refresh):
+        self._store_token(datetime.now(UTC) + timedelta(hours=1))
+
+        creds = get_creds(self.user)
+        with self.assertNumQueries(0):
+            cached = get_creds(self.user)
+
+        self.assertIs(cached, creds)
+        mock_refresh.assert_not_called()
+
+    @patch("api.services.gmail_service.Credentials.refresh", autospec=True)
+    def test_get_creds_refreshes_shortly_before_expiry(self, mock_refresh):
+        self._store_token(datetime.now(UTC) + timedelta(minutes=2))
+
+        def refresh(creds, request):
+            creds.token = "fresh_token"
+            creds.expiry = (datetime.now(UTC) + timedelta(hours=1)).replace(tzinfo=None)
+
+        mock_refresh.side_effect = refresh
+
+        creds = get_creds(self.user)
+
+        self.assertEqual(creds.token, "fresh_token")
+        self.assertIn("fresh_token", GoogleAuthToken.objects.get(user=self.user).token_json)
+
+    @patch("api.services.gmail_service._load_creds")
+    def test_get_creds_load_is_single_flight(self, mock_load):
+        fresh_creds = Mock(spec=Credentials, valid=True, expiry=None)
+
+        def slow_load(user):
+            time.sleep(0.05)
+            return fresh_creds
+
+        mock_load.side_effect = slow_load
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            results = list(pool.map(lambda _: get_creds(self.user), range(4)))
+
+        self.assertEqual(mock_load.call_count, 1)
+        self.assertTrue(all(creds is fresh_creds for creds in results))
+
+    # @ TESTS FOR GET_GMAIL_SERVICE
+
+    @patch("api.services.gmail_service.build")
+    @patch("api.services.gmail_service.get_creds")
+    def test_get_gmail_service_builds_once_per_credentials(self, mock_get_creds, mock_build):
+        mock_get_creds.return_value = Mock(spec=Credentials)
+
+        first = get_gmail_service(self.user)
+        second = get_gmail_service(self.user)
+
+        self.assertIs(first, second)
+        mock_build.assert_called_once()
+        self.assertIs(mock_build.call_args[1]["http"].credentials, mock_get_creds.return_value)
+
+    @patch("api.services.gmail_service.build")
+    @patch("api.services.gmail_service.get_creds")
+    def test_get_gmail_service_rebuilds_after_credentials_change(self, mock_get_creds, mock_build):
+        mock_get_creds.side_effect = [Mock(spec=Credentials), Mock(spec=Credentials)]
+
+        get_gmail_service(self.user)
+        get_gmail_service(self.user)
+
+        self.assertEqual(mock_build.call_count, 2)
+
+    @patch("api.services.gmail_service.build")
+    @patch("api.services.gmail_service.get_creds")
+    def test_list_and_single_batch_share_one_service(self, mock_get_creds, mock_build):
+        mock_get_creds.return_value = Mock(spec=Credentials)
+        mock_service = MagicMock()
+        mock_build.return_value = mock_service
+        mock_service.users().messages().list().execute.return_value = {"messages": [{"id": "msg1"}]}
+        mock_service.new_batch_http_request.return_value = self._create_mock_batch(
+            [{"id": "msg1", "payload": {"headers": []}}]
+        )
+
+        fetch_emails_from_gmail(self.user, max_results=1)
+
+        mock_build.assert_called_once()
+
     # @ TESTS FOR FETCH_EMAILS_FROM_GMAIL
 
     @patch("api.services.gmail_service.fetch_message_details_batch")
@@ -81,7 +191,9 @@ class GmailServiceTest(TestCase):
 
         results = fetch_emails_from_gmail(self.user, max_results=2)
         self.assertEqual(len(results), 2)
-        self.assertEqual(results[0]["id"], "msg1")
+        # responses are cut down to records in the batch callback
+        self.assertIsInstance(results[0], GmailMessage)
+        self.assertEqual(results[0].id, "msg1")
 
     @patch("api.services.gmail_service.build")
     @patch("api.services.gmail_service.get_creds")
@@ -161,3 +273,294 @@ class GmailServiceTest(TestCase):
 
         results = fetch_total_emails(self.user, total_count=1000)
         self.assertEqual(len(results), 10)
+
+    # @ TESTS FOR FETCH_MESSAGE_DETAILS_BATCH
+
+    @patch("api.services.gmail_service.get_rate_limiter")
+    @patch("api.services.gmail_service._execute_batch_with_retry")
+    @patch("api.services.gmail_service.build")
+    @patch("api.services.gmail_service.get_creds")
+    def test_fetch_details_concurrent_keeps_batch_order(self, mock_get_creds, mock_build, mock_execute, mock_limiter):
+        mock_get_creds.return_value = Mock(spec=Credentials)
+        mock_execute.side_effect = lambda service, ids: ([{"id": msg_id} for msg_id in ids], [], None)
+        message_ids = [str(i) for i in range(120)]
+
+        results = fetch_message_details_batch(self.user, message_ids, max_workers=3)
+
+        self.assertEqual([msg["id"] for msg in results], message_ids)
+        self.assertEqual(mock_execute.call_count, 3)
+        mock_limiter.return_value.acquire.assert_any_call(50 * 5)
+
+    @patch("api.services.gmail_service.get_rate_limiter")
+    @patch("api.services.gmail_service._execute_batch_with_retry")
+    @patch("api.services.gmail_service.build")
+    @patch("api.services.gmail_service.get_creds")
+    def test_fetch_details_retries_rate_limited_ids_after_retry_after(
+        self, mock_get_creds, mock_build, mock_execute, mock_limiter
+    ):
+        mock_get_creds.return_value = Mock(spec=Credentials)
+        mock_execute.side_effect = [([{"id": "1"}], ["2"], 7.0), ([{"id": "2"}], [], None)]
+
+        results = fetch_message_details_batch(self.user, ["1", "2"], max_workers=1)
+
+        self.assertEqual([msg["id"] for msg in results], ["1", "2"])
+        self.assertEqual(mock_execute.call_args_list[1][0][1], ["2"])
+        mock_limiter.return_value.pause.assert_called_once_with(7.0)
+
+    @patch("api.services.gmail_service.get_rate_limiter")
+    @patch("api.services.gmail_service._execute_batch_with_retry")
+    @patch("api.services.gmail_service.build")
+    @patch("api.services.gmail_service.get_creds")
+    def test_fetch_details_reports_ids_that_stay_rate_limited(
+        self, mock_get_creds, mock_build, mock_execute, mock_limiter
+    ):
+        mock_get_creds.return_value = Mock(spec=Credentials)
+        mock_execute.side_effect = lambda service, ids: ([{"id": i} for i in ids if i != "stuck"], ["stuck"], None)
+
+        messages, failed_ids = fetch_message_details(self.user, ["1", "stuck"], max_workers=1)
+
+        self.assertEqual([msg["id"] for msg in messages], ["1"])
+        self.assertEqual(failed_ids, ["stuck"])
+        # three attempts in the first pass, three more in the final pass
+        self.assertEqual(mock_execute.call_count, 6)
+
+    @patch("api.services.gmail_service.get_rate_limiter")
+    @patch("api.services.gmail_service._execute_batch_with_retry")
+    @patch("api.services.gmail_service.build")
+    @patch("api.services.gmail_service.get_creds")
+    def test_fetch_details_reports_batches_that_keep_failing(
+        self, mock_get_creds, mock_build, mock_execute, mock_limiter
+    ):
+        mock_get_creds.return_value = Mock(spec=Credentials)
+        mock_execute.side_effect = HttpError(Mock(status=503), b"backend error")
+
+        messages, failed_ids = fetch_message_details(self.user, ["1", "2"], max_workers=1)
+
+        self.assertEqual(messages, [])
+        self.assertEqual(failed_ids, ["1", "2"])
+        self.assertEqual(mock_execute.call_count, 6)
+
+    @patch("api.services.gmail_service.get_rate_limiter")
+    @patch("api.services.gmail_service.build")
+    @patch("api.services.gmail_service.get_creds")
+    def test_fetch_details_reports_errored_messages_but_not_deleted_ones(
+        self, mock_get_creds, mock_build, mock_limiter
+    ):
+        mock_get_creds.return_value = Mock(spec=Credentials)
+        errors = {"1": None, "2": HttpError(Mock(status=500), b""), "3": HttpError(Mock(status=404), b"")}
+
+        def new_batch():
+            requested.clear()
+            batch = MagicMock()
+            callbacks = []
+            batch.add = lambda request, callback: callbacks.append(callback)
+            batch.execute = lambda: [
+                callback(None, None if errors[msg_id] else self.mock_full_email, errors[msg_id])
+                for msg_id, callback in zip(requested, callbacks, strict=True)
+            ]
+            return batch
+
+        requested = []
+        mock_service = mock_build.return_value
+        mock_service.new_batch_http_request.side_effect = new_batch
+        mock_service.users.return_value.messages.return_value.get.side_effect = lambda **kwargs: requested.append(
+            kwargs["id"]
+        )
+
+        messages, failed_ids = fetch_message_details(self.user, list(errors), max_workers=1)
+
+        self.assertEqual(len(messages), 1)
+        # the 500 is retried and then reported, the 404 is gone for good
+        self.assertEqual(failed_ids, ["2"])
+
+    @patch("api.services.gmail_service.get_rate_limiter")
+    @patch("api.services.gmail_service._execute_batch_with_retry")
+    @patch("api.services.gmail_service.build")
+    @patch("api.services.gmail_service.get_creds")
+    def test_fetch_details_remembers_learned_batch_size(self, mock_get_creds, mock_build, mock_execute, mock_limiter):
+        mock_get_creds.return_value = Mock(spec=Credentials)
+        GmailSyncState.objects.create(user=self.user, fetch_batch_size=40, fetch_workers=2)
+        mock_execute.side_effect = [([], ["1"], None), ([{"id": "1"}], [], None)]
+
+        fetch_message_details_batch(self.user, ["1"])
+
+        # only remembered in memory by the fetch, the next one starts from it
+        state = GmailSyncState.objects.get(user=self.user)
+        self.assertEqual((state.fetch_batch_size, state.fetch_workers), (40, 2))
+        controller = get_fetch_controller(self.user)
+        self.assertEqual((controller.batch_size, controller.workers), (20, 1))
+
+        self.assertTrue(save_fetch_tuning(self.user))
+        state.refresh_from_db()
+        self.assertEqual((state.fetch_batch_size, state.fetch_workers), (20, 1))
+        self.assertFalse(save_fetch_tuning(self.user))
+
+    # @ TESTS FOR SKIPPING KNOWN MESSAGES
+
+    def _store_email(self, gmail_id):
+        JobEmail.objects.create(
+            user=self.user,
+            gmail_id=gmail_id,
+            subject="Stored",
+            sender=Sender.objects.get_or_create(email="hello@chess.com")[0],
+            sender_name="Chess.com",
+            received_at="2026-02-01T03:33:03Z",
+            content_type="text/html",
+            size_estimate=1,
+            importance=1,
+        )
+
+    @patch("api.services.gmail_service.fetch_message_details_batch")
+    @patch("api.services.gmail_service.list_message_ids")
+    def test_fetch_total_skips_stored_messages(self, mock_list, mock_batch):
+        self._store_email("1")
+        mock_list.side_effect = [
+            {"messages": [{"id": "1"}, {"id": "2"}], "nextPageToken": "page_2_token"},
+            {"messages": [{"id": "3"}]},
+        ]
+        mock_batch.return_value = []
+
+        fetch_total_emails(self.user, total_count=3)
+
+        mock_batch.assert_called_once_with(self.user, ["2", "3"], unfetched=None)
+
+    @patch("api.services.gmail_service.fetch_message_details_batch")
+    @patch("api.services.gmail_service.list_message_ids")
+    def test_fetch_emails_all_stored_skips_detail_fetch(self, mock_list, mock_batch):
+        self._store_email("1")
+        mock_list.return_value = {"messages": [{"id": "1"}]}
+
+        results = fetch_emails_from_gmail(self.user, max_results=1)
+
+        self.assertEqual(results, [])
+        mock_batch.assert_not_called()
+
+    @patch("api.services.gmail_service.fetch_message_details_batch")
+    @patch("api.services.gmail_service.list_message_ids")
+    def test_fetch_emails_refresh_fetches_stored_messages(self, mock_list, mock_batch):
+        self._store_email("1")
+        mock_list.return_value = {"messages": [{"id": "1"}, {"id": "2"}]}
+        mock_batch.return_value = [self.mock_full_email]
+
+        fetch_emails_from_gmail(self.user, max_results=2, refresh=True)
+
+        mock_batch.assert_called_once_with(self.user, ["1", "2"], unfetched=None)
+
+    # @ TESTS FOR STREAM_EMAILS
+
+    @patch("api.services.gmail_service.fetch_message_details_batch")
+    @patch("api.services.gmail_service.list_message_ids")
+    def test_stream_emails_yields_one_batch_per_page(self, mock_list, mock_batch):
+        mock_list.side_effect = [
+            {"messages": [{"id": "1"}, {"id": "2"}], "nextPageToken": "page_2_token"},
+            {"messages": [{"id": "3"}]},
+        ]
+        mock_batch.side_effect = lambda user, ids, unfetched=None: [{"id": msg_id} for msg_id in ids]
+        progress = []
+
+        # refresh keeps the background threads away from the test transaction
+        batches = list(
+            stream_emails(self.user, 1000, progress_callback=lambda *args: progress.append(args), refresh=True)
+        )
+
+        self.assertEqual(batches, [[{"id": "1"}, {"id": "2"}], [{"id": "3"}]])
+        self.assertEqual(progress, [(2, 1000), (3, 1000)])
+
+    @patch("api.services.gmail_service.fetch_message_details_batch")
+    @patch("api.services.gmail_service.list_message_ids")
+    def test_stream_emails_lists_from_and_keeps_the_cursor(self, mock_list, mock_batch):
+        mock_list.side_effect = [
+            {"messages": [{"id": "3"}, {"id": "4"}], "nextPageToken": "page_3_token"},
+            {"messages": [{"id": "5"}]},
+        ]
+        mock_batch.side_effect = lambda user, ids, unfetched=None: [{"id": msg_id} for msg_id in ids]
+        cursor = {"page_token": "page_2_token"}
+
+        list(stream_emails(self.user, 2, prefetch=0, cursor=cursor))
+
+        self.assertEqual(mock_list.call_args.kwargs["page_token"], "page_2_token")
+        self.assertEqual(cursor, {"page_token": "page_3_token", "listed": 2})
+
+        list(stream_emails(self.user, 2, prefetch=0, cursor=cursor))
+
+        self.assertEqual(cursor, {"page_token": None, "listed": 1})
+
+    @patch("api.services.gmail_service.fetch_message_details_batch")
+    @patch("api.services.gmail_service.list_message_ids")
+    def test_stream_emails_records_a_listing_error_in_the_cursor(self, mock_list, mock_batch):
+        mock_list.side_effect = [
+            {"messages": [{"id": "3"}], "nextPageToken": "page_2_token"},
+            HttpError(Mock(status=503), b"backend error"),
+        ]
+        mock_batch.side_effect = lambda user, ids, unfetched=None: [{"id": msg_id} for msg_id in ids]
+        cursor = {"page_token": None}
+
+        batches = list(stream_emails(self.user, 10, prefetch=0, cursor=cursor))
+
+        self.assertEqual(batches, [[{"id": "3"}]])
+        self.assertEqual(cursor["page_token"], "page_2_token")
+        self.assertIn("error", cursor)
+
+    @patch("api.services.gmail_service.fetch_message_details_batch")
+    @patch("api.services.gmail_service.list_message_ids")
+    def test_stream_emails_inline_skips_stored_messages(self, mock_list, mock_batch):
+        self._store_email("1")
+        mock_list.return_value = {"messages": [{"id": "1"}, {"id": "2"}]}
+        mock_batch.side_effect = lambda user, ids, unfetched=None: [{"id": msg_id} for msg_id in ids]
+
+        batches = list(stream_emails(self.user, 2, prefetch=0))
+
+        self.assertEqual(batches, [[{"id": "2"}]])
+
+    @patch("api.services.gmail_service.fetch_message_details_batch")
+    @patch("api.services.gmail_service.list_message_ids")
+    def test_stream_emails_reraises_fetch_errors(self, mock_list, mock_batch):
+        mock_list.return_value = {"messages": [{"id": "1"}]}
+        mock_batch.side_effect = RuntimeError("boom")
+
+        with self.assertRaises(RuntimeError):
+            list(stream_emails(self.user, 1, refresh=True))
+
+    # @ TESTS FOR FETCH_HISTORY_CHANGES
+
+    @patch("api.services.gmail_service.build")
+    @patch("api.services.gmail_service.get_creds")
+    def test_fetch_history_collects_changes_across_pages(self, mock_get_creds, mock_build):
+        mock_get_creds.return_value = Mock(spec=Credentials)
+        mock_service = MagicMock()
+        mock_build.return_value = mock_service
+
+        mock_service.users().history().list().execute.side_effect = [
+            {
+                "history": [
+                    {"messagesAdded": [{"message": {"id": "new"}}, {"message": {"id": "gone"}}]},
+                    {"labelsAdded": [{"message": {"id": "relabeled"}, "labelIds": ["STARRED"]}]},
+                ],
+                "nextPageToken": "page2",
+                "historyId": "150",
+            },
+            {
+                "history": [{"messagesDeleted": [{"message": {"id": "gone"}}, {"message": {"id": "old"}}]}],
+                "historyId": "200",
+            },
+        ]
+
+        changes = fetch_history_changes(self.user, "100")
+
+        self.assertEqual(changes["changed"], ["new", "relabeled"])
+        self.assertEqual(set(changes["deleted"]), {"gone", "old"})
+        self.assertEqual(changes["history_id"], "200")
+        call_args = mock_service.users().history().list.call_args[1]
+        self.assertEqual(call_args["startHistoryId"], "100")
+        self.assertEqual(call_args["pageToken"], "page2")
+
+    @patch("api.services.gmail_service.build")
+    @patch("api.services.gmail_service.get_creds")
+    def test_fetch_history_expired_raises(self, mock_get_creds, mock_build):
+        mock_get_creds.return_value = Mock(spec=Credentials)
+        mock_service = MagicMock()
+        mock_build.return_value = mock_service
+        mock_service.users().history().list().execute.side_effect = HttpError(Mock(status=404), b"Not Found")
+
+        with self.assertRaises(HistoryExpiredError):
+            fetch_history_changes(self.user, "1")
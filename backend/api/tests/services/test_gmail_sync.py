@@ -0,0 +1,400 @@
+import threading
+from datetime import UTC, datetime
+from unittest.mock import patch
+
+from django.test import TestCase
+
+from api.models import Company, GmailSyncState, JobEmail, Label, Sender, User
+from api.services.gmail_service import HistoryExpiredError
+from api.services.gmail_sync import get_email_count, populate_email_database, sync_user_emails
+from api.services.label_cache import clear_label_cache, resolve_label_ids
+from api.services.sender_cache import clear_sender_cache, resolve_senders
+from api.tests.helpers import parsed_email
+
+
+class PopulateEmailDatabaseTest(TestCase):
+    # @ HELPERS AND SETUP STUFF
+    def setUp(self):
+        self.user = User.objects.create(email="test@example.com")
+        clear_label_cache()
+        clear_sender_cache()
+
+    # @ TESTS FOR POPULATE_EMAIL_DATABASE
+
+    def test_populate_creates_new_emails(self):
+        stats = populate_email_database(self.user, [parsed_email("1"), parsed_email("2")])
+
+        self.assertEqual(stats, {"created": 2, "updated": 0})
+        self.assertEqual(JobEmail.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(list(JobEmail.objects.get(gmail_id="1").labels.values_list("name", flat=True)), ["INBOX"])
+
+    def test_populate_updates_existing_emails_and_keeps_pk(self):
+        populate_email_database(self.user, [parsed_email("1")])
+        original_pk = JobEmail.objects.get(gmail_id="1").pk
+
+        stats = populate_email_database(
+            self.user, [parsed_email("1", subject="Changed", labels=["STARRED"]), parsed_email("2")]
+        )
+
+        self.assertEqual(stats, {"created": 1, "updated": 1})
+        email = JobEmail.objects.get(gmail_id="1")
+        self.assertEqual(email.pk, original_pk)
+        self.assertEqual(email.subject, "Changed")
+        self.assertEqual(list(email.labels.values_list("name", flat=True)), ["STARRED"])
+
+    def test_populate_spans_multiple_chunks(self):
+        emails = [parsed_email(str(i)) for i in range(7)]
+
+        stats = populate_email_database(self.user, emails, chunk_size=3)
+
+        self.assertEqual(stats, {"created": 7, "updated": 0})
+        self.assertEqual(JobEmail.objects.count(), 7)
+
+    def test_populate_duplicate_ids_in_chunk_last_one_wins(self):
+        emails = [parsed_email("1", subject="First"), parsed_email("1", subject="Second")]
+
+        stats = populate_email_database(self.user, emails)
+
+        self.assertEqual(stats, {"created": 1, "updated": 0})
+        self.assertEqual(JobEmail.objects.get(gmail_id="1").subject, "Second")
+
+    def test_populate_does_not_mutate_input(self):
+        email = parsed_email("1")
+
+        populate_email_database(self.user, [email])
+
+        self.assertEqual(email["labels"], ["INBOX"])
+
+    def test_populate_emails_without_labels_keep_existing_labels(self):
+        populate_email_database(self.user, [parsed_email("1", labels=["INBOX", "STARRED"])])
+
+        populate_email_database(self.user, [parsed_email("1", labels=[])])
+
+        labels = set(JobEmail.objects.get(gmail_id="1").labels.values_list("name", flat=True))
+        self.assertEqual(labels, {"INBOX", "STARRED"})
+
+    def test_populate_label_queries_do_not_grow_with_chunk_size(self):
+        emails = [parsed_email(str(i), labels=["INBOX", "UNREAD", f"Label_{i % 3}"]) for i in range(50)]
+
+        # savepoint, existing lookup, sender select, company select/insert/read back, sender insert/read back,
+        # upsert, search text upsert, label select, label insert, label read back, through insert,
+        # stat insert/lock/update, data version bump, release
+        with self.assertNumQueries(19):
+            populate_email_database(self.user, emails)
+
+        self.assertEqual(Label.objects.count(), 5)
+        self.assertEqual(JobEmail.labels.through.objects.count(), 150)
+
+    def test_populate_leaves_other_users_emails_alone(self):
+        other = User.objects.create(email="other@example.com")
+        populate_email_database(other, [parsed_email("1", subject="Theirs", labels=["STARRED"])])
+
+        stats = populate_email_database(self.user, [parsed_email("1", subject="Mine"), parsed_email("2")])
+
+        self.assertEqual(stats, {"created": 1, "updated": 0})
+        theirs = JobEmail.objects.get(gmail_id="1")
+        self.assertEqual((theirs.user, theirs.subject), (other, "Theirs"))
+        self.assertEqual(list(theirs.labels.values_list("name", flat=True)), ["STARRED"])
+        self.assertEqual(get_email_count(self.user), 1)
+        self.assertEqual(get_email_count(other), 1)
+
+    def test_populate_interns_senders_and_companies(self):
+        emails = [
+            parsed_email("1", sender=("jane@acme.com", "Jane")),
+            parsed_email("2", sender=("jobs@Acme.com", "Acme Jobs")),
+            parsed_email("3", sender=("jane@acme.com", "Jane Doe")),
+            parsed_email("4", sender=("", "")),
+        ]
+
+        populate_email_database(self.user, emails)
+
+        acme = Company.objects.get(domain="acme.com")
+        self.assertEqual(Sender.objects.count(), 2)
+        self.assertEqual(set(acme.emails.values_list("gmail_id", flat=True)), {"1", "2", "3"})
+        email = JobEmail.objects.get(gmail_id="1")
+        self.assertEqual((email.sender_email, email.sender_name), ("jane@acme.com", "Jane"))
+        self.assertEqual(JobEmail.objects.get(gmail_id="3").sender_name, "Jane Doe")
+        self.assertIsNone(JobEmail.objects.get(gmail_id="4").sender)
+
+    def test_populate_keeps_each_users_sender_name(self):
+        other = User.objects.create(email="other@example.com")
+
+        populate_email_database(self.user, [parsed_email("1", sender=("hr@acme.com", "Acme HR"))])
+        populate_email_database(other, [parsed_email("2", sender=("hr@acme.com", "Acme Recruiting"))])
+
+        names = dict(JobEmail.objects.values_list("gmail_id", "sender_name"))
+        self.assertEqual(names, {"1": "Acme HR", "2": "Acme Recruiting"})
+        self.assertEqual(Sender.objects.count(), 1)
+
+
+class SenderCacheTest(TestCase):
+    def setUp(self):
+        clear_sender_cache()
+
+    def test_resolve_uses_cache_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = resolve_senders(["hr@acme.com"])
+
+        with self.assertNumQueries(0):
+            again = resolve_senders(["hr@acme.com"])
+
+        sender = Sender.objects.get(email="hr@acme.com")
+        self.assertEqual(first, again)
+        self.assertEqual(again["hr@acme.com"], (sender.id, sender.company_id))
+
+
+class LabelCacheTest(TestCase):
+    def setUp(self):
+        clear_label_cache()
+
+    def test_resolve_creates_missing_labels(self):
+        Label.objects.create(name="INBOX")
+
+        label_ids = resolve_label_ids(["INBOX", "STARRED", "INBOX"])
+
+        self.assertEqual(set(label_ids), {"INBOX", "STARRED"})
+        self.assertEqual(label_ids["STARRED"], Label.objects.get(name="STARRED").id)
+
+    def test_resolve_uses_cache_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            resolve_label_ids(["INBOX"])
+
+        with self.assertNumQueries(0):
+            label_ids = resolve_label_ids(["INBOX"])
+
+        self.assertEqual(label_ids["INBOX"], Label.objects.get(name="INBOX").id)
+
+    def test_deleting_label_evicts_it_from_cache(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            resolve_label_ids(["INBOX"])
+
+        Label.objects.get(name="INBOX").delete()
+
+        label_ids = resolve_label_ids(["INBOX"])
+
+        self.assertEqual(label_ids["INBOX"], Label.objects.get(name="INBOX").id)
+
+
+class SyncUserEmailsTest(TestCase):
+    # @ HELPERS AND SETUP STUFF
+    def setUp(self):
+        self.user = User.objects.create(email="test@example.com")
+        clear_label_cache()
+
+    def _parser(self, raw_emails):
+        return [
+            {
+                "gmail_id": email["id"],
+                "subject": "Subject",
+                "sender_email": "hello@chess.com",
+                "sender_name": "Chess.com",
+                "received_at": datetime(2026, 2, 1, tzinfo=UTC),
+                "content_type": "text/html",
+                "size_estimate": 1,
+                "importance": 1,
+                "labels": email.get("labelIds", []),
+            }
+            for email in raw_emails
+        ]
+
+    # @ TESTS FOR SYNC_USER_EMAILS
+
+    @patch("api.services.gmail_sync.fetch_emails_from_gmail")
+    @patch("api.services.gmail_sync.get_current_history_id")
+    def test_full_sync_stores_checkpoint(self, mock_history_id, mock_fetch):
+        mock_history_id.return_value = "500"
+        mock_fetch.return_value = [{"id": "1", "labelIds": ["INBOX"]}]
+
+        stats = sync_user_emails(self.user, 10, parser_func=self._parser)
+
+        self.assertEqual(stats["created"], 1)
+        self.assertEqual(stats["errors"], 0)
+        state = GmailSyncState.objects.get(user=self.user)
+        self.assertEqual(state.history_id, "500")
+        self.assertIsNotNone(state.last_full_sync_at)
+
+    @patch("api.services.gmail_sync.fetch_emails_from_gmail")
+    @patch("api.services.gmail_sync.get_current_history_id")
+    def test_full_sync_skips_checkpoint_when_listing_fails(self, mock_history_id, mock_fetch):
+        mock_history_id.return_value = "500"
+
+        def fail_listing(*args, cursor, **kwargs):
+            cursor["error"] = "<HttpError 503>"
+            return []
+
+        mock_fetch.side_effect = fail_listing
+
+        stats = sync_user_emails(self.user, 10, parser_func=self._parser)
+
+        self.assertEqual(stats["errors"], 1)
+        self.assertFalse(GmailSyncState.objects.filter(user=self.user).exists())
+
+    @patch("api.services.gmail_sync.fetch_message_details")
+    @patch("api.services.gmail_sync.fetch_history_changes")
+    def test_incremental_sync_applies_history(self, mock_changes, mock_details):
+        GmailSyncState.objects.create(user=self.user, history_id="500")
+        populate_email_database(self.user, self._parser([{"id": "gone"}, {"id": "kept"}]))
+        mock_changes.return_value = {"changed": ["new"], "deleted": ["gone"], "history_id": "600"}
+        mock_details.return_value = ([{"id": "new", "labelIds": ["INBOX"]}], [])
+
+        stats = sync_user_emails(self.user, 10, parser_func=self._parser, incremental=True)
+
+        mock_changes.assert_called_once_with(self.user, "500")
+        mock_details.assert_called_once_with(self.user, ["new"])
+        self.assertEqual(stats["created"], 1)
+        self.assertEqual(stats["deleted"], 1)
+        self.assertEqual(set(JobEmail.objects.values_list("gmail_id", flat=True)), {"kept", "new"})
+        self.assertEqual(GmailSyncState.objects.get(user=self.user).history_id, "600")
+
+    @patch("api.services.gmail_sync.fetch_message_details")
+    @patch("api.services.gmail_sync.fetch_history_changes")
+    def test_incremental_sync_keeps_checkpoint_when_messages_unfetched(self, mock_changes, mock_details):
+        GmailSyncState.objects.create(user=self.user, history_id="500")
+        mock_changes.return_value = {"changed": ["new", "throttled"], "deleted": [], "history_id": "600"}
+        mock_details.return_value = ([{"id": "new"}], ["throttled"])
+
+        stats = sync_user_emails(self.user, 10, parser_func=self._parser, incremental=True)
+
+        self.assertEqual(stats["created"], 1)
+        self.assertEqual(stats["unfetched"], 1)
+        self.assertEqual(GmailSyncState.objects.get(user=self.user).history_id, "500")
+
+    @patch("api.services.gmail_sync.fetch_emails_from_gmail")
+    @patch("api.services.gmail_sync.get_current_history_id")
+    @patch("api.services.gmail_sync.fetch_history_changes")
+    def test_incremental_sync_falls_back_when_history_expired(self, mock_changes, mock_history_id, mock_fetch):
+        GmailSyncState.objects.create(user=self.user, history_id="1")
+        mock_changes.side_effect = HistoryExpiredError("expired")
+        mock_history_id.return_value = "900"
+        mock_fetch.return_value = [{"id": "1"}]
+
+        stats = sync_user_emails(self.user, 10, parser_func=self._parser, incremental=True)
+
+        mock_fetch.assert_called_once()
+        self.assertTrue(mock_fetch.call_args.kwargs["refresh"])
+        self.assertEqual(stats["created"], 1)
+        self.assertEqual(GmailSyncState.objects.get(user=self.user).history_id, "900")
+
+    @patch("api.services.gmail_sync.stream_emails")
+    @patch("api.services.gmail_sync.get_current_history_id")
+    def test_large_full_sync_persists_streamed_batches(self, mock_history_id, mock_stream):
+        mock_history_id.return_value = "500"
+        mock_stream.return_value = iter([[{"id": "1"}, {"id": "2"}], [{"id": "3"}]])
+
+        stats = sync_user_emails(self.user, 1000, parser_func=self._parser)
+
+        self.assertEqual(stats["fetched"], 3)
+        self.assertEqual(stats["created"], 3)
+        self.assertEqual(JobEmail.objects.filter(user=self.user).count(), 3)
+
+    @patch("api.services.gmail_sync.stream_emails")
+    @patch("api.services.gmail_sync.get_current_history_id")
+    def test_full_sync_stops_between_batches_when_asked(self, mock_history_id, mock_stream):
+        mock_history_id.return_value = "500"
+        stop = threading.Event()
+
+        def pages(*args, **kwargs):
+            yield [{"id": "1"}]
+            stop.set()
+            yield [{"id": "2"}]
+
+        mock_stream.side_effect = pages
+
+        stats = sync_user_emails(self.user, 1000, parser_func=self._parser, stop=stop)
+
+        self.assertEqual(stats["errors"], 1)
+        self.assertEqual(list(JobEmail.objects.values_list("gmail_id", flat=True)), ["1"])
+        self.assertFalse(GmailSyncState.objects.filter(user=self.user).exists())
+
+    @patch("api.services.gmail_sync.stream_emails")
+    @patch("api.services.gmail_sync.get_current_history_id")
+    def test_full_sync_skips_checkpoint_when_messages_unfetched(self, mock_history_id, mock_stream):
+        mock_history_id.return_value = "500"
+
+        def pages(*args, unfetched, **kwargs):
+            yield [{"id": "1"}]
+            unfetched.append("failing")
+
+        mock_stream.side_effect = pages
+
+        stats = sync_user_emails(self.user, 1000, parser_func=self._parser)
+
+        self.assertEqual(stats["created"], 1)
+        self.assertEqual(stats["unfetched"], 1)
+        self.assertEqual(stats["errors"], 0)
+        self.assertFalse(GmailSyncState.objects.filter(user=self.user).exists())
+
+    @patch("api.services.gmail_sync.stream_emails")
+    @patch("api.services.gmail_sync.get_current_history_id")
+    def test_full_sync_reports_where_listing_stopped(self, mock_history_id, mock_stream):
+        mock_history_id.return_value = "500"
+
+        def pages(*args, cursor, **kwargs):
+            yield [{"id": "1"}]
+            cursor.update(page_token="page-3", listed=1000)
+
+        mock_stream.side_effect = pages
+
+        stats = sync_user_emails(self.user, 1000, parser_func=self._parser)
+
+        self.assertEqual(stats["listed"], 1000)
+        self.assertEqual(stats["next_page_token"], "page-3")
+        self.assertEqual(GmailSyncState.objects.get(user=self.user).history_id, "500")
+
+    @patch("api.services.gmail_sync.stream_emails")
+    @patch("api.services.gmail_sync.get_current_history_id")
+    def test_continued_full_sync_leaves_the_checkpoint_alone(self, mock_history_id, mock_stream):
+        GmailSyncState.objects.create(user=self.user, history_id="500")
+        cursors = []
+
+        def pages(*args, cursor, **kwargs):
+            cursors.append(dict(cursor))
+            yield [{"id": "old"}]
+            cursor.update(page_token=None, listed=600)
+
+        mock_stream.side_effect = pages
+
+        stats = sync_user_emails(self.user, 1000, parser_func=self._parser, incremental=True, page_token="page-3")
+
+        self.assertEqual(cursors, [{"page_token": "page-3"}])
+        mock_history_id.assert_not_called()
+        self.assertFalse(stats["incremental"])
+        self.assertEqual(stats["created"], 1)
+        self.assertIsNone(stats["next_page_token"])
+        self.assertEqual(GmailSyncState.objects.get(user=self.user).history_id, "500")
+
+    @patch("api.services.gmail_sync.stream_emails")
+    def test_continued_full_sync_drops_the_checkpoint_when_messages_unfetched(self, mock_stream):
+        GmailSyncState.objects.create(user=self.user, history_id="500")
+
+        def pages(*args, unfetched, **kwargs):
+            yield [{"id": "old"}]
+            unfetched.append("older")
+
+        mock_stream.side_effect = pages
+
+        stats = sync_user_emails(self.user, 1000, parser_func=self._parser, page_token="page-3")
+
+        self.assertEqual(stats["unfetched"], 1)
+        self.assertEqual(GmailSyncState.objects.get(user=self.user).history_id, "")
+
+    @patch("api.services.gmail_sync.save_fetch_tuning")
+    @patch("api.services.gmail_sync.stream_emails")
+    @patch("api.services.gmail_sync.get_current_history_id")
+    def test_fetch_tuning_is_saved_after_ingest_in_the_calling_thread(self, mock_history_id, mock_stream, mock_save):
+        mock_history_id.return_value = "500"
+        ingested = []
+
+        def pages():
+            yield [{"id": "1"}]
+            ingested.append(JobEmail.objects.filter(user=self.user).count())
+
+        mock_stream.return_value = pages()
+        saved_after = []
+        mock_save.side_effect = lambda user: saved_after.append(list(ingested))
+
+        sync_user_emails(self.user, 1000, parser_func=self._parser)
+
+        mock_save.assert_called_once_with(self.user)
+        # the stream was drained and its page stored before the tuning was written
+        self.assertEqual(saved_after, [[1]])
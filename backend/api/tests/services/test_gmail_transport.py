@@ -0,0 +1,44 @@
+import threading
+from unittest.mock import Mock
+
+from django.test import SimpleTestCase, override_settings
+from google.oauth2.credentials import Credentials
+
+from api.services.gmail_transport import close_thread_http, get_authorized_http, get_thread_http
+
+
+def stub_http():
+    return Mock(name="stub_http")
+
+
+class GmailTransportTest(SimpleTestCase):
+    def setUp(self):
+        close_thread_http()
+
+    def tearDown(self):
+        close_thread_http()
+
+    def test_same_thread_reuses_connection_pool_across_users(self):
+        first = get_authorized_http(Mock(spec=Credentials))
+        second = get_authorized_http(Mock(spec=Credentials))
+
+        self.assertIs(first.http, second.http)
+
+    def test_threads_get_their_own_connection_pool(self):
+        other = []
+        thread = threading.Thread(target=lambda: other.append(get_thread_http()))
+        thread.start()
+        thread.join()
+
+        self.assertIsNot(other[0], get_thread_http())
+
+    def test_close_thread_http_starts_a_new_pool(self):
+        first = get_thread_http()
+
+        close_thread_http()
+
+        self.assertIsNot(get_thread_http(), first)
+
+    @override_settings(GMAIL_HTTP_FACTORY="api.tests.services.test_gmail_transport.stub_http")
+    def test_transport_factory_is_pluggable(self):
+        self.assertEqual(get_thread_http()._mock_name, "stub_http")
@@ -0,0 +1,158 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.db import OperationalError
+from django.test import TestCase
+from django.utils import timezone
+
+from api.models import SyncJob, User
+from api.services.job_queue import claim_job, enqueue_sync, heartbeat, requeue_expired_jobs, run_job
+
+
+class JobQueueTest(TestCase):
+    # @ HELPERS AND SETUP STUFF
+    def setUp(self):
+        self.user = User.objects.create(email="test@example.com")
+
+    # @ TESTS FOR ENQUEUE_SYNC AND CLAIM_JOB
+
+    def test_enqueue_skips_user_with_active_job(self):
+        job, created = enqueue_sync(self.user, total_count=100)
+        again, created_again = enqueue_sync(self.user, total_count=200)
+
+        self.assertTrue(created)
+        self.assertFalse(created_again)
+        self.assertEqual(again.pk, job.pk)
+        self.assertEqual(job.options, {"total_count": 100})
+
+    def test_enqueue_returns_the_job_a_concurrent_request_queued(self):
+        job = SyncJob.objects.create(user=self.user, options={"total_count": 100})
+
+        # the other request's insert lands between this one's check and its insert
+        with patch("django.db.models.QuerySet.first", return_value=None):
+            again, created = enqueue_sync(self.user, total_count=200)
+
+        self.assertFalse(created)
+        self.assertEqual(again.pk, job.pk)
+        self.assertEqual(SyncJob.objects.filter(user=self.user).count(), 1)
+
+    def test_claim_leases_oldest_due_job_once(self):
+        job, _ = enqueue_sync(self.user)
+        SyncJob.objects.create(
+            user=User.objects.create(email="later@example.com"), run_after=timezone.now() + timedelta(hours=1)
+        )
+
+        claimed = claim_job("worker-1", lease_seconds=60)
+
+        self.assertEqual(claimed.pk, job.pk)
+        self.assertEqual(claimed.status, SyncJob.Status.RUNNING)
+        self.assertEqual(claimed.worker_id, "worker-1")
+        self.assertEqual(claimed.attempts, 1)
+        self.assertIsNone(claim_job("worker-2"))
+
+    def test_heartbeat_extends_only_own_lease(self):
+        enqueue_sync(self.user)
+        job = claim_job("worker-1", lease_seconds=1)
+        before = job.lease_expires_at
+
+        self.assertTrue(heartbeat(job, lease_seconds=60))
+        self.assertGreater(SyncJob.objects.get(pk=job.pk).lease_expires_at, before)
+
+        job.worker_id = "someone-else"
+        self.assertFalse(heartbeat(job))
+
+    # @ TESTS FOR EXPIRED LEASES
+
+    def test_expired_lease_is_requeued_then_failed(self):
+        job, _ = enqueue_sync(self.user, max_attempts=2)
+
+        for expected in (SyncJob.Status.QUEUED, SyncJob.Status.FAILED):
+            SyncJob.objects.filter(pk=job.pk).update(run_after=timezone.now())
+            claim_job("dead-worker")
+            SyncJob.objects.filter(pk=job.pk).update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+
+            self.assertEqual(requeue_expired_jobs(), 1)
+            self.assertEqual(SyncJob.objects.get(pk=job.pk).status, expected)
+
+    # @ TESTS FOR RUN_JOB
+
+    @patch("api.services.job_queue.sync_user_emails")
+    def test_run_job_marks_done_with_result(self, mock_sync):
+        mock_sync.return_value = {"fetched": 2, "errors": 0}
+        enqueue_sync(self.user, total_count=50, incremental=True)
+
+        job = run_job(claim_job("worker-1"))
+
+        self.assertEqual(job.status, SyncJob.Status.DONE)
+        self.assertEqual(job.result, {"fetched": 2, "errors": 0})
+        self.assertEqual(mock_sync.call_args.kwargs["total_count"], 50)
+        self.assertTrue(mock_sync.call_args.kwargs["incremental"])
+
+    @patch("api.services.job_queue.sync_user_emails")
+    def test_run_job_failure_is_retried_later(self, mock_sync):
+        mock_sync.side_effect = RuntimeError("gmail down")
+        enqueue_sync(self.user)
+
+        job = run_job(claim_job("worker-1"))
+
+        self.assertEqual(job.status, SyncJob.Status.QUEUED)
+        self.assertIn("gmail down", job.last_error)
+        self.assertGreater(job.run_after, timezone.now())
+
+    @patch("api.services.job_queue.heartbeat", return_value=False)
+    @patch("api.services.job_queue.sync_user_emails")
+    def test_run_job_stops_the_sync_when_the_lease_is_lost(self, mock_sync, mock_heartbeat):
+        stopped = []
+
+        def sync(user, stop, **options):
+            stopped.append(stop.wait(5))
+            return {"fetched": 1, "errors": 1}
+
+        mock_sync.side_effect = sync
+        enqueue_sync(self.user)
+        job = claim_job("worker-1")
+        # someone else took over after the lease ran out
+        SyncJob.objects.filter(pk=job.pk).update(worker_id="worker-2")
+
+        job = run_job(job, lease_seconds=0.03)
+
+        self.assertEqual(stopped, [True])
+        self.assertEqual((job.status, job.worker_id, job.result), (SyncJob.Status.RUNNING, "worker-2", None))
+
+    @patch("api.services.job_queue.heartbeat", side_effect=OperationalError("database is locked"))
+    @patch("api.services.job_queue.sync_user_emails")
+    def test_run_job_stops_the_sync_when_the_lease_cannot_be_renewed(self, mock_sync, mock_heartbeat):
+        stopped = []
+
+        def sync(user, stop, **options):
+            stopped.append(stop.wait(5))
+            return {"fetched": 1}
+
+        mock_sync.side_effect = sync
+        enqueue_sync(self.user)
+        job = claim_job("worker-1")
+
+        job = run_job(job, lease_seconds=0.03)
+
+        self.assertEqual(stopped, [True])
+        # retried on every tick until the lease ran out
+        self.assertGreater(mock_heartbeat.call_count, 1)
+        self.assertEqual((job.status, job.result), (SyncJob.Status.RUNNING, None))
+
+    @patch("api.services.job_queue.heartbeat", side_effect=[OperationalError("database is locked"), True, True, True])
+    @patch("api.services.job_queue.sync_user_emails")
+    def test_run_job_keeps_going_after_a_failed_renewal(self, mock_sync, mock_heartbeat):
+        stopped = []
+
+        def sync(user, stop, **options):
+            stopped.append(stop.wait(0.05))
+            return {"fetched": 1}
+
+        mock_sync.side_effect = sync
+        enqueue_sync(self.user)
+        job = claim_job("worker-1")
+
+        job = run_job(job, lease_seconds=0.06)
+
+        self.assertEqual(stopped, [False])
+        self.assertEqual((job.status, job.result), (SyncJob.Status.DONE, {"fetched": 1}))
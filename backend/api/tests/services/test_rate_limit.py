@@ -0,0 +1,92 @@
+from unittest import TestCase
+
+from api.services.rate_limit import AIMDController, TokenBucket, backoff_delay
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TokenBucketTest(TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.bucket = TokenBucket(250, clock=self.clock, sleep=self.clock.sleep)
+
+    def test_full_bucket_does_not_wait(self):
+        self.bucket.acquire(250)
+
+        self.assertEqual(self.clock.sleeps, [])
+
+    def test_empty_bucket_waits_for_refill(self):
+        self.bucket.acquire(250)
+        self.bucket.acquire(125)
+
+        self.assertEqual(self.clock.sleeps, [0.5])
+
+    def test_oversized_request_waits_for_full_bucket_then_goes_into_debt(self):
+        self.bucket.acquire(100)
+        self.bucket.acquire(500)
+        self.bucket.acquire(250)
+
+        self.assertAlmostEqual(sum(self.clock.sleeps), 0.4 + 2.0)
+
+    def test_pause_holds_back_callers(self):
+        self.bucket.pause(3)
+        self.bucket.acquire(1)
+
+        self.assertEqual(self.clock.sleeps, [3])
+
+    def test_reserve_reports_wait_without_sleeping_or_taking_tokens(self):
+        self.bucket.acquire(250)
+
+        self.assertEqual(self.bucket.reserve(125), 0.5)
+        self.clock.now += 0.5
+        self.assertEqual(self.bucket.reserve(125), 0)
+        self.assertEqual(self.clock.sleeps, [])
+
+
+class BackoffDelayTest(TestCase):
+    def test_retry_after_wins(self):
+        self.assertEqual(backoff_delay(5, retry_after=7), 7)
+
+    def test_jitter_stays_within_exponential_cap(self):
+        for attempt in range(8):
+            self.assertLessEqual(backoff_delay(attempt, cap=10), min(10, 2**attempt))
+
+
+class AIMDControllerTest(TestCase):
+    def test_clean_streak_grows_batch_and_workers(self):
+        controller = AIMDController(50, 2, grow_after=3)
+
+        for _ in range(3):
+            controller.record(rate_limited=False)
+
+        self.assertEqual((controller.batch_size, controller.workers), (60, 3))
+
+    def test_rate_limit_halves_and_resets_streak(self):
+        controller = AIMDController(50, 4, grow_after=2)
+
+        controller.record(rate_limited=False)
+        controller.record(rate_limited=True)
+        controller.record(rate_limited=False)
+
+        self.assertEqual((controller.batch_size, controller.workers), (25, 2))
+
+    def test_stays_within_limits(self):
+        controller = AIMDController(95, 8, min_batch_size=5, max_batch_size=100, max_workers=8, grow_after=1)
+
+        controller.record(rate_limited=False)
+        self.assertEqual((controller.batch_size, controller.workers), (100, 8))
+
+        for _ in range(10):
+            controller.record(rate_limited=True)
+        self.assertEqual((controller.batch_size, controller.workers), (5, 1))
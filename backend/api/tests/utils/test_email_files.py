@@ -0,0 +1,57 @@
+import gzip
+import json
+import os
+import tempfile
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from api.utils.email_files import iter_emails_from_file, load_emails_from_file
+
+
+class EmailFilesTest(SimpleTestCase):
+    # @ HELPERS AND SETUP STUFF
+    def setUp(self):
+        self.messages = [{"id": str(i), "snippet": "x" * (i * 7), "labelIds": ["INBOX", "]["]} for i in range(25)]
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def _write(self, name, text, compress=False):
+        path = os.path.join(self.tmpdir.name, name)
+        opener = gzip.open if compress else open
+        with opener(path, "wt", encoding="utf-8") as f:
+            f.write(text)
+        return path
+
+    # @ TESTS FOR ITER_EMAILS_FROM_FILE
+
+    @patch("api.utils.email_files.READ_SIZE", 16)
+    def test_json_array_across_read_boundaries(self):
+        path = self._write("export.json", json.dumps(self.messages, indent=4))
+
+        self.assertEqual(list(iter_emails_from_file(path)), self.messages)
+
+    def test_jsonl_and_gzip_detected_from_content(self):
+        jsonl = "\n".join(json.dumps(message) for message in self.messages) + "\n\n"
+        path = self._write("export.data", jsonl, compress=True)
+
+        self.assertEqual(list(iter_emails_from_file(path)), self.messages)
+
+    def test_empty_array_and_empty_file(self):
+        self.assertEqual(list(iter_emails_from_file(self._write("a.json", " [ ] "))), [])
+        self.assertEqual(list(iter_emails_from_file(self._write("b.json", ""))), [])
+
+    def test_malformed_files_raise_value_error(self):
+        for text in ('[{"id": "1"}', '[{"id": "1"} {"id": "2"}]', '[{"id": "1"},]', "[1, 2]", '[{"id": '):
+            with self.subTest(text=text), self.assertRaises(ValueError):
+                list(iter_emails_from_file(self._write("bad.json", text)))
+
+    # @ TESTS FOR LOAD_EMAILS_FROM_FILE
+
+    def test_chunks_are_bounded(self):
+        path = self._write("export.json", json.dumps(self.messages))
+
+        chunks = list(load_emails_from_file(path, chunk_size=10))
+
+        self.assertEqual([len(chunk) for chunk in chunks], [10, 10, 5])
+        self.assertEqual([message for chunk in chunks for message in chunk], self.messages)
@@ -0,0 +1,59 @@
+import pickle
+
+from django.test import SimpleTestCase
+
+from api.utils.gmail_message import DEFAULT_LABEL_IDS, GmailMessage
+
+
+class GmailMessageTest(SimpleTestCase):
+    # @ TESTS FOR FROM_RESPONSE
+
+    def test_keeps_only_parsed_fields(self):
+        response = {
+            "id": "1",
+            "threadId": "t1",
+            "historyId": "99",
+            "snippet": "Thanks for applying...",
+            "labelIds": ["INBOX", "CATEGORY_UPDATES"],
+            "sizeEstimate": 4321,
+            "internalDate": "1769916783000",
+            "payload": {
+                "partId": "",
+                "mimeType": "text/html",
+                "headers": [
+                    {"name": "Received", "value": "by mx.google.com"},
+                    {"name": "Subject", "value": "Old"},
+                    {"name": "Subject", "value": "Your application"},
+                    {"name": "From", "value": "Acme <jobs@acme.com>"},
+                    {"name": "Date", "value": "Sun, 01 Feb 2026 03:33:03 +0000"},
+                ],
+            },
+        }
+
+        message = GmailMessage.from_response(response)
+
+        self.assertEqual(
+            message,
+            GmailMessage(
+                id="1",
+                subject="Your application",
+                sender="Acme <jobs@acme.com>",
+                date="Sun, 01 Feb 2026 03:33:03 +0000",
+                content_type="",
+                internal_date="1769916783000",
+                size_estimate=4321,
+                label_ids=("INBOX", "CATEGORY_UPDATES"),
+            ),
+        )
+
+    def test_defaults_for_missing_fields(self):
+        message = GmailMessage.from_response({"id": "1"})
+
+        self.assertEqual((message.subject, message.sender, message.date), ("", "", None))
+        self.assertEqual(message.size_estimate, -1)
+        self.assertEqual(message.label_ids, DEFAULT_LABEL_IDS)
+
+    def test_pickles_for_the_parse_pool(self):
+        message = GmailMessage.from_response({"id": "1", "labelIds": []})
+
+        self.assertEqual(pickle.loads(pickle.dumps(message)), message)
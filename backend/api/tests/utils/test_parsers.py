@@ -0,0 +1,202 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import UTC, datetime
+from email.utils import parseaddr, parsedate_to_datetime
+from unittest.mock import patch
+
+from django.test import SimpleTestCase, override_settings
+
+from api.utils.gmail_message import GmailMessage
+from api.utils.parsers import (
+    PARSED_FIELDS,
+    parse_date,
+    parse_email_batches,
+    parse_email_rows,
+    parse_email_rows_parallel,
+    parse_emails,
+    parse_sender,
+    shutdown_parse_pool,
+)
+
+SENDERS = [
+    '"Chess.com" <hello@chess.com>',
+    "LinkedIn <jobs-noreply@linkedin.com>",
+    "Name  Two <a@b.com>",
+    "John Q. Public <jq@x.org>",
+    "Zoë Ünï <z@x.de>",
+    '"Doe, John" <j@x.com>',
+    "Doe, John <j@x.com>",
+    '"a\\"b" <x@y.z>',
+    "x@y.z (Comment)",
+    "<a@b.com>",
+    "a@b.com",
+    "Name <a@b.com>, Other <c@d.com>",
+    "",
+]
+
+DATES = [
+    "Sun, 01 Feb 2026 03:33:03 +0000 (UTC)",
+    "1 Feb 2026 3:33:03 -0500",
+    "Mon, 2 Mar 2026 10:00 +0530",
+    "Sun, 01 Feb 2026 03:33:03 -0000",
+    "Sun, 01 Feb 2026 03:33:03 GMT",
+    "Sun, 01 feb 2026 03:33:03 +1245",
+]
+
+
+class ParsersTest(SimpleTestCase):
+    # @ TESTS FOR PARSE_SENDER AND PARSE_DATE
+
+    def test_sender_matches_parseaddr(self):
+        for raw in SENDERS:
+            with self.subTest(raw=raw):
+                self.assertEqual(parse_sender(raw), parseaddr(raw))
+
+    def test_sender_is_memoized(self):
+        parse_sender.cache_clear()
+        parse_sender("LinkedIn <jobs-noreply@linkedin.com>")
+        parse_sender("LinkedIn <jobs-noreply@linkedin.com>")
+
+        self.assertEqual(parse_sender.cache_info().hits, 1)
+
+    def test_date_matches_parsedate_to_datetime(self):
+        for raw in DATES:
+            with self.subTest(raw=raw):
+                expected = parsedate_to_datetime(raw)
+                if expected.tzinfo is None:
+                    expected = expected.replace(tzinfo=UTC)
+                parsed = parse_date(raw)
+                self.assertEqual(parsed, expected)
+                self.assertEqual(parsed.utcoffset(), expected.utcoffset())
+
+    def test_unparseable_date_raises(self):
+        with self.assertRaises(ValueError):
+            parse_date("not a date")
+
+    # @ TESTS FOR PARSE_EMAILS
+
+    def test_missing_or_bad_date_falls_back_to_internal_date(self):
+        emails = [
+            {"id": "1", "internalDate": "1769916783000", "payload": {"headers": []}},
+            {"id": "2", "internalDate": "1769916783000", "payload": {"headers": [{"name": "Date", "value": "?"}]}},
+        ]
+
+        parsed = parse_emails(emails)
+
+        for email in parsed:
+            self.assertEqual(email["received_at"], datetime(2026, 2, 1, 3, 33, 3, tzinfo=UTC))
+
+    def test_only_stored_headers_are_kept(self):
+        email = {
+            "id": "1",
+            "payload": {
+                "headers": [
+                    {"name": "Received", "value": "by mx.google.com"},
+                    {"name": "From", "value": "Old <old@example.com>"},
+                    {"name": "From", "value": "New <new@example.com>"},
+                    {"name": "Date", "value": "Sun, 01 Feb 2026 03:33:03 +0000"},
+                    {"name": "Subject", "value": "Offer"},
+                ]
+            },
+        }
+
+        parsed = parse_emails([email])[0]
+
+        self.assertEqual((parsed["sender_name"], parsed["sender_email"]), ("New", "new@example.com"))
+        self.assertEqual(parsed["subject"], "Offer")
+        self.assertEqual(parsed["content_type"], "")
+
+    def test_records_parse_like_response_dicts(self):
+        emails = [
+            {
+                "id": str(i),
+                "threadId": "t",
+                "labelIds": ["INBOX", "UNREAD"] if i % 2 else None,
+                "sizeEstimate": 100 + i,
+                "internalDate": "1769916783000",
+                "payload": {
+                    "mimeType": "text/html",
+                    "headers": [
+                        {"name": "From", "value": SENDERS[i]},
+                        {"name": "Date", "value": DATES[i % len(DATES)]},
+                        {"name": "Subject", "value": f"Subject {i}"},
+                        {"name": "Received", "value": "by mx.google.com"},
+                    ],
+                },
+            }
+            for i in range(len(SENDERS))
+        ]
+        emails[0] = {"id": "bare", "internalDate": "1769916783000"}
+        records = [GmailMessage.from_response(email) for email in emails]
+
+        self.assertEqual(parse_emails(records), parse_emails(emails))
+
+    # @ TESTS FOR PARALLEL PARSING
+
+    def _messages(self, count):
+        return [
+            {
+                "id": str(i),
+                "internalDate": str(1769916783000 + i * 1000),
+                "payload": {"headers": [{"name": "From", "value": SENDERS[i % len(SENDERS)]}]},
+            }
+            for i in range(count)
+        ]
+
+    def test_parallel_rows_keep_order(self):
+        self.addCleanup(shutdown_parse_pool)
+        messages = self._messages(50)
+
+        rows = parse_email_rows_parallel(messages, workers=2, chunk_size=7)
+
+        self.assertEqual(rows, parse_email_rows(messages))
+        self.assertEqual(len(rows[0]), len(PARSED_FIELDS))
+
+    @override_settings(EMAIL_PARSE_WORKERS=4)
+    @patch("api.utils.parsers.PARALLEL_PARSE_THRESHOLD", 10)
+    @patch("api.utils.parsers.parse_email_rows_parallel", side_effect=lambda emails, workers: parse_email_rows(emails))
+    def test_pool_used_above_threshold(self, mock_parallel):
+        parse_emails(self._messages(9))
+        parse_emails(self._messages(9), workers=1)
+        self.assertFalse(mock_parallel.called)
+
+        parsed = parse_emails(self._messages(10))
+
+        mock_parallel.assert_called_once()
+        self.assertEqual(mock_parallel.call_args.args[1], 4)
+        self.assertEqual([email["gmail_id"] for email in parsed], [str(i) for i in range(10)])
+        self.assertEqual(parsed[0], parse_emails(self._messages(1))[0])
+
+    @patch("api.utils.parsers.PARALLEL_PARSE_THRESHOLD", 10)
+    @patch("api.utils.parsers.PARSE_CHUNK_SIZE", 4)
+    @patch("api.utils.parsers._get_parse_pool")
+    def test_batches_go_to_the_pool_once_past_the_threshold_in_order(self, mock_pool):
+        pool = ThreadPoolExecutor(2)
+        self.addCleanup(pool.shutdown)
+        mock_pool.return_value = pool
+        messages = self._messages(30)
+        batches = [messages[:7], messages[7:8], [], messages[8:30]]
+
+        parsed = parse_email_batches(iter(batches), workers=2)
+        first = [next(parsed), next(parsed), next(parsed)]
+        # 8 messages streamed, still under the threshold
+        self.assertFalse(mock_pool.called)
+        parsed = first + list(parsed)
+
+        mock_pool.assert_called_once_with(2)
+        self.assertEqual(parsed, [parse_emails(batch, workers=1) for batch in batches])
+
+    @patch("api.utils.parsers._get_parse_pool")
+    def test_small_streams_parse_in_process(self, mock_pool):
+        messages = self._messages(3)
+
+        self.assertEqual(list(parse_email_batches([messages], workers=4)), [parse_emails(messages)])
+        self.assertFalse(mock_pool.called)
+
+    @override_settings(EMAIL_PARSE_WORKERS=1)
+    @patch("api.utils.parsers.PARALLEL_PARSE_THRESHOLD", 1)
+    @patch("api.utils.parsers._get_parse_pool")
+    def test_batches_parse_in_process_with_one_worker(self, mock_pool):
+        messages = self._messages(3)
+
+        self.assertEqual(list(parse_email_batches([messages])), [parse_emails(messages)])
+        self.assertFalse(mock_pool.called)
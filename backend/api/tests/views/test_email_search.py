@@ -0,0 +1,53 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from api.models import User
+from api.services.gmail_sync import populate_email_database
+from api.services.label_cache import clear_label_cache
+from api.services.sender_cache import clear_sender_cache
+from api.tests.helpers import parsed_email
+
+
+class EmailSearchViewTest(TestCase):
+    # @ HELPERS AND SETUP STUFF
+    def setUp(self):
+        # user ids come back after each test's rollback, so cached reads of the last test would too
+        cache.clear()
+        self.user = User.objects.create(email="test@example.com")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse("job-email-search")
+        clear_label_cache()
+        clear_sender_cache()
+
+        populate_email_database(
+            self.user,
+            [
+                parsed_email(str(i), subject)
+                for i, subject in enumerate(["Interview invitation", "Interview reminder", "Newsletter"])
+            ],
+        )
+
+    # @ TESTS FOR EMAIL SEARCH
+
+    def test_requires_authentication(self):
+        self.assertEqual(APIClient().get(f"{self.url}?q=interview").status_code, 403)
+
+    def test_returns_serialized_matches(self):
+        response = self.client.get(f"{self.url}?q=invitation")
+
+        self.assertEqual(response.status_code, 200)
+        [email] = response.data["results"]
+        self.assertEqual(email["gmail_id"], "0")
+        self.assertEqual(email["company"], "acme.com")
+        self.assertEqual(email["labels"], ["INBOX"])
+
+    def test_page_size_caps_results(self):
+        response = self.client.get(f"{self.url}?q=interview&page_size=1")
+
+        self.assertEqual(len(response.data["results"]), 1)
+
+    def test_missing_query_is_bad_request(self):
+        self.assertEqual(self.client.get(self.url).status_code, 400)
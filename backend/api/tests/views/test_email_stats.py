@@ -0,0 +1,49 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from api.models import EmailStat, User
+
+
+class EmailStatsViewTest(TestCase):
+    # @ HELPERS AND SETUP STUFF
+    def setUp(self):
+        # user ids come back after each test's rollback, so cached reads of the last test would too
+        cache.clear()
+        self.user = User.objects.create(email="test@example.com")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        Dimension = EmailStat.Dimension
+        for dimension, key, count in [
+            (Dimension.TOTAL, "", 5),
+            (Dimension.LABEL, "INBOX", 4),
+            (Dimension.COMPANY, "acme.com", 2),
+            (Dimension.WEEK, "2026-02-02", 5),
+        ]:
+            EmailStat.objects.create(user=self.user, dimension=dimension, key=key, count=count)
+
+    # @ TESTS FOR EMAIL STATS
+
+    def test_requires_authentication(self):
+        self.assertEqual(APIClient().get(reverse("email-stats")).status_code, 403)
+
+    def test_all_stats_in_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("email-stats"))
+
+        self.assertEqual(
+            response.data,
+            {"total": 5, "label": {"INBOX": 4}, "company": {"acme.com": 2}, "week": {"2026-02-02": 5}},
+        )
+
+    def test_single_dimension(self):
+        response = self.client.get(reverse("email-stats-dimension", args=["company"]))
+
+        self.assertEqual(response.data, {"acme.com": 2})
+
+    def test_unknown_dimension_is_404(self):
+        response = self.client.get(reverse("email-stats-dimension", args=["nope"]))
+
+        self.assertEqual(response.status_code, 404)
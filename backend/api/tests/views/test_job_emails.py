@@ -0,0 +1,101 @@
+from datetime import UTC, datetime, timedelta
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from api.models import Company, JobEmail, Label, Sender, User
+
+
+class JobEmailListViewTest(TestCase):
+    # @ HELPERS AND SETUP STUFF
+    def setUp(self):
+        # user ids come back after each test's rollback, so cached reads of the last test would too
+        cache.clear()
+        self.user = User.objects.create(email="test@example.com")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse("job-email-list")
+
+        self.inbox = Label.objects.create(name="INBOX")
+        self.starred = Label.objects.create(name="STARRED")
+        acme = Company.objects.create(domain="acme.com")
+        self.acme = Sender.objects.create(email="jobs@acme.com", company=acme)
+        self.other = Sender.objects.create(email="news@other.org")
+
+        # pairs of emails share a received_at so pages have to break ties on id
+        start = datetime(2026, 2, 1, tzinfo=UTC)
+        for i in range(12):
+            self._email(str(i), start - timedelta(hours=i // 2), self.acme if i % 3 == 0 else self.other)
+
+    def _email(self, gmail_id, received_at, sender, user=None):
+        email = JobEmail.objects.create(
+            user=user or self.user,
+            gmail_id=gmail_id,
+            subject=f"Subject {gmail_id}",
+            sender=sender,
+            company=sender.company,
+            received_at=received_at,
+            content_type="text/html",
+            size_estimate=1,
+            importance=1,
+        )
+        email.labels.add(self.inbox, *([self.starred] if int(gmail_id) % 2 else []))
+        return email
+
+    def _walk(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids += [email["gmail_id"] for email in response.data["results"]]
+            url = response.data["next"]
+        return ids
+
+    # @ TESTS FOR PAGINATION
+
+    def test_requires_authentication(self):
+        self.assertEqual(APIClient().get(self.url).status_code, 403)
+
+    def test_pages_walk_every_email_newest_first_once(self):
+        expected = list(
+            JobEmail.objects.filter(user=self.user).order_by("-received_at", "-id").values_list("gmail_id", flat=True)
+        )
+
+        ids = self._walk(f"{self.url}?page_size=5")
+
+        self.assertEqual(ids, expected)
+
+    def test_only_own_emails(self):
+        stranger = User.objects.create(email="stranger@example.com")
+        self._email("99", datetime(2026, 3, 1, tzinfo=UTC), self.acme, user=stranger)
+
+        self.assertNotIn("99", self._walk(self.url))
+
+    def test_page_queries_do_not_grow_with_page_size(self):
+        # emails joined with sender and company, then one prefetch for all labels
+        with self.assertNumQueries(2):
+            response = self.client.get(f"{self.url}?page_size=10")
+
+        # ids are random uuids, so "0" isn't always first of the pair sharing its received_at
+        email = next(email for email in response.data["results"] if email["gmail_id"] == "0")
+        self.assertEqual(email["sender_email"], "jobs@acme.com")
+        self.assertEqual(email["company"], "acme.com")
+        self.assertEqual(email["labels"], ["INBOX"])
+
+    def test_invalid_cursor_is_not_found(self):
+        self.assertEqual(self.client.get(f"{self.url}?cursor=bm9wZQ").status_code, 404)
+
+    # @ TESTS FOR FILTERS
+
+    def test_filters(self):
+        cases = {
+            "sender=jobs@acme.com": {"0", "3", "6", "9"},
+            "company=ACME.com": {"0", "3", "6", "9"},
+            "label=STARRED": {"1", "3", "5", "7", "9", "11"},
+            "label=STARRED&company=acme.com": {"3", "9"},
+        }
+        for query, expected in cases.items():
+            with self.subTest(query=query):
+                self.assertEqual(set(self._walk(f"{self.url}?{query}&page_size=2")), expected)
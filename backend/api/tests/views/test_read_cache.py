@@ -0,0 +1,94 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from api.models import JobEmail, User
+from api.services.email_stats import remove_emails
+from api.services.gmail_sync import populate_email_database, wipe_emails_for_user
+from api.services.label_cache import clear_label_cache
+from api.services.sender_cache import clear_sender_cache
+from api.tests.helpers import parsed_email
+
+
+class VersionedReadCacheTest(TestCase):
+    # @ HELPERS AND SETUP STUFF
+    def setUp(self):
+        cache.clear()
+        clear_label_cache()
+        clear_sender_cache()
+        self.user = User.objects.create(email="test@example.com")
+        self.client = APIClient()
+        self.url = reverse("job-email-list")
+
+        populate_email_database(self.user, [parsed_email("1", "Interview")])
+        self._login()
+
+    def _login(self):
+        # what session auth does on every request: load the user row, data version included
+        self.user.refresh_from_db()
+        self.client.force_authenticate(self.user)
+
+    def _gmail_ids(self, response):
+        return [email["gmail_id"] for email in response.data["results"]]
+
+    # @ TESTS FOR CACHED READS
+
+    def test_repeat_read_is_served_from_cache(self):
+        first = self.client.get(self.url)
+
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second["ETag"], first["ETag"])
+        self.assertIn("private", second["Cache-Control"])
+
+    def test_matching_etag_is_not_modified(self):
+        etag = self.client.get(self.url)["ETag"]
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_different_urls_are_cached_apart(self):
+        populate_email_database(self.user, [parsed_email("2", "Interview")])
+        self._login()
+
+        self.assertEqual(len(self._gmail_ids(self.client.get(f"{self.url}?page_size=1"))), 1)
+        self.assertEqual(len(self._gmail_ids(self.client.get(self.url))), 2)
+
+    def test_ingest_invalidates(self):
+        before = self.client.get(self.url)
+
+        populate_email_database(self.user, [parsed_email("2", "Interview")])
+        self._login()
+        after = self.client.get(self.url, HTTP_IF_NONE_MATCH=before["ETag"])
+
+        self.assertEqual(after.status_code, 200)
+        self.assertNotEqual(after["ETag"], before["ETag"])
+        self.assertEqual(sorted(self._gmail_ids(after)), ["1", "2"])
+
+    def test_deletes_and_wipe_invalidate(self):
+        stats_url = reverse("email-stats-dimension", args=["total"])
+        self.assertEqual(self.client.get(stats_url).data, 1)
+
+        populate_email_database(self.user, [parsed_email("2", "Interview")])
+        remove_emails(self.user, JobEmail.objects.filter(gmail_id="1"))
+        self._login()
+        self.assertEqual(self._gmail_ids(self.client.get(self.url)), ["2"])
+
+        wipe_emails_for_user(self.user)
+        self._login()
+        self.assertEqual(self._gmail_ids(self.client.get(self.url)), [])
+        self.assertEqual(self.client.get(stats_url).data, 0)
+
+    def test_other_users_data_does_not_invalidate(self):
+        etag = self.client.get(self.url)["ETag"]
+
+        populate_email_database(User.objects.create(email="other@example.com"), [parsed_email("9", "Interview")])
+        self._login()
+
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
@@ -0,0 +1,10 @@
+from django.urls import path
+
+from .views import EmailSearchView, EmailStatsView, JobEmailListView
+
+urlpatterns = [
+    path("emails/", JobEmailListView.as_view(), name="job-email-list"),
+    path("emails/search/", EmailSearchView.as_view(), name="job-email-search"),
+    path("stats/", EmailStatsView.as_view(), name="email-stats"),
+    path("stats/<str:dimension>/", EmailStatsView.as_view(), name="email-stats-dimension"),
+]
@@ -0,0 +1,104 @@
+import gzip
+import json
+from collections.abc import Iterator
+from itertools import batched
+
+GZIP_MAGIC = b"\x1f\x8b"
+READ_SIZE = 64 * 1024
+
+_decoder = json.JSONDecoder()
+
+
+def iter_emails_from_file(file_path: str) -> Iterator[dict]:
+    """
+    Yield raw Gmail messages from an export one at a time.
+
+    Reads a JSON array of messages or JSONL (one message per line), either of them optionally
+    gzipped, detected from the content rather than the file name. Only the current message
+    and one read buffer are held in memory, so multi-GB exports import in flat memory.
+
+    Args:
+        file_path: Path to the export
+
+    Raises:
+        ValueError: If the file is not a JSON array or JSONL of message objects
+    """
+    with _open_text(file_path) as f:
+        first = _skip_whitespace(f)
+        if first == "[":
+            yield from _iter_json_array(f)
+        elif first:
+            yield from _iter_jsonl(f, first)
+
+
+def load_emails_from_file(file_path: str, chunk_size: int = 1000) -> Iterator[list[dict]]:
+    """Messages from an export in lists of at most `chunk_size`, ready for ingest_email_batches."""
+    for chunk in batched(iter_emails_from_file(file_path), chunk_size, strict=False):
+        yield list(chunk)
+
+
+def _open_text(file_path: str):
+    with open(file_path, "rb") as f:
+        compressed = f.read(2) == GZIP_MAGIC
+    if compressed:
+        return gzip.open(file_path, "rt", encoding="utf-8")
+    return open(file_path, encoding="utf-8")
+
+
+def _skip_whitespace(f) -> str:
+    while char := f.read(1):
+        if not char.isspace():
+            return char
+    return ""
+
+
+def _iter_json_array(f) -> Iterator[dict]:
+    buffer, pos, eof = "", 0, False
+    count, expect_item = 0, True
+
+    while True:
+        while pos < len(buffer) and buffer[pos].isspace():
+            pos += 1
+
+        if pos == len(buffer):
+            if eof:
+                raise ValueError("Unexpected end of file, the JSON array is not closed")
+            buffer, pos = f.read(READ_SIZE), 0
+            eof = not buffer
+            continue
+
+        char = buffer[pos]
+        if char == "]" and (not expect_item or count == 0):
+            return
+        if not expect_item:
+            if char != ",":
+                raise ValueError(f"Expected ',' or ']' after message {count}, got {char!r}")
+            expect_item, pos = True, pos + 1
+            continue
+
+        try:
+            item, pos = _decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            # the message runs past the buffer, keep its start, read more and decode it again
+            chunk = "" if eof else f.read(READ_SIZE)
+            if not chunk:
+                raise
+            buffer, pos = buffer[pos:] + chunk, 0
+            continue
+
+        count, expect_item = count + 1, False
+        yield _check_message(item)
+
+
+def _iter_jsonl(f, first: str) -> Iterator[dict]:
+    lines = iter(f)
+    yield _check_message(json.loads(first + next(lines, "")))
+    for line in lines:
+        if line.strip():
+            yield _check_message(json.loads(line))
+
+
+def _check_message(item) -> dict:
+    if not isinstance(item, dict):
+        raise ValueError(f"Expected a message object, got {type(item).__name__}")
+    return item
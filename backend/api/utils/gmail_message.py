@@ -0,0 +1,47 @@
+from typing import NamedTuple
+
+DEFAULT_LABEL_IDS = ("INBOX",)
+
+_HEADERS = frozenset(("Subject", "From", "Date", "Content-Type"))
+
+
+class GmailMessage(NamedTuple):
+    """
+    The parts of a Gmail messages.get response that parse_emails reads, and nothing else.
+
+    A metadata response is a few dozen dicts and lists (payload, header list, one dict per
+    header, ...) even though only four header values and three fields are ever stored. A
+    fetched page is held until it is parsed, so it is cut down to one of these as soon as
+    it arrives. Being a tuple it also pickles small for the parse pool.
+    """
+
+    id: str
+    subject: str
+    sender: str
+    date: str | None
+    content_type: str
+    internal_date: str | None
+    size_estimate: int
+    label_ids: tuple[str, ...]
+
+    @classmethod
+    def from_response(cls, response: dict) -> "GmailMessage":
+        """Cut a raw messages.get response down to the fields parse_emails reads."""
+        # messages carry dozens of headers, only keep the few we store (last one wins, like a dict)
+        headers = {
+            header["name"]: header["value"]
+            for header in response.get("payload", {}).get("headers", [])
+            if header["name"] in _HEADERS
+        }
+
+        label_ids = response.get("labelIds")
+        return cls(
+            response.get("id"),
+            headers.get("Subject", ""),
+            headers.get("From", ""),
+            headers.get("Date"),
+            headers.get("Content-Type", ""),
+            response.get("internalDate"),
+            response.get("sizeEstimate", -1),
+            tuple(label_ids) if label_ids is not None else DEFAULT_LABEL_IDS,
+        )
@@ -1,34 +1,254 @@
+import logging
+import multiprocessing
+import re
+import threading
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from datetime import (
+    UTC,
+    datetime,
+    timedelta,
+    timezone as dt_timezone,
+)
 from email.utils import parseaddr, parsedate_to_datetime
+from functools import lru_cache
 
+import django
+from django.conf import settings
 from django.utils import timezone
 
+from api.utils.gmail_message import GmailMessage
 
-def parse_emails(emails):
-    parsed_emails = []
+logger = logging.getLogger(__name__)
+
+SENDER_CACHE_SIZE = 4096
+
+# below this many messages (in one list, or streamed so far by parse_email_batches)
+# starting work on other processes costs more than it saves
+PARALLEL_PARSE_THRESHOLD = 10_000
+PARSE_CHUNK_SIZE = 2_000
+
+# order of the values in a parse_email_rows tuple
+PARSED_FIELDS = (
+    "gmail_id",
+    "subject",
+    "sender_email",
+    "sender_name",
+    "received_at",
+    "content_type",
+    "size_estimate",
+    "importance",
+    "labels",
+)
+
+_parse_pool = None
+_parse_pool_workers = 0
+_parse_pool_lock = threading.Lock()
+
+# "Sun, 01 Feb 2026 03:33:03 +0000 (UTC)", the shape nearly every Gmail Date header has
+_DATE_RE = re.compile(
+    r"\s*(?:[A-Za-z]{3},\s*)?(\d{1,2})\s+([A-Za-z]{3})\s+(\d{4})\s+(\d{1,2}):(\d{2})(?::(\d{2}))?\s+([+-])(\d{2})(\d{2})"
+)
+_MONTHS = {
+    month: number
+    for number, month in enumerate(
+        ("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"), start=1
+    )
+}
+
+# "Name <addr>", '"Name" <addr>' or a bare addr, without comments, escapes or groups
+_SENDER_RE = re.compile(r'\s*(?:"([^"\\]*)"|([^"<>()\\,;:@\[\]]*?))\s*<([^<>()\s"\\,;:@]+@[^<>()\s"\\,;:@]+)>\s*')
+_ADDRESS_RE = re.compile(r'\s*([^<>()\s"\\,;:@]+@[^<>()\s"\\,;:@]+)\s*')
+
+
+def parse_emails(emails, workers: int | None = None):
+    """
+    Parse raw Gmail messages into JobEmail field dicts, in the same order.
+
+    Takes messages.get response dicts or the GmailMessage records the fetcher builds from them.
+
+    Lists of at least PARALLEL_PARSE_THRESHOLD messages are parsed on a process pool of
+    `workers` (settings.EMAIL_PARSE_WORKERS by default, 1 keeps it in this process). A
+    stream of smaller lists goes through parse_email_batches instead.
+    """
+    workers = settings.EMAIL_PARSE_WORKERS if workers is None else workers
+    if workers > 1 and len(emails) >= PARALLEL_PARSE_THRESHOLD:
+        rows = parse_email_rows_parallel(emails, workers)
+    else:
+        rows = parse_email_rows(emails)
+
+    return _rows_to_dicts(rows)
+
+
+def parse_email_batches(batches: Iterable[list], workers: int | None = None) -> Iterator[list[dict]]:
+    """
+    parse_emails over a stream of message lists, yielding each one parsed, in order.
+
+    Lists are parsed in this process until PARALLEL_PARSE_THRESHOLD messages have streamed
+    through, so small syncs never start the pool. Past that, with more than one worker
+    (settings.EMAIL_PARSE_WORKERS by default), every list goes to the process pool in
+    PARSE_CHUNK_SIZE pieces as soon as it arrives, and up to `workers` lists are parsed
+    while the caller stores the ones before.
+    """
+    workers = settings.EMAIL_PARSE_WORKERS if workers is None else workers
+    pool = None
+    streamed = 0
+    # one list of futures per submitted message list
+    pending = deque()
+    try:
+        for emails in batches:
+            streamed += len(emails)
+            if pool is None:
+                if workers <= 1 or streamed < PARALLEL_PARSE_THRESHOLD:
+                    yield parse_emails(emails, workers=1)
+                    continue
+                pool = _get_parse_pool(workers)
+
+            chunks = [emails[start : start + PARSE_CHUNK_SIZE] for start in range(0, len(emails), PARSE_CHUNK_SIZE)]
+            pending.append([pool.submit(parse_email_rows, chunk) for chunk in chunks])
+            # hand back whatever is parsed, and wait once the pool has all it can work on
+            while pending and (all(future.done() for future in pending[0]) or len(pending) > workers):
+                yield _parsed(pending.popleft())
+        while pending:
+            yield _parsed(pending.popleft())
+    finally:
+        # the caller stopped early, don't leave queued pages to parse for nobody
+        for futures in pending:
+            for future in futures:
+                future.cancel()
+
+
+def parse_email_rows(emails) -> list[tuple]:
+    """Parse raw Gmail messages, response dicts or GmailMessage records, into tuples of PARSED_FIELDS values."""
+    rows = []
 
     for email in emails:
-        headers = email.get("payload", {}).get("headers", [])
-        headers = {header["name"]: header["value"] for header in headers}  # should be O(6) always
-
-        raw_from = headers.get("From", "")
-        sender_name, sender_email = parseaddr(raw_from)
-
-        received_at = parsedate_to_datetime(headers.get("Date", ""))
-        if timezone.is_naive(received_at):
-            received_at = timezone.make_aware(received_at)
-
-        parsed_email = {
-            "gmail_id": email.get("id"),
-            "subject": headers.get("Subject", ""),
-            "sender_email": sender_email,
-            "sender_name": sender_name,
-            "received_at": received_at,
-            "content_type": headers.get("Content-Type", ""),
-            "size_estimate": email.get("sizeEstimate", -1),
-            "importance": 1,  # Default importance
-            "labels": email.get("labelIds", ["INBOX"]),
-        }
-
-        parsed_emails.append(parsed_email)
-
-    return parsed_emails
+        if not isinstance(email, GmailMessage):
+            email = GmailMessage.from_response(email)
+
+        sender_name, sender_email = parse_sender(email.sender)
+
+        rows.append(
+            (
+                email.id,
+                email.subject,
+                sender_email,
+                sender_name,
+                _received_at(email.date, email.internal_date),
+                email.content_type,
+                email.size_estimate,
+                1,  # Default importance
+                list(email.label_ids),
+            )
+        )
+
+    return rows
+
+
+def parse_email_rows_parallel(emails, workers: int, chunk_size: int = PARSE_CHUNK_SIZE) -> list[tuple]:
+    """
+    parse_email_rows on a process pool, chunk by chunk, keeping the input order.
+
+    Rows come back as tuples rather than dicts, so there are no repeated keys to pickle.
+    """
+    chunks = [emails[start : start + chunk_size] for start in range(0, len(emails), chunk_size)]
+    rows = []
+    for chunk_rows in _get_parse_pool(workers).map(parse_email_rows, chunks):
+        rows.extend(chunk_rows)
+    return rows
+
+
+def shutdown_parse_pool():
+    """Stop the parse worker processes, they are started again on the next big parse."""
+    global _parse_pool, _parse_pool_workers
+    with _parse_pool_lock:
+        if _parse_pool is not None:
+            _parse_pool.shutdown()
+        _parse_pool, _parse_pool_workers = None, 0
+
+
+@lru_cache(maxsize=SENDER_CACHE_SIZE)
+def parse_sender(raw_from: str) -> tuple[str, str]:
+    """
+    Split a From header into (name, address), like email.utils.parseaddr.
+
+    The few senders a user hears from repeat across thousands of messages, so results are
+    memoized. Headers with comments, escapes or several addresses go to parseaddr.
+    """
+    match = _SENDER_RE.fullmatch(raw_from)
+    if match:
+        quoted, plain, address = match.groups()
+        # parseaddr joins the words of an unquoted name with single spaces
+        return (quoted if quoted is not None else " ".join(plain.split())), address
+
+    match = _ADDRESS_RE.fullmatch(raw_from)
+    if match:
+        return "", match.group(1)
+
+    return parseaddr(raw_from)
+
+
+def parse_date(raw_date: str) -> datetime:
+    """
+    Aware datetime from an RFC 2822 Date header, like email.utils.parsedate_to_datetime.
+
+    Numeric offsets take a precompiled fast path, anything else (named zones, -0000,
+    obsolete syntax) goes to the stdlib parser. Raises ValueError if it can't be parsed.
+    """
+    match = _DATE_RE.match(raw_date)
+    if match:
+        day, month, year, hour, minute, second, sign, offset_hours, offset_minutes = match.groups()
+        month_number = _MONTHS.get(month.lower())
+        # -0000 means "no zone information", the stdlib treats it as naive
+        if month_number and not (sign == "-" and offset_hours == offset_minutes == "00"):
+            tz = _offset_tz(sign, offset_hours, offset_minutes)
+            return datetime(int(year), month_number, int(day), int(hour), int(minute), int(second or 0), tzinfo=tz)
+
+    received_at = parsedate_to_datetime(raw_date)
+    if timezone.is_naive(received_at):
+        received_at = timezone.make_aware(received_at)
+    return received_at
+
+
+def _get_parse_pool(workers: int) -> ProcessPoolExecutor:
+    # spawned processes are slow to start, so one pool is kept for the life of the process
+    global _parse_pool, _parse_pool_workers
+    with _parse_pool_lock:
+        if _parse_pool is None or _parse_pool_workers != workers:
+            if _parse_pool is not None:
+                _parse_pool.shutdown()
+            # spawn, not fork: the parent may be running fetch threads and holding DB connections
+            context = multiprocessing.get_context("spawn")
+            _parse_pool = ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=django.setup)
+            _parse_pool_workers = workers
+        return _parse_pool
+
+
+def _parsed(futures: list) -> list[dict]:
+    return _rows_to_dicts([row for future in futures for row in future.result()])
+
+
+def _rows_to_dicts(rows: list[tuple]) -> list[dict]:
+    return [dict(zip(PARSED_FIELDS, row, strict=True)) for row in rows]
+
+
+def _received_at(raw_date: str | None, internal_date: str | None) -> datetime:
+    if raw_date:
+        try:
+            return parse_date(raw_date)
+        except (TypeError, ValueError):
+            pass
+
+    # Gmail's own receive time, in epoch milliseconds
+    if internal_date:
+        return datetime.fromtimestamp(int(internal_date) / 1000, tz=UTC)
+
+    logger.warning(f"No usable Date header ({raw_date!r}), using the current time")
+    return timezone.now()
+
+
+@lru_cache(maxsize=64)
+def _offset_tz(sign: str, hours: str, minutes: str) -> dt_timezone:
+    offset = timedelta(hours=int(hours), minutes=int(minutes))
+    return dt_timezone(-offset if sign == "-" else offset)
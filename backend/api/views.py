@@ -1,3 +1,114 @@
-# from django.shortcuts import render
+from django.db.models import Prefetch
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+from rest_framework import generics, status
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
-# Create your views here.
+from .models import EmailStat, JobEmail, Label
+from .pagination import ReceivedAtKeysetPagination
+from .serializers import JobEmailSerializer
+from .services.email_search import search_emails
+from .services.email_stats import get_email_stats
+from .services.read_cache import cached_read, read_cache_key, read_etag
+
+
+def _versioned_response(request, name: str, compute) -> Response:
+    """
+    Response for a read of the user's emails, cached until their data version changes.
+
+    The ETag is derived from the cache key, so a client revalidating with a current
+    If-None-Match gets its 304 without the data being read at all, cached or not.
+    """
+    key = read_cache_key(request.user, name, request.build_absolute_uri())
+    etag = read_etag(key)
+
+    if etag in parse_etags(request.headers.get("If-None-Match", "")):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = Response(cached_read(key, compute))
+
+    response["ETag"] = etag
+    # browsers may keep it but must check back, which is what the ETag makes cheap
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+class JobEmailListView(generics.ListAPIView):
+    """
+    The signed-in user's emails, newest first, in keyset pages.
+
+    Optional filters: ?sender=<address>, ?company=<domain>, ?label=<name>.
+    Pages are cached and carry an ETag until the next sync changes the user's emails.
+    """
+
+    serializer_class = JobEmailSerializer
+    pagination_class = ReceivedAtKeysetPagination
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        queryset = (
+            JobEmail.objects.filter(user=self.request.user)
+            .select_related("sender", "company")
+            .prefetch_related(Prefetch("labels", queryset=Label.objects.only("id", "name")))
+        )
+
+        params = self.request.query_params
+        if sender := params.get("sender"):
+            queryset = queryset.filter(sender__email=sender)
+        if company := params.get("company"):
+            queryset = queryset.filter(company__domain=company.lower())
+        if label := params.get("label"):
+            queryset = queryset.filter(labels__name=label)
+
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        return _versioned_response(request, "emails", lambda: super(JobEmailListView, self).list(request).data)
+
+
+class EmailStatsView(APIView):
+    """
+    The signed-in user's email counts: total, per label, per company domain and per week.
+
+    Served from the rollup table, so the cost doesn't depend on mailbox size, and cached
+    with an ETag on top of that until the user's emails change.
+    /api/stats/<dimension>/ returns just one of them.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, dimension=None):
+        if dimension is not None and dimension not in EmailStat.Dimension.values:
+            raise NotFound(f"Unknown stats dimension {dimension!r}")
+
+        def read_stats():
+            stats = get_email_stats(request.user, [dimension] if dimension else None)
+            return stats[dimension] if dimension else stats
+
+        return _versioned_response(request, "stats", read_stats)
+
+
+class EmailSearchView(APIView):
+    """
+    The signed-in user's emails matching every word of ?q=, best match first.
+
+    Searches subjects and senders through the full-text index. ?page_size= caps the results
+    like on the list view, there is no next page.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        query = request.query_params.get("q", "")
+        if not query.strip():
+            raise ValidationError({"q": "A search query is required."})
+
+        def read_results():
+            limit = ReceivedAtKeysetPagination().get_page_size(request)
+            emails = search_emails(request.user, query, limit=limit)
+            return {"results": JobEmailSerializer(emails, many=True).data}
+
+        return _versioned_response(request, "search", read_results)
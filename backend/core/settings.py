@@ -88,6 +88,13 @@ WSGI_APPLICATION = "core.wsgi.application"
 DATABASES = {"default": env.db("DATABASE_URL", default=f"sqlite:///{BASE_DIR / 'db.sqlite3'}")}
 
 
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+# locmemcache:// (per process) or filecache:///some/dir (shared by the processes of one host)
+
+CACHES = {"default": env.cache("CACHE_URL", default="locmemcache://")}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -128,4 +135,25 @@ AUTH_USER_MODEL = "api.User"
 
 GMAIL_CREDENTIALS_PATH = env.str("GMAIL_CREDENTIALS_PATH", default="")
 
+# batches of messages.get in flight at once per sync, all paced by the per-user quota
+GMAIL_FETCH_WORKERS = env.int("GMAIL_FETCH_WORKERS", default=4)
+
+# processes parsing the next pages of a sync or import while one is stored, 1 parses in-process
+EMAIL_PARSE_WORKERS = env.int("EMAIL_PARSE_WORKERS", default=min(os.cpu_count() or 1, 4))
+
+# dotted path to a callable returning an httplib2.Http-compatible transport, empty for the default
+GMAIL_HTTP_FACTORY = env.str("GMAIL_HTTP_FACTORY", default="")
+
+# "sync" fetches through googleapiclient batch requests, "async" through the asyncio client (gmail_async)
+GMAIL_CLIENT_BACKEND = env.str("GMAIL_CLIENT_BACKEND", default="sync")
+
+# requests the async client keeps in flight, each on its own keep-alive connection
+GMAIL_ASYNC_CONCURRENCY = env.int("GMAIL_ASYNC_CONCURRENCY", default=16)
+
+# base URL the async client talks to, e.g. a local stub server in tests
+GMAIL_API_URL = env.str("GMAIL_API_URL", default="https://gmail.googleapis.com")
+
+# seconds a cached email list page or stats response is kept, a sync invalidates them sooner
+EMAIL_READ_CACHE_TIMEOUT = env.int("EMAIL_READ_CACHE_TIMEOUT", default=60 * 60)
+
 FERNET_KEYS = [env.str("FERNET_KEY", default="")]
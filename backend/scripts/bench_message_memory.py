@@ -0,0 +1,94 @@
+"""
+Memory benchmark: fetched Gmail messages kept as response dicts vs. GmailMessage records.
+
+A page of fetched messages stays in memory until it is parsed, so this measures what
+holding N of them costs each way. Responses are decoded from JSON shaped like a real
+format=metadata reply, the way the API client hands them to the batch callback.
+Nothing here touches the network or the database.
+
+Usage (from backend/):
+    python scripts/bench_message_memory.py [messages]
+"""
+
+import gc
+import json
+import os
+import random
+import sys
+import tracemalloc
+from pathlib import Path
+
+import django
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+os.environ.setdefault("DJANGO_SECRET_KEY", "bench-only")
+django.setup()
+
+from api.utils.gmail_message import GmailMessage  # noqa: E402
+from api.utils.parsers import parse_emails  # noqa: E402
+
+SENDERS = [
+    '"LinkedIn" <jobs-noreply@linkedin.com>',
+    "Indeed <alert@indeed.com>",
+    "Greenhouse <no-reply@greenhouse.io>",
+] + [f"Person {i} <person{i}@example.com>" for i in range(200)]
+
+
+def make_responses(count):
+    rng = random.Random(0)
+    responses = []
+    for i in range(count):
+        message_id = f"{rng.getrandbits(64):016x}"
+        responses.append(
+            json.dumps(
+                {
+                    "id": message_id,
+                    "threadId": message_id,
+                    "labelIds": ["INBOX", "CATEGORY_UPDATES", "UNREAD"],
+                    "snippet": "Thank you for applying. We have received your application and will " * 2,
+                    "payload": {
+                        "partId": "",
+                        "mimeType": "multipart/alternative",
+                        "filename": "",
+                        "headers": [
+                            {"name": "From", "value": rng.choice(SENDERS)},
+                            {"name": "Date", "value": f"Sun, {rng.randint(1, 28):02d} Feb 2026 03:33:03 +0000"},
+                            {"name": "Subject", "value": f"Your application to position {i}"},
+                        ],
+                        "body": {"size": 0},
+                    },
+                    "sizeEstimate": rng.randint(5_000, 90_000),
+                    "historyId": str(1_000_000 + i),
+                    "internalDate": str(1769916783000 + i * 1000),
+                }
+            )
+        )
+    return responses
+
+
+def measure(label, build, raw, baseline=None):
+    gc.collect()
+    tracemalloc.start()
+    messages = [build(json.loads(response)) for response in raw]
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    per_message = held / len(raw)
+    ratio = f"  ({baseline / held:.1f}x smaller)" if baseline else ""
+    print(f"{label:<20} {held / 2**20:8.1f} MiB  {per_message:6.0f} B/message{ratio}")
+    return held, messages
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    raw = make_responses(count)
+
+    dict_bytes, dicts = measure("response dicts", lambda response: response, raw)
+    _, records = measure("GmailMessage", GmailMessage.from_response, raw, baseline=dict_bytes)
+
+    assert parse_emails(records[:500], workers=1) == parse_emails(dicts[:500], workers=1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Micro-benchmark: parse_emails vs. the parser it replaced.
+
+The old parser built a dict of every header and ran parseaddr and
+parsedate_to_datetime on each message. The new one keeps only the stored headers,
+parses the usual Date shape with a precompiled regex and memoizes From values.
+Big lists are also parsed on a process pool, which is timed separately.
+Nothing here touches the network or the database.
+
+Usage (from backend/):
+    python scripts/bench_parse_emails.py [messages] [parse workers]
+"""
+
+import os
+import random
+import sys
+import time
+from email.utils import parseaddr, parsedate_to_datetime
+from functools import partial
+from pathlib import Path
+
+import django
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+os.environ.setdefault("DJANGO_SECRET_KEY", "bench-only")
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from api.utils.parsers import (  # noqa: E402
+    PARALLEL_PARSE_THRESHOLD,
+    parse_emails,
+    parse_sender,
+    shutdown_parse_pool,
+)
+
+SENDERS = [
+    '"LinkedIn" <jobs-noreply@linkedin.com>',
+    "Indeed <alert@indeed.com>",
+    "Greenhouse <no-reply@greenhouse.io>",
+    "Recruiting Team <careers@example.com>",
+    "noreply@workday.com",
+] + [f"Person {i} <person{i}@example.com>" for i in range(200)]
+
+
+def legacy_parse_emails(emails):
+    parsed_emails = []
+
+    for email in emails:
+        headers = email.get("payload", {}).get("headers", [])
+        headers = {header["name"]: header["value"] for header in headers}
+
+        sender_name, sender_email = parseaddr(headers.get("From", ""))
+
+        received_at = parsedate_to_datetime(headers.get("Date", ""))
+        if timezone.is_naive(received_at):
+            received_at = timezone.make_aware(received_at)
+
+        parsed_emails.append(
+            {
+                "gmail_id": email.get("id"),
+                "subject": headers.get("Subject", ""),
+                "sender_email": sender_email,
+                "sender_name": sender_name,
+                "received_at": received_at,
+                "content_type": headers.get("Content-Type", ""),
+                "size_estimate": email.get("sizeEstimate", -1),
+                "importance": 1,
+                "labels": email.get("labelIds", ["INBOX"]),
+            }
+        )
+
+    return parsed_emails
+
+
+def make_messages(count):
+    rng = random.Random(0)
+    messages = []
+    for i in range(count):
+        headers = [{"name": f"X-Header-{n}", "value": "x" * 40} for n in range(15)]
+        headers += [
+            {"name": "Date", "value": f"Sun, {rng.randint(1, 28):02d} Feb 2026 03:33:03 +0000 (UTC)"},
+            {"name": "From", "value": rng.choice(SENDERS)},
+            {"name": "Subject", "value": f"Application update {i}"},
+            {"name": "Content-Type", "value": "text/html; charset=utf-8"},
+        ]
+        messages.append({"id": str(i), "labelIds": ["INBOX"], "sizeEstimate": 1000, "payload": {"headers": headers}})
+    return messages
+
+
+def bench(label, func, messages):
+    start = time.perf_counter()
+    func(messages)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<24} {elapsed * 1000:9.1f} ms  ({len(messages) / elapsed:,.0f} msgs/s)")
+    return elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else settings.EMAIL_PARSE_WORKERS
+    messages = make_messages(count)
+
+    assert legacy_parse_emails(messages[:500]) == parse_emails(messages[:500])
+
+    legacy = bench("legacy parse_emails", legacy_parse_emails, messages)
+    parse_sender.cache_clear()
+    fast = bench("parse_emails", partial(parse_emails, workers=1), messages)
+    print(f"speedup: {legacy / fast:.1f}x")
+
+    if workers > 1 and count >= PARALLEL_PARSE_THRESHOLD:
+        parse_emails(messages[:PARALLEL_PARSE_THRESHOLD], workers=workers)  # start the pool outside the timing
+        parallel = bench(f"parse_emails x{workers} procs", partial(parse_emails, workers=workers), messages)
+        print(f"speedup: {legacy / parallel:.1f}x")
+        shutdown_parse_pool()
+
+
+if __name__ == "__main__":
+    main()
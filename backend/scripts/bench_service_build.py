@@ -0,0 +1,57 @@
+"""
+Micro-benchmark: cost of building a Gmail service per call vs. reusing a cached one.
+
+Before the service factory every list page and every batch called build(), which
+re-reads and re-parses the bundled discovery document. Nothing here touches the
+network or the database.
+
+Usage (from backend/):
+    python scripts/bench_service_build.py [iterations]
+"""
+
+import os
+import sys
+import time
+from pathlib import Path
+
+import django
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+os.environ.setdefault("DJANGO_SECRET_KEY", "bench-only")
+django.setup()
+
+from google.oauth2.credentials import Credentials  # noqa: E402
+from googleapiclient.discovery import build  # noqa: E402
+
+from api.models import User  # noqa: E402
+from api.services.gmail_service import get_gmail_service  # noqa: E402
+
+
+def bench(label, func, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<32} {elapsed / iterations * 1000:8.3f} ms/call  ({iterations} calls, {elapsed:.2f}s)")
+    return elapsed
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    creds = Credentials(token="bench-token")
+    user = User(pk=1, email="bench@example.com")
+
+    uncached = bench(
+        "build() per call",
+        lambda: build("gmail", "v1", credentials=creds, static_discovery=True, cache_discovery=False),
+        iterations,
+    )
+    get_gmail_service(user, creds)  # the one build a sync still pays
+    cached = bench("get_gmail_service() cached", lambda: get_gmail_service(user, creds), iterations)
+
+    print(f"speedup: {uncached / cached:,.0f}x")
+
+
+if __name__ == "__main__":
+    main()
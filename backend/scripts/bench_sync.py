@@ -0,0 +1,218 @@
+"""
+End-to-end sync benchmark: sync_user_emails or populate_data against the fake Gmail server.
+
+Every case runs in a fresh process on a fresh SQLite database, so peak RSS and query counts
+are its own. The fake server (scripts/fake_gmail.py) runs in this process and counts the API
+calls. For each case it reports messages/sec, HTTP requests, messages.get calls, DB queries
+and peak RSS, and compares them with the stored baselines: slower throughput, or more
+calls, queries or memory than the baseline allows (--tolerance), is a regression and makes
+the run exit with status 1. Throughput depends on the machine, record baselines on the one
+that checks them.
+
+The per-user quota is lifted unless --quota is given, the fake server doesn't enforce one
+and the default 250 units/s would make the run measure nothing but the token bucket.
+
+Usage (from backend/):
+    python scripts/bench_sync.py [--sizes 1000 10000 100000] [--backends sync async]
+                                 [--entry sync_user_emails] [--latency 0.02] [--rate-limit 0.01]
+                                 [--update-baseline]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from fake_gmail import start_server
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+BASELINE_PATH = Path(__file__).resolve().parent / "bench_sync_baseline.json"
+BENCH_EMAIL = "bench@example.com"
+
+# metric -> True when bigger is better
+METRICS = {
+    "messages_per_sec": True,
+    "http_requests": False,
+    "messages_get": False,
+    "db_queries": False,
+    "peak_rss_mib": False,
+}
+
+
+def run_case(args) -> dict:
+    """Child process: migrate a fresh database, sync `args.size` messages and report what it cost."""
+    import resource
+
+    import django
+
+    sys.path.insert(0, str(BACKEND_DIR))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+    os.environ.setdefault("DJANGO_SECRET_KEY", "bench-only")
+    django.setup()
+
+    from django.core.management import call_command
+    from django.db import connection
+    from django.db.backends.signals import connection_created
+
+    from api.models import GoogleAuthToken, JobEmail, User
+    from api.services import gmail_service
+    from api.services.gmail_sync import sync_user_emails
+
+    call_command("migrate", verbosity=0)
+
+    gmail_service.USER_QUOTA_UNITS_PER_SECOND = args.quota or 10**12
+
+    # a stored token that doesn't expire for decades, so get_creds never refreshes or prompts
+    user = User.objects.create_user(email=BENCH_EMAIL)
+    token = {
+        "token": "bench-token",
+        "refresh_token": "bench-refresh-token",
+        "client_id": "bench",
+        "client_secret": "bench",
+        "expiry": "2099-01-01T00:00:00Z",
+    }
+    GoogleAuthToken.objects.create(user=user, token_json=json.dumps(token))
+
+    # every thread's connection, the streaming stages query from their own threads
+    queries = [0]
+
+    def count_query(execute, sql, params, many, context):
+        queries[0] += 1
+        return execute(sql, params, many, context)
+
+    def install_counter(sender, connection, **kwargs):
+        if count_query not in connection.execute_wrappers:
+            connection.execute_wrappers.append(count_query)
+
+    connection_created.connect(install_counter)
+    install_counter(None, connection)
+
+    start = time.perf_counter()
+    if args.entry == "populate_data":
+        call_command(
+            "populate_data", email=BENCH_EMAIL, maxResults=args.size, backend=args.backend, stdout=open(os.devnull, "w")
+        )
+        stats = {"errors": 0}
+    else:
+        stats = sync_user_emails(user, args.size, backend=args.backend)
+    elapsed = time.perf_counter() - start
+
+    db_queries = queries[0]
+    connection.execute_wrappers.remove(count_query)
+    stored = JobEmail.objects.filter(user=user).count()
+    return {
+        "stored": stored,
+        "errors": stats["errors"],
+        "seconds": round(elapsed, 2),
+        "messages_per_sec": round(stored / elapsed, 1),
+        "db_queries": db_queries,
+        # ru_maxrss is KiB on Linux
+        "peak_rss_mib": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def bench(server, entry: str, backend: str, size: int, quota: float) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {
+            **os.environ,
+            # the same shape as the default DATABASE_URL, so the bench hits what a local sync hits
+            "DATABASE_URL": f"sqlite:///{tmp}/bench.sqlite3",
+            "GMAIL_API_URL": server.url,
+            "GMAIL_HTTP_FACTORY": "fake_gmail.redirecting_http",
+        }
+        command = [sys.executable, __file__, "--child", "--entry", entry, "--backend", backend, "--size", str(size)]
+        if quota:
+            command += ["--quota", str(quota)]
+
+        server.reset_calls()
+        output = subprocess.run(command, env=env, cwd=BACKEND_DIR, capture_output=True, text=True)
+        calls = server.reset_calls()
+
+    if output.returncode:
+        sys.exit(f"{entry}/{backend}/{size} crashed:\n{output.stderr}")
+
+    result = json.loads(output.stdout.strip().splitlines()[-1])
+    result["http_requests"] = calls["http_requests"]
+    result["messages_get"] = calls["messages.get"]
+    result["rate_limited"] = calls["rate_limited"]
+    result["connections"] = calls["connections"]
+    return result
+
+
+def regressions(result: dict, baseline: dict, tolerance: float) -> list[str]:
+    found = []
+    for metric, higher_is_better in METRICS.items():
+        old, new = baseline.get(metric), result[metric]
+        if not old:
+            continue
+        if higher_is_better and new < old * (1 - tolerance):
+            found.append(f"{metric} {old} -> {new}")
+        elif not higher_is_better and new > old * (1 + tolerance):
+            found.append(f"{metric} {old} -> {new}")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10_000, 100_000])
+    parser.add_argument("--backends", nargs="+", choices=["sync", "async"], default=["sync", "async"])
+    parser.add_argument("--entry", choices=["sync_user_emails", "populate_data"], default="sync_user_emails")
+    parser.add_argument("--latency", type=float, default=0, help="Seconds the fake server adds to every request")
+    parser.add_argument("--rate-limit", type=float, default=0, help="Share of messages.get answered with 429")
+    parser.add_argument("--quota", type=float, default=0, help="Quota units per second, 0 lifts the quota")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed change before it is a regression")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true", help="Store these results as the new baselines")
+    # internal: one case in a fresh process
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--size", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--backend", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_case(args)))
+        return
+
+    baselines = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    server = start_server(max(args.sizes), latency=args.latency, rate_limit=args.rate_limit)
+    config = {"latency": args.latency, "rate_limit": args.rate_limit, "quota": args.quota}
+
+    print(f"{'case':<36} {'msg/s':>9} {'secs':>7} {'http':>7} {'gets':>8} {'429s':>6} {'queries':>8} {'rss MiB':>8}")
+    failed = False
+    for backend in args.backends:
+        for size in args.sizes:
+            key = f"{args.entry}/{backend}/{size}"
+            result = bench(server, args.entry, backend, size, args.quota)
+            print(
+                f"{key:<36} {result['messages_per_sec']:>9,.0f} {result['seconds']:>7.2f} "
+                f"{result['http_requests']:>7} {result['messages_get']:>8} {result['rate_limited']:>6} "
+                f"{result['db_queries']:>8} {result['peak_rss_mib']:>8.1f}"
+            )
+
+            if result["errors"] or result["stored"] != size:
+                print(f"  FAILED: stored {result['stored']} of {size} messages, {result['errors']} errors")
+                failed = True
+
+            baseline = baselines.get(key)
+            if args.update_baseline:
+                baselines[key] = {**config, **{metric: result[metric] for metric in METRICS}}
+            elif baseline and all(baseline.get(name) == value for name, value in config.items()):
+                for regression in regressions(result, baseline, args.tolerance):
+                    print(f"  REGRESSION: {regression}")
+                    failed = True
+
+    server.shutdown()
+
+    if args.update_baseline:
+        args.baseline.write_text(json.dumps(baselines, indent=2, sort_keys=True) + "\n")
+        print(f"Baselines written to {args.baseline}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
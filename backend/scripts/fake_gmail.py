@@ -0,0 +1,285 @@
+"""
+Local stand-in for the Gmail API, serving a synthetic mailbox for offline sync benchmarks.
+
+Answers the calls a sync makes: users.getProfile, users.history.list (never any changes),
+users.messages.list with pagination, users.messages.get in metadata format, both directly
+(the async client) and inside googleapiclient batch requests (the sync client). Messages
+are generated from their position on the fly, so a million message mailbox costs nothing
+to hold. It can add latency to every HTTP request and answer a share of messages.get with
+429 + Retry-After, and it counts the calls it got.
+
+googleapiclient always sends batches to https://gmail.googleapis.com/batch, whatever the
+service endpoint, so the sync client is pointed here at the transport level: set
+GMAIL_HTTP_FACTORY=fake_gmail.redirecting_http (with scripts/ on the path) and
+GMAIL_API_URL to the server. scripts/bench_sync.py does all of that.
+
+Usage (from backend/):
+    python scripts/fake_gmail.py [--messages 10000] [--port 8025] [--latency 0.05] [--rate-limit 0.01]
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from collections import Counter
+from datetime import UTC, datetime, timedelta
+from email.parser import BytesParser
+from email.utils import format_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+from uuid import uuid4
+
+import httplib2
+
+GOOGLE_API_URL = "https://gmail.googleapis.com"
+API_PREFIX = "/gmail/v1/users/me"
+HISTORY_ID = "1000000"
+
+SENDERS = [
+    '"LinkedIn" <jobs-noreply@linkedin.com>',
+    "Indeed <alert@indeed.com>",
+    "Greenhouse <no-reply@greenhouse.io>",
+    "Lever <no-reply@hire.lever.co>",
+] + [f"Recruiter {i} <recruiting@company{i}.com>" for i in range(500)]
+SUBJECTS = [
+    "Your application to {company} was received",
+    "Interview invitation: Software Engineer at {company}",
+    "Update on your application with {company}",
+    "{company} is hiring: 12 new jobs for you",
+    "Thanks for applying to {company}",
+]
+LABELS = [["INBOX", "UNREAD"], ["INBOX"], ["INBOX", "CATEGORY_UPDATES"], ["CATEGORY_PROMOTIONS"]]
+NEWEST = datetime(2026, 2, 1, tzinfo=UTC)
+
+
+class Mailbox:
+    """`size` messages, newest first, each built from its position so nothing is stored."""
+
+    def __init__(self, size: int):
+        self.size = size
+
+    def message_id(self, index: int) -> str:
+        # Gmail ids are hex and grow with time, so the newest message has the biggest one
+        return f"{self.size - index:016x}"
+
+    def message(self, msg_id: str) -> dict | None:
+        number = int(msg_id, 16)
+        if not 0 < number <= self.size:
+            return None
+
+        rng = random.Random(number)
+        sender = rng.choice(SENDERS)
+        company = sender.rpartition("@")[2].rstrip(">").split(".")[0].title()
+        received_at = NEWEST - timedelta(minutes=(self.size - number) * 7)
+        return {
+            "id": msg_id,
+            "threadId": msg_id,
+            "labelIds": rng.choice(LABELS),
+            "snippet": "",
+            "payload": {
+                "partId": "",
+                "mimeType": "text/html",
+                "headers": [
+                    {"name": "Subject", "value": rng.choice(SUBJECTS).format(company=company)},
+                    {"name": "From", "value": sender},
+                    {"name": "Date", "value": format_datetime(received_at)},
+                ],
+            },
+            "sizeEstimate": rng.randint(2_000, 120_000),
+            "historyId": HISTORY_ID,
+            "internalDate": str(int(received_at.timestamp() * 1000)),
+        }
+
+
+class FakeGmailServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, mailbox: Mailbox, latency: float = 0, rate_limit: float = 0, seed: int = 0):
+        super().__init__(address, FakeGmailHandler)
+        self.mailbox = mailbox
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.calls = Counter()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, call: str):
+        with self._lock:
+            self.calls[call] += 1
+
+    def reset_calls(self) -> Counter:
+        """Forget the counted calls, returning what was counted until now."""
+        with self._lock:
+            calls, self.calls = self.calls, Counter()
+        return calls
+
+    def rate_limited(self) -> bool:
+        with self._lock:
+            return self._rng.random() < self.rate_limit
+
+
+class FakeGmailHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # headers and body go out in separate writes, Nagle would hold the body back for the client's delayed ACK
+    disable_nagle_algorithm = True
+    server: FakeGmailServer
+
+    def setup(self):
+        super().setup()
+        self.server.count("connections")
+
+    def do_GET(self):
+        self._delay()
+        self.server.count("http_requests")
+        status, headers, body = self._route(self.path)
+        self._reply(status, headers, json.dumps(body).encode())
+
+    def do_POST(self):
+        self._delay()
+        self.server.count("http_requests")
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if urlsplit(self.path).path not in ("/batch", "/batch/gmail/v1"):
+            return self._reply(404, {}, b'{"error": "notFound"}')
+
+        self.server.count("batches")
+        boundary = f"batch_{uuid4().hex}"
+        self._reply(200, {"Content-Type": f"multipart/mixed; boundary={boundary}"}, self._batch(body, boundary))
+
+    def _route(self, target: str) -> tuple[int, dict, dict]:
+        url = urlsplit(target)
+        params = parse_qs(url.query)
+        path = url.path.removeprefix(API_PREFIX)
+
+        if path == "/profile":
+            self.server.count("profile")
+            return 200, {}, {"emailAddress": "bench@example.com", "historyId": HISTORY_ID}
+
+        if path == "/history":
+            self.server.count("history.list")
+            return 200, {}, {"historyId": HISTORY_ID}
+
+        if path == "/messages":
+            self.server.count("messages.list")
+            return 200, {}, self._list(params)
+
+        if path.startswith("/messages/"):
+            self.server.count("messages.get")
+            if self.server.rate_limited():
+                self.server.count("rate_limited")
+                error = {"error": {"code": 429, "message": "User-rate limit exceeded"}}
+                return 429, {"Retry-After": "0"}, error
+
+            message = self.server.mailbox.message(path.removeprefix("/messages/"))
+            if message is None:
+                return 404, {}, {"error": {"code": 404, "message": "Not Found"}}
+            return 200, {}, message
+
+        return 404, {}, {"error": {"code": 404, "message": "Not Found"}}
+
+    def _list(self, params: dict) -> dict:
+        mailbox = self.server.mailbox
+        start = int(params.get("pageToken", ["0"])[0])
+        end = min(start + int(params.get("maxResults", ["100"])[0]), mailbox.size)
+
+        page = {
+            "messages": [{"id": (msg_id := mailbox.message_id(i)), "threadId": msg_id} for i in range(start, end)],
+            "resultSizeEstimate": mailbox.size,
+        }
+        if end < mailbox.size:
+            page["nextPageToken"] = str(end)
+        return page
+
+    def _batch(self, body: bytes, boundary: str) -> bytes:
+        # the request is multipart/mixed, one application/http part per call
+        request = BytesParser().parsebytes(f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + body)
+
+        parts = []
+        for part in request.get_payload():
+            request_line = part.get_payload().split("\n", 1)[0]
+            _, target, _ = request_line.split(" ", 2)
+            status, headers, response = self._route(target)
+
+            content_id = part["Content-ID"].strip("<>")
+            lines = [
+                f"--{boundary}",
+                "Content-Type: application/http",
+                f"Content-ID: <response-{content_id}>",
+                "",
+                f"HTTP/1.1 {status} {self.responses[status][0]}",
+                "Content-Type: application/json; charset=UTF-8",
+                *(f"{name}: {value}" for name, value in headers.items()),
+                "",
+                json.dumps(response),
+            ]
+            parts.append("\r\n".join(lines))
+
+        return ("\r\n".join(parts) + f"\r\n--{boundary}--\r\n").encode()
+
+    def _reply(self, status: int, headers: dict, body: bytes):
+        self.send_response(status)
+        headers = {"Content-Type": "application/json; charset=UTF-8", **headers}
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _delay(self):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class RedirectingHttp(httplib2.Http):
+    """httplib2 transport sending every Gmail API request, batches included, to `base_url`."""
+
+    def __init__(self, base_url: str):
+        super().__init__(timeout=60)
+        self.base_url = base_url.rstrip("/")
+
+    def request(self, uri, *args, **kwargs):
+        if uri.startswith(GOOGLE_API_URL):
+            uri = self.base_url + uri.removeprefix(GOOGLE_API_URL)
+        return super().request(uri, *args, **kwargs)
+
+
+def redirecting_http() -> RedirectingHttp:
+    """GMAIL_HTTP_FACTORY pointing the googleapiclient transport at GMAIL_API_URL."""
+    from django.conf import settings
+
+    return RedirectingHttp(settings.GMAIL_API_URL)
+
+
+def start_server(size: int, port: int = 0, latency: float = 0, rate_limit: float = 0, seed: int = 0) -> FakeGmailServer:
+    """Serve a `size` message mailbox from a background thread, port 0 picks a free one."""
+    server = FakeGmailServer(("127.0.0.1", port), Mailbox(size), latency, rate_limit, seed)
+    threading.Thread(target=server.serve_forever, name="fake-gmail", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--messages", type=int, default=10_000, help="Mailbox size")
+    parser.add_argument("--port", type=int, default=8025)
+    parser.add_argument("--latency", type=float, default=0, help="Seconds added to every HTTP request")
+    parser.add_argument("--rate-limit", type=float, default=0, help="Share of messages.get answered with 429")
+    args = parser.parse_args()
+
+    server = start_server(args.messages, args.port, args.latency, args.rate_limit)
+    print(f"Serving {args.messages} messages at {server.url}, Ctrl+C to stop")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        print(dict(server.calls))
+
+
+if __name__ == "__main__":
+    main()